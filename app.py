@@ -1,18 +1,35 @@
 import os
 import logging
-from flask import Flask, render_template, request, redirect, url_for, session, flash
+from flask import Flask, render_template, request, redirect, url_for, session, flash, Response
 from flask_sqlalchemy import SQLAlchemy
 from werkzeug.middleware.proxy_fix import ProxyFix
 from flask_login import LoginManager, current_user, login_user, logout_user, login_required
 from werkzeug.security import generate_password_hash, check_password_hash
 from flask_mail import Mail, Message
 from itsdangerous import URLSafeTimedSerializer
-from language_handlers import LanguageHandlerFactory
+from language_handlers import JUDGE_MAX_CASES, LanguageHandlerFactory, compile_cache, rust_incremental
+from concurrent.futures import TimeoutError as FuturesTimeout
+from execution_jobs import BatchRunner, ExecutionLanes, JobManager, QueueFullError
+from sandbox import sandbox_pool
+from result_cache import ResultCache, result_cache
+from diagnostics import diagnostics_service, validation_cache
+from project_builds import project_builder
+from workspaces import workspace_cache
+from precompiled_headers import precompiled_headers
+from cargo_builds import cargo_builder
+from dependency_envs import dependency_envs
+from toolchains import toolchain_registry
 from flask_wtf.csrf import CSRFProtect
 import pyotp
 import qrcode
 import io
 import base64
+import functools
+import hmac
+import json
+import queue
+import time
+import uuid
 from google_auth import google_auth
 
 # Configure logging
@@ -21,7 +38,8 @@ logging.basicConfig(level=logging.DEBUG)
 # Init Flask app first
 app = Flask(__name__)
 app.secret_key = os.environ.get("SESSION_SECRET") or "your_secret_key_here"
-app.wsgi_app = ProxyFix(app.wsgi_app, x_proto=1, x_host=1)
+# Trust the one proxy in front of the app for the client address too (guests are queued by it)
+app.wsgi_app = ProxyFix(app.wsgi_app, x_for=1, x_proto=1, x_host=1)
 
 # Email configuration with debugging
 app.config['MAIL_SERVER'] = 'smtp-mail.outlook.com'
@@ -94,14 +112,89 @@ def make_session_permanent():
         except Exception as e:
             logging.error(f"Error during cleanup: {e}")
 
-# Create workspace dir if missing
-WORKSPACE_DIR = os.path.join(os.getcwd(), 'workspace')
-if not os.path.exists(WORKSPACE_DIR):
-    os.makedirs(WORKSPACE_DIR)
+# Persistent project workspaces (created by workspaces.WorkspaceCache)
+WORKSPACE_DIR = workspace_cache.root
 
 # Init language handler factory
 language_factory = LanguageHandlerFactory()
 
+# Executions run in lanes with their own workers, queue depths and timeouts so quick work
+# never waits behind long runs; a full lane returns 429.
+# Short lane: interactive /execute and /execute/stream runs
+app.config['EXECUTION_WORKERS'] = int(os.environ.get('EXECUTION_WORKERS', 4))
+app.config['EXECUTION_QUEUE_DEPTH'] = int(os.environ.get('EXECUTION_QUEUE_DEPTH', 32))
+# Defaults to the handlers' own 30 second limit; set lower to give interactive runs a tighter budget
+app.config['SHORT_RUN_TIMEOUT'] = int(os.environ.get('SHORT_RUN_TIMEOUT', 30))
+# Long lane: judge, projects and runs requested with "lane": "long"
+app.config['LONG_RUN_WORKERS'] = int(os.environ.get('LONG_RUN_WORKERS', 2))
+app.config['LONG_RUN_QUEUE_DEPTH'] = int(os.environ.get('LONG_RUN_QUEUE_DEPTH', 16))
+app.config['LONG_RUN_TIMEOUT'] = int(os.environ.get('LONG_RUN_TIMEOUT', 30))
+# Validation lane: /api/validate; a check that isn't answered in time reports no verdict
+app.config['VALIDATE_WORKERS'] = int(os.environ.get('VALIDATE_WORKERS', 2))
+app.config['VALIDATE_QUEUE_DEPTH'] = int(os.environ.get('VALIDATE_QUEUE_DEPTH', 16))
+app.config['VALIDATE_TIMEOUT'] = float(os.environ.get('VALIDATE_TIMEOUT', 5))
+# Workers are shared fairly between users: queued runs are dispatched by weight per user
+# class, and each user may only have so many running (and waiting) at once
+app.config['EXECUTION_AUTH_WEIGHT'] = float(os.environ.get('EXECUTION_AUTH_WEIGHT', 4))
+app.config['EXECUTION_GUEST_WEIGHT'] = float(os.environ.get('EXECUTION_GUEST_WEIGHT', 1))
+app.config['EXECUTION_AUTH_MAX_RUNNING'] = int(os.environ.get('EXECUTION_AUTH_MAX_RUNNING', 2))
+app.config['EXECUTION_GUEST_MAX_RUNNING'] = int(os.environ.get('EXECUTION_GUEST_MAX_RUNNING', 1))
+app.config['EXECUTION_MAX_QUEUED_PER_USER'] = int(os.environ.get('EXECUTION_MAX_QUEUED_PER_USER', 8))
+execution_user_classes = {
+    'authenticated': {'weight': app.config['EXECUTION_AUTH_WEIGHT'],
+                      'max_running': app.config['EXECUTION_AUTH_MAX_RUNNING']},
+    'guest': {'weight': app.config['EXECUTION_GUEST_WEIGHT'],
+              'max_running': app.config['EXECUTION_GUEST_MAX_RUNNING']},
+}
+# Batch lane: /execute/batch items, queued per user so one batch can't take every worker.
+# Batch items run side by side, so users may run more of them at once than single runs.
+app.config['BATCH_WORKERS'] = int(os.environ.get('BATCH_WORKERS', app.config['EXECUTION_WORKERS']))
+app.config['BATCH_MAX_PENDING'] = int(os.environ.get('BATCH_MAX_PENDING', 1000))
+app.config['BATCH_MAX_ITEMS'] = int(os.environ.get('BATCH_MAX_ITEMS', 500))
+app.config['BATCH_MAX_DEADLINE'] = float(os.environ.get('BATCH_MAX_DEADLINE', 300))
+app.config['BATCH_MAX_PENDING_PER_USER'] = int(os.environ.get('BATCH_MAX_PENDING_PER_USER', app.config['BATCH_MAX_ITEMS']))
+app.config['BATCH_AUTH_MAX_RUNNING'] = int(os.environ.get('BATCH_AUTH_MAX_RUNNING', 4))
+app.config['BATCH_GUEST_MAX_RUNNING'] = int(os.environ.get('BATCH_GUEST_MAX_RUNNING', 2))
+batch_user_classes = {
+    'authenticated': {'weight': app.config['EXECUTION_AUTH_WEIGHT'],
+                      'max_running': app.config['BATCH_AUTH_MAX_RUNNING']},
+    'guest': {'weight': app.config['EXECUTION_GUEST_WEIGHT'],
+              'max_running': app.config['BATCH_GUEST_MAX_RUNNING']},
+}
+execution_lanes = ExecutionLanes({
+    'validate': JobManager(
+        max_workers=app.config['VALIDATE_WORKERS'],
+        max_queue=app.config['VALIDATE_QUEUE_DEPTH'],
+        user_classes=execution_user_classes,
+        max_queued_per_user=app.config['EXECUTION_MAX_QUEUED_PER_USER'],
+        name='validate'
+    ),
+    'short': JobManager(
+        max_workers=app.config['EXECUTION_WORKERS'],
+        max_queue=app.config['EXECUTION_QUEUE_DEPTH'],
+        user_classes=execution_user_classes,
+        max_queued_per_user=app.config['EXECUTION_MAX_QUEUED_PER_USER'],
+        name='short',
+        run_timeout=app.config['SHORT_RUN_TIMEOUT']
+    ),
+    'long': JobManager(
+        max_workers=app.config['LONG_RUN_WORKERS'],
+        max_queue=app.config['LONG_RUN_QUEUE_DEPTH'],
+        user_classes=execution_user_classes,
+        max_queued_per_user=app.config['EXECUTION_MAX_QUEUED_PER_USER'],
+        name='long',
+        run_timeout=app.config['LONG_RUN_TIMEOUT']
+    ),
+    'batch': JobManager(
+        max_workers=app.config['BATCH_WORKERS'],
+        max_queue=app.config['BATCH_MAX_PENDING'],
+        user_classes=batch_user_classes,
+        max_queued_per_user=app.config['BATCH_MAX_PENDING_PER_USER'],
+        name='batch'
+    ),
+})
+batch_runner = BatchRunner(execution_lanes.lanes['batch'])
+
 # Register Google Auth blueprint
 app.register_blueprint(google_auth)
 
@@ -483,9 +576,73 @@ def about():
     return render_template('about.html')
 
 # Code execution and project management routes
+def format_execution_result(result):
+    """Normalize handler results to the response format the frontend expects"""
+    if 'exit_code' in result:
+        return {
+            'output': result.get('output', ''),
+            'error': result.get('error', '') if result.get('exit_code', 0) != 0 else None,
+            'execution_time': 0
+        }
+    return result
+
+def run_execution(handler, code, on_event=None, input_data=None, cache_key=None):
+    result = format_execution_result(handler.execute(code, on_event=on_event, input_data=input_data))
+    if cache_key is not None:
+        result_cache.put(cache_key, result)
+        result = dict(result, cache_hit=False)
+    return result
+
+def unsupported_language(language, profile=None):
+    """Error message for a language (or build profile of it) that has no handler"""
+    if profile and language_factory.get_handler(language):
+        return f'Language "{language}" has no "{profile}" profile'
+    return f'Language "{language}" not supported'
+
+def result_cache_key(data, handler, language, code):
+    """Result cache key for requests that opted in with "cache": true, else None"""
+    if not data.get('cache') or not result_cache.enabled:
+        return None
+    versions = [toolchain_registry.version_string(name) for name in handler.toolchains]
+    # Profiles build differently, which can change what a program prints (or whether it finishes)
+    key_language = f'{language.lower()}:{handler.profile}' if handler.profile else language.lower()
+    return ResultCache.make_key(key_language, versions, code, data.get('stdin'))
+
+def cached_result(cache_key):
+    """A previously stored result for this key, flagged as a cache hit"""
+    if cache_key is None:
+        return None
+    result = result_cache.get(cache_key)
+    return dict(result, cache_hit=True) if result is not None else None
+
+def execution_owner():
+    """(user key, user class) that the fair scheduler queues this request's executions under"""
+    if current_user.is_authenticated:
+        return f'user-{current_user.id}', 'authenticated'
+    # Guests are told apart by session once their cookie comes back; until then (or for
+    # clients that never keep it) by address, so dropping the cookie can't dodge the per-owner cap
+    if 'guest_id' not in session:
+        session['guest_id'] = uuid.uuid4().hex
+        return f'guest-addr-{request.remote_addr}', 'guest'
+    return f'guest-{session["guest_id"]}', 'guest'
+
+def run_lane(data):
+    """Lane for a single run: 'long' when the request sets "lane": "long", else 'short'"""
+    return 'long' if data.get('lane') == 'long' else 'short'
+
+def queue_full_response(error):
+    return {'error': f'Server is busy, please try again shortly ({error})'}, 429, {'Retry-After': '1'}
+
 @app.route('/execute', methods=['POST'])
 def execute_code():
-    """Execute code in the specified language"""
+    """Execute code in the specified language.
+
+    By default the request waits for the result. With "async": true it
+    returns a job id immediately; poll /jobs/<job_id> for the result.
+    With "cache": true a deterministic program's result is reused for
+    identical code, stdin and toolchain versions, returned at once with
+    "cache_hit": true.
+    """
     try:
         data = request.get_json()
         
@@ -498,28 +655,342 @@ def execute_code():
         if not code:
             return {'error': 'No code provided'}, 400
         
-        # Get language handler
-        handler = language_factory.get_handler(language)
+        # Get language handler, in the requested build profile
+        handler = language_factory.get_handler(language, data.get('profile'))
         if not handler:
-            return {'error': f'Language "{language}" not supported'}, 400
+            return {'error': unsupported_language(language, data.get('profile'))}, 400
+        
+        cache_key = result_cache_key(data, handler, language, code)
+        cached = cached_result(cache_key)
+        if cached is not None:
+            return cached
         
-        # Execute code
-        result = handler.execute(code)
+        # Queue execution on the bounded worker pool
+        try:
+            job_id = execution_lanes.submit(run_lane(data), run_execution, handler, code, input_data=data.get('stdin'),
+                                        cache_key=cache_key, owner=execution_owner())
+        except QueueFullError as e:
+            return queue_full_response(e)
         
-        # Convert to expected format
-        if 'exit_code' in result:
+        if data.get('async'):
             return {
-                'output': result.get('output', ''),
-                'error': result.get('error', '') if result.get('exit_code', 0) != 0 else None,
-                'execution_time': 0
-            }
-        else:
-            return result
+                'job_id': job_id,
+                'status': 'queued',
+                'status_url': url_for('get_job', job_id=job_id)
+            }, 202
+        
+        job = execution_lanes.wait(job_id)
+        if job['status'] == 'failed':
+            return {'error': job['error']}, 500
+        return job['result']
         
     except Exception as e:
         logging.error(f"Error executing code: {e}")
         return {'error': f'Execution failed: {str(e)}'}, 500
 
+@app.route('/execute/stream', methods=['POST'])
+def execute_code_stream():
+    """Execute code and stream progress as Server-Sent Events.
+
+    Emits 'phase' events for compile/run start and end, 'stdout'/'stderr'
+    events with output chunks as they are produced, and a final 'result'
+    event with the execution result (minus the already streamed output,
+    unless it was truncated). A result cache hit ("cache": true) sends only
+    the 'result' event, with its output.
+    """
+    data = request.get_json()
+    
+    if not data:
+        return {'error': 'No data provided'}, 400
+    
+    code = data.get('code', '').strip()
+    language = data.get('language', 'python')
+    
+    if not code:
+        return {'error': 'No code provided'}, 400
+    
+    handler = language_factory.get_handler(language, data.get('profile'))
+    if not handler:
+        return {'error': unsupported_language(language, data.get('profile'))}, 400
+    
+    events = queue.Queue()
+    cache_key = result_cache_key(data, handler, language, code)
+    cached = cached_result(cache_key)
+    
+    def run_and_report():
+        try:
+            result = run_execution(handler, code, on_event=lambda event, payload: events.put((event, payload)),
+                                   input_data=data.get('stdin'), cache_key=cache_key)
+        except Exception as e:
+            logging.error(f"Error executing code: {e}")
+            result = {'error': f'Execution failed: {str(e)}'}
+        result = dict(result)
+        # Only the head of a truncated stream was sent live; resend the bounded output with its tail
+        if not result.get('truncated'):
+            result.pop('output', None)
+        events.put(('result', result))
+    
+    if cached is not None:
+        events.put(('result', cached))
+    else:
+        try:
+            execution_lanes.submit(run_lane(data), run_and_report, owner=execution_owner())
+        except QueueFullError as e:
+            return queue_full_response(e)
+    
+    def generate():
+        while True:
+            try:
+                event, payload = events.get(timeout=15)
+            except queue.Empty:
+                # Comment line keeps proxies from closing an idle stream
+                yield ': keep-alive\n\n'
+                continue
+            yield f'event: {event}\ndata: {json.dumps(payload)}\n\n'
+            if event == 'result':
+                return
+    
+    return Response(generate(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
+
+@app.route('/execute/batch', methods=['POST'])
+def execute_batch():
+    """Run a list of {language, code, stdin} items concurrently.
+
+    Returns every item's outcome in request order once all have finished
+    or the batch deadline ("deadline" seconds, capped by BATCH_MAX_DEADLINE)
+    has passed. With "stream": true each item is sent as an 'item'
+    Server-Sent Event as soon as it finishes, followed by a 'done' event.
+    With "cache": true cached results are reported without running.
+    """
+    data = request.get_json()
+    
+    if not data or not isinstance(data.get('items'), list):
+        return {'error': 'Expected a JSON object with an "items" list'}, 400
+    
+    items = data['items']
+    if not items:
+        return {'error': 'No items provided'}, 400
+    if len(items) > app.config['BATCH_MAX_ITEMS']:
+        return {'error': f'A batch may contain at most {app.config["BATCH_MAX_ITEMS"]} items'}, 400
+    
+    try:
+        deadline = min(float(data.get('deadline', app.config['BATCH_MAX_DEADLINE'])), app.config['BATCH_MAX_DEADLINE'])
+    except (TypeError, ValueError):
+        return {'error': 'deadline must be a number of seconds'}, 400
+    
+    # Invalid items and cache hits are reported in place without running
+    tasks = []
+    ready = {}
+    for index, item in enumerate(items):
+        if not isinstance(item, dict):
+            ready[index] = {'status': 'invalid', 'result': None, 'error': 'Item must be an object', 'queue_time': None}
+            continue
+        code = (item.get('code') or '').strip()
+        language = item.get('language', 'python')
+        handler = language_factory.get_handler(language, item.get('profile'))
+        if not code:
+            ready[index] = {'status': 'invalid', 'result': None, 'error': 'No code provided', 'queue_time': None}
+        elif not handler:
+            ready[index] = {'status': 'invalid', 'result': None,
+                            'error': unsupported_language(language, item.get('profile')), 'queue_time': None}
+        else:
+            cache_key = result_cache_key(dict(item, cache=data.get('cache')), handler, language, code)
+            cached = cached_result(cache_key)
+            if cached is not None:
+                ready[index] = {'status': 'finished', 'result': cached, 'error': None, 'queue_time': 0}
+                continue
+            tasks.append((index, functools.partial(run_execution, handler, code, input_data=item.get('stdin'),
+                                                   cache_key=cache_key)))
+    
+    start = time.time()
+    try:
+        completed = batch_runner.run([task for _, task in tasks], deadline, owner=execution_owner())
+    except QueueFullError as e:
+        return queue_full_response(e)
+    
+    def outcomes():
+        yield from ready.items()
+        for position, outcome in completed:
+            yield tasks[position][0], outcome
+    
+    if data.get('stream'):
+        def generate():
+            timed_out = 0
+            for index, outcome in outcomes():
+                timed_out += outcome['status'] == 'deadline_exceeded'
+                yield f'event: item\ndata: {json.dumps(dict(outcome, index=index))}\n\n'
+            summary = {'total_time': round(time.time() - start, 3), 'deadline_exceeded': timed_out > 0}
+            yield f'event: done\ndata: {json.dumps(summary)}\n\n'
+        
+        return Response(generate(), mimetype='text/event-stream', headers={
+            'Cache-Control': 'no-cache',
+            'X-Accel-Buffering': 'no'
+        })
+    
+    results = [None] * len(items)
+    for index, outcome in outcomes():
+        results[index] = dict(outcome, index=index)
+    return {
+        'results': results,
+        'total_time': round(time.time() - start, 3),
+        'deadline_exceeded': any(outcome['status'] == 'deadline_exceeded' for outcome in results)
+    }
+
+@app.route('/execute/judge', methods=['POST'])
+def execute_judge():
+    """Compile once and run the program against a list of stdin test cases.
+
+    Takes {language, code, cases: [{stdin, expected_output}]}; cases run in
+    parallel and each reports output, exit code, CPU time and, when
+    expected_output is given, whether it matched. Runs as one job on the
+    execution pool, so "async": true works as for /execute.
+    """
+    data = request.get_json()
+    
+    if not data:
+        return {'error': 'No data provided'}, 400
+    
+    code = data.get('code', '').strip()
+    language = data.get('language', 'python')
+    cases = data.get('cases')
+    
+    if not code:
+        return {'error': 'No code provided'}, 400
+    if not isinstance(cases, list) or not cases or not all(isinstance(case, dict) for case in cases):
+        return {'error': 'Expected "cases" to be a non-empty list of objects'}, 400
+    if len(cases) > JUDGE_MAX_CASES:
+        return {'error': f'At most {JUDGE_MAX_CASES} cases may be judged at once'}, 400
+    
+    handler = language_factory.get_handler(language, data.get('profile'))
+    if not handler or not handler.supports_judge:
+        return {'error': f'Judge mode is not supported for language "{language}"'}, 400
+    
+    try:
+        job_id = execution_lanes.submit('long', handler.judge, code, cases, owner=execution_owner())
+    except QueueFullError as e:
+        return queue_full_response(e)
+    
+    if data.get('async'):
+        return {
+            'job_id': job_id,
+            'status': 'queued',
+            'status_url': url_for('get_job', job_id=job_id)
+        }, 202
+    
+    job = execution_lanes.wait(job_id)
+    if job['status'] == 'failed':
+        return {'error': job['error']}, 500
+    return job['result']
+
+@app.route('/execute/project', methods=['POST'])
+def execute_project():
+    """Build and run a multi-file project.
+
+    Takes {project_id} to run a saved project's files (ProjectFile rows),
+    or {language, files: [{path, content}]} for unsaved ones. C/C++
+    projects are built incrementally: only translation units whose source
+    or included headers changed are recompiled. Python and Node projects
+    get the packages named in requirements.txt or package.json from a
+    cached environment. Runs as one job on the
+    execution pool, so "async": true works as for /execute.
+    """
+    data = request.get_json()
+    
+    if not data:
+        return {'error': 'No data provided'}, 400
+    
+    owner = execution_owner()
+    if data.get('project_id') is not None:
+        if not current_user.is_authenticated:
+            return {'error': 'Log in to run saved projects'}, 401
+        from models import Project, ProjectFile
+        project = Project.query.filter_by(id=data['project_id'], user_id=current_user.id).first()
+        if not project:
+            return {'error': 'Project not found'}, 404
+        language = project.language
+        files = {f.file_path: f.content for f in ProjectFile.query.filter_by(project_id=project.id).all()}
+        project_key = f'user-{current_user.id}/project-{project.id}'
+    else:
+        entries = data.get('files')
+        if not isinstance(entries, list) or not all(isinstance(entry, dict) and entry.get('path') for entry in entries):
+            return {'error': 'Expected "project_id" or a "files" list of {path, content} objects'}, 400
+        language = data.get('language', 'c')
+        files = {entry['path']: entry.get('content') or '' for entry in entries}
+        # An owner's unsaved projects with the same layout share a build cache; objects are still keyed by content
+        project_key = f'{owner[0]}/files-' + json.dumps(sorted(files))
+    
+    if not files:
+        return {'error': 'The project has no files'}, 400
+    
+    handler = language_factory.get_handler(language, data.get('profile'))
+    if not handler or not handler.supports_projects:
+        return {'error': f'Projects are not supported for language "{language}"'}, 400
+    
+    try:
+        job_id = execution_lanes.submit('long', handler.execute_project, files, project_key,
+                                    input_data=data.get('stdin'), owner=owner)
+    except QueueFullError as e:
+        return queue_full_response(e)
+    
+    if data.get('async'):
+        return {
+            'job_id': job_id,
+            'status': 'queued',
+            'status_url': url_for('get_job', job_id=job_id)
+        }, 202
+    
+    job = execution_lanes.wait(job_id)
+    if job['status'] == 'failed':
+        return {'error': job['error']}, 500
+    return job['result']
+
+@app.route('/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    """Get the status and, once finished, the result of an execution job"""
+    job = execution_lanes.get(job_id)
+    if not job:
+        return {'error': 'Job not found'}, 404
+    return job
+
+# Bearer token that lets monitoring read /metrics; without one only the admin account can
+app.config['METRICS_TOKEN'] = os.environ.get('METRICS_TOKEN')
+
+def metrics_allowed():
+    """Whether the request may read /metrics: the admin account, or the METRICS_TOKEN bearer token"""
+    if current_user.is_authenticated and current_user.username == 'admin':
+        return True
+    token = app.config['METRICS_TOKEN']
+    scheme, _, given = request.headers.get('Authorization', '').partition(' ')
+    return bool(token) and scheme.lower() == 'bearer' and hmac.compare_digest(given.encode(), token.encode())
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    """Execution subsystem counters for capacity planning.
+
+    They include queue depths, per-class scheduler state and cache paths,
+    so only the admin account or a client holding METRICS_TOKEN may read them.
+    """
+    if not metrics_allowed():
+        return {'error': 'Not authorized to read metrics'}, 403, {'WWW-Authenticate': 'Bearer'}
+    return {
+        'execution': execution_lanes.stats(),
+        'compile_cache': compile_cache.stats(),
+        'batch': batch_runner.stats(),
+        'sandboxes': sandbox_pool.stats(),
+        'result_cache': result_cache.stats(),
+        'diagnostics': diagnostics_service.stats(),
+        'validation_cache': validation_cache.stats(),
+        'precompiled_headers': precompiled_headers.stats(),
+        'rust_incremental': rust_incremental.stats(),
+        'cargo': cargo_builder.stats(),
+        'dependency_envs': dependency_envs.stats(),
+        'projects': project_builder.stats(),
+        'workspaces': workspace_cache.stats()
+    }
+
 @app.route('/save', methods=['POST'])
 def save_project():
     """Save code as a project"""
@@ -565,14 +1036,8 @@ def save_project():
 def get_languages():
     """Get list of supported languages"""
     try:
-        languages = []
-        for lang in language_factory.get_supported_languages():
-            handler = language_factory.get_handler(lang)
-            if handler:
-                lang_info = handler.get_language_info()
-                languages.append(lang_info)
-        
-        return {'languages': languages}
+        # Versions and availability come from the toolchain registry, no probes per request
+        return {'languages': language_factory.get_available_languages()}
         
     except Exception as e:
         logging.error(f"Error getting languages: {e}")
@@ -608,7 +1073,12 @@ def admin_cleanup():
 
 @app.route('/api/validate', methods=['POST'])
 def validate_code():
-    """Validate code syntax"""
+    """Validate code and return structured diagnostics.
+
+    Warm language servers answer when installed; otherwise the compiler
+    checks the code. Editors validating as the user types should send a
+    stable "document_id" so only the changed text is sent to the server.
+    """
     try:
         data = request.get_json()
         
@@ -629,12 +1099,28 @@ def validate_code():
         if not handler:
             return {'error': f'Unsupported language: {language}'}, 400
         
-        # Validate code
-        is_valid, message = handler.validate(code)
+        try:
+            job_id = execution_lanes.submit('validate', handler.diagnose, code, data.get('document_id'),
+                                        owner=execution_owner())
+        except QueueFullError as e:
+            return queue_full_response(e)
+        try:
+            job = execution_lanes.wait(job_id, timeout=app.config['VALIDATE_TIMEOUT'])
+        except FuturesTimeout:
+            return {'valid': None, 'message': 'Validation is taking too long; try again shortly',
+                    'diagnostics': [], 'source': None}
+        if job['status'] == 'failed':
+            return {'error': job['error']}, 500
+        diagnostics, source = job['result']
+        if diagnostics is None:
+            return {'valid': None, 'message': source, 'diagnostics': [], 'source': None}
+        errors = [diagnostic for diagnostic in diagnostics if diagnostic['severity'] == 'error']
         
         return {
-            'valid': is_valid,
-            'message': message or ('Syntax is valid' if is_valid else 'Syntax error')
+            'valid': not errors,
+            'message': f"Line {errors[0]['line']}: {errors[0]['message']}" if errors else 'Syntax is valid',
+            'diagnostics': diagnostics,
+            'source': source
         }
         
     except Exception as e:
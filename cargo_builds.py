@@ -0,0 +1,301 @@
+import hashlib
+import json
+import logging
+import os
+import queue
+import re
+import shutil
+import tempfile
+import threading
+import time
+import tomllib
+from typing import Dict, Any, List, Optional, Tuple
+
+from compile_cache import dir_size
+from process_runner import COMPILE_LIMITS, run_process
+
+# Crates available to Rust programs: a directory source as written by `cargo vendor`
+CARGO_VENDOR_DIR = os.environ.get('CARGO_VENDOR_DIR', os.path.join(os.getcwd(), 'vendor', 'cargo'))
+# Target directories shared by Cargo builds, so each vendored crate is compiled once per slot and profile
+CARGO_TARGET_DIR = os.environ.get('CARGO_TARGET_DIR', os.path.join(tempfile.gettempdir(), 'codecraft-cargo-target'))
+CARGO_TARGET_MAX_BYTES = int(os.environ.get('CARGO_TARGET_MAX_BYTES', str(4 * 1024 * 1024 * 1024)))
+# Cargo builds that may run at once; each slot has a target directory of its own under CARGO_TARGET_DIR
+CARGO_BUILD_SLOTS = int(os.environ.get('CARGO_BUILD_SLOTS', '2'))
+# Minimum seconds between checks of the target directory size
+CARGO_TARGET_CHECK_INTERVAL = int(os.environ.get('CARGO_TARGET_CHECK_INTERVAL', '60'))
+# CARGO_HOME for builds, kept apart from the user's registry cache and credentials
+CARGO_HOME_DIR = os.environ.get('CARGO_HOME_DIR', os.path.join(tempfile.gettempdir(), 'codecraft-cargo-home'))
+# Wall-clock limit for one cargo build (the first build of a crate's dependencies is the slow one)
+CARGO_BUILD_TIMEOUT = int(os.environ.get('CARGO_BUILD_TIMEOUT', '300'))
+
+# Cargo profile for each Rust build profile (see language_handlers.RUST_PROFILES)
+CARGO_PROFILES = {'fast': 'dev', 'release': 'release'}
+
+# Crate names a snippet refers to: `use name::`, `extern crate name` or a `name::item` path
+_CRATE_PATH_RE = re.compile(r'(?<![\w:.])(?:extern\s+crate\s+)?([a-z_][a-z0-9_]*)\s*::|extern\s+crate\s+([a-z_][a-z0-9_]*)')
+_LOCAL_MOD_RE = re.compile(r'\bmod\s+([a-z_][a-z0-9_]*)')
+_RUST_NOISE_RE = re.compile(r'//[^\n]*|/\*.*?\*/|"(?:\\.|[^"\\])*"', re.DOTALL)
+_SERDE_DERIVE_RE = re.compile(r'derive\s*\([^)]*\b(?:Serialize|Deserialize)\b')
+
+# Names that are never crates from the vendor directory
+BUILTIN_CRATES = {'std', 'core', 'alloc', 'proc_macro', 'test', 'self', 'super', 'crate'}
+
+# Manifest tables that list dependencies, at the top level, per [target.*] and in [workspace]
+DEPENDENCY_TABLES = ('dependencies', 'dev-dependencies', 'build-dependencies')
+
+
+class CargoError(Exception):
+    """Raised for Cargo projects that can't be built here (missing manifest, build scripts, outside dependencies)"""
+
+
+class CargoBuilder:
+    """Offline Cargo builds against a vendored crate directory.
+
+    Builds run with a private CARGO_HOME, with crates.io replaced by the
+    vendor directory and the network turned off. Up to slots builds run at
+    once, each holding a slot: a target directory the slot's builds share,
+    so a crate like regex is compiled once per slot and profile and then
+    reused by every project and snippet that depends on it. Cargo would
+    serialize builds in one target directory anyway, and holding the slot
+    until the executable is copied out keeps the next build from
+    overwriting it first. A slot's target directory is wiped when it
+    passes its share of max_bytes.
+    """
+
+    def __init__(self, vendor_dir: str, target_dir: str, home_dir: str, max_bytes: int, slots: int = 1):
+        self.vendor_dir = vendor_dir
+        self.target_dir = target_dir
+        self.home_dir = home_dir
+        self.max_bytes = max_bytes
+        self.slots = max(slots, 1)
+        self._lock = threading.Lock()
+        self._free_slots = queue.SimpleQueue()
+        for index in range(self.slots):
+            self._free_slots.put(os.path.join(target_dir, f'slot-{index}'))
+        self._crates: Dict[str, Tuple[str, str]] = {}
+        self._crates_mtime: Optional[float] = None
+        self._last_size_check: Dict[str, float] = {}
+        self._building = 0
+        self.builds = 0
+        self.failures = 0
+        self.cleanups = 0
+
+    def available(self) -> bool:
+        return os.path.isdir(self.vendor_dir)
+
+    def config_args(self) -> List[str]:
+        """--config options that point crates.io at the vendor directory.
+
+        Given on the command line because those outrank any .cargo/config.toml
+        in the directories above a project, which cargo would otherwise merge in.
+        """
+        return [
+            '--config', 'source.crates-io.replace-with="vendored-sources"',
+            '--config', f'source.vendored-sources.directory={json.dumps(self.vendor_dir)}',
+            '--config', 'net.offline=true',
+        ]
+
+    def env(self, target_dir: str) -> Dict[str, str]:
+        """Environment for cargo commands building into target_dir"""
+        env = dict(os.environ)
+        env['CARGO_HOME'] = self.home_dir
+        env['CARGO_TARGET_DIR'] = target_dir
+        env['CARGO_NET_OFFLINE'] = 'true'
+        env['CARGO_TERM_COLOR'] = 'never'
+        return env
+
+    def crates(self) -> Dict[str, Tuple[str, str]]:
+        """Vendored crates by the name code uses for them: {crate_name: (package, newest version)}"""
+        try:
+            mtime = os.stat(self.vendor_dir).st_mtime
+        except OSError:
+            return {}
+        with self._lock:
+            if mtime == self._crates_mtime:
+                return self._crates
+
+        crates: Dict[str, Tuple[str, str]] = {}
+        for entry in os.scandir(self.vendor_dir):
+            try:
+                with open(os.path.join(entry.path, 'Cargo.toml'), 'rb') as f:
+                    package = tomllib.load(f)['package']
+            except (OSError, KeyError, tomllib.TOMLDecodeError):
+                continue
+            name, version = package['name'], str(package.get('version', '0.0.0'))
+            crate_name = name.replace('-', '_')
+            current = crates.get(crate_name)
+            if current is None or _version_tuple(version) > _version_tuple(current[1]):
+                crates[crate_name] = (name, version)
+
+        with self._lock:
+            self._crates, self._crates_mtime = crates, mtime
+        return crates
+
+    def fingerprint(self) -> str:
+        """Identifies the vendored crate set, for build cache keys"""
+        crates = self.crates()
+        return hashlib.sha256(json.dumps(sorted(crates.values())).encode()).hexdigest()
+
+    def snippet_dependencies(self, code: str) -> Dict[str, Tuple[str, str]]:
+        """Vendored crates a single-file program refers to"""
+        if not self.available():
+            return {}
+        text = _RUST_NOISE_RE.sub(' ', code)
+        local = set(_LOCAL_MOD_RE.findall(text))
+        names = {first or second for first, second in _CRATE_PATH_RE.findall(text)}
+        crates = self.crates()
+        return {name: crates[name] for name in sorted(names - BUILTIN_CRATES - local) if name in crates}
+
+    def snippet_files(self, code: str, dependencies: Dict[str, Tuple[str, str]]) -> Dict[str, str]:
+        """A one-binary Cargo project for a snippet"""
+        lines = ['[package]', 'name = "main"', 'version = "0.1.0"', 'edition = "2021"', '', '[dependencies]']
+        for package, version in dependencies.values():
+            spec = f'version = "{version}"'
+            if package == 'serde' and _SERDE_DERIVE_RE.search(code):
+                spec += ', features = ["derive"]'
+            lines.append(f'{package} = {{ {spec} }}')
+        return {'Cargo.toml': '\n'.join(lines) + '\n', 'src/main.rs': code}
+
+    @staticmethod
+    def check_project(files: Dict[str, str]):
+        """Reject projects that would run their own code at build time or can't build offline"""
+        if 'Cargo.toml' not in files:
+            raise CargoError('A Rust project needs a Cargo.toml at its root')
+        for path, content in files.items():
+            if '.cargo' in path.split('/'):
+                # .cargo/config.toml could replace the vendored source or set rustc wrappers and linkers
+                raise CargoError(f'{path}: Cargo configuration files are not allowed')
+            if os.path.basename(path) == 'build.rs':
+                raise CargoError('Build scripts (build.rs) are not allowed')
+            if os.path.basename(path) != 'Cargo.toml':
+                continue
+            try:
+                manifest = tomllib.loads(content)
+            except tomllib.TOMLDecodeError as e:
+                raise CargoError(f'{path}: {e}')
+            if manifest.get('package', {}).get('build', False) is not False:
+                raise CargoError(f'{path}: build scripts are not allowed')
+            if manifest.get('lib', {}).get('proc-macro'):
+                raise CargoError(f'{path}: procedural macro crates are not allowed')
+            for name, spec in _dependency_specs(manifest):
+                if 'git' in spec:
+                    raise CargoError(f'{path}: git dependencies are not allowed ({name})')
+                if 'path' in spec:
+                    target = os.path.normpath(os.path.join(os.path.dirname(path), str(spec['path'])))
+                    if os.path.isabs(target) or target == '..' or target.startswith('../'):
+                        raise CargoError(f'{path}: dependency {name} is outside the project')
+
+    def build(self, source_dir: str, profile: str, output_path: str) -> Tuple[bool, str]:
+        """cargo build the project in source_dir and copy its binary to output_path; returns (success, errors)"""
+        os.makedirs(self.home_dir, exist_ok=True)
+        command = ['cargo', *self.config_args(), 'build', '--offline', '--quiet', '--message-format=json-render-diagnostics',
+                   '--profile', CARGO_PROFILES.get(profile, 'dev')]
+        slot = self._free_slots.get()
+        with self._lock:
+            self._building += 1
+        try:
+            # Every snippet is package "main", and cargo's fingerprints ignore where a package
+            # lives, so sources older than the slot's last build of that name would pass as built
+            _touch_tree(source_dir)
+            result = run_process(command, cwd=source_dir, timeout=CARGO_BUILD_TIMEOUT,
+                                 env=self.env(slot), limits=COMPILE_LIMITS)
+            executable = _root_executable(result.stdout, os.path.join(source_dir, 'Cargo.toml'))
+            success = result.returncode == 0 and executable is not None
+            if success:
+                temp_path = f'{output_path}.{threading.get_ident()}.tmp'
+                shutil.copyfile(executable, temp_path)
+                os.chmod(temp_path, 0o755)
+                os.replace(temp_path, output_path)
+            self._trim_target_dir(slot)
+        finally:
+            with self._lock:
+                self._building -= 1
+            self._free_slots.put(slot)
+
+        with self._lock:
+            self.builds += 1
+            if not success:
+                self.failures += 1
+        if result.returncode == 0 and executable is None:
+            return False, 'The project has no binary target to run'
+        return success, result.stderr
+
+    def _trim_target_dir(self, slot: str):
+        """Wipe a slot's target directory once it grows past its share of max_bytes; called holding the slot"""
+        now = time.monotonic()
+        if now - self._last_size_check.get(slot, 0.0) < CARGO_TARGET_CHECK_INTERVAL:
+            return
+        self._last_size_check[slot] = now
+        if dir_size(slot) > self.max_bytes // self.slots:
+            shutil.rmtree(slot, ignore_errors=True)
+            with self._lock:
+                self.cleanups += 1
+            logging.info(f"Cleared Cargo target directory {slot}")
+
+    def stats(self) -> Dict[str, Any]:
+        crates = len(self.crates())
+        with self._lock:
+            return {
+                'vendored_crates': crates,
+                'slots': self.slots,
+                'building': self._building,
+                'builds': self.builds,
+                'failures': self.failures,
+                'cleanups': self.cleanups,
+                'max_bytes': self.max_bytes,
+            }
+
+
+def _dependency_specs(manifest: Dict[str, Any]) -> List[Tuple[str, Dict[str, Any]]]:
+    """(name, spec) for every dependency, patch and replacement a manifest declares with a table"""
+    tables = [manifest.get(table, {}) for table in DEPENDENCY_TABLES]
+    tables += [manifest.get('workspace', {}).get('dependencies', {})]
+    for target in manifest.get('target', {}).values():
+        if isinstance(target, dict):
+            tables += [target.get(table, {}) for table in DEPENDENCY_TABLES]
+    tables += [patches for patches in manifest.get('patch', {}).values()]
+    tables.append(manifest.get('replace', {}))
+    return [(name, spec) for table in tables if isinstance(table, dict)
+            for name, spec in table.items() if isinstance(spec, dict)]
+
+
+def _touch_tree(root: str):
+    """Set the modification time of every file under root to now"""
+    for directory, _, names in os.walk(root):
+        for name in names:
+            os.utime(os.path.join(directory, name))
+
+
+def _version_tuple(version: str) -> Tuple[int, ...]:
+    return tuple(int(part) if part.isdigit() else 0 for part in re.split(r'[.+-]', version))
+
+
+def _root_executable(messages: str, manifest_path: str) -> Optional[str]:
+    """Binary built for the root package, from cargo's JSON messages.
+
+    With several binaries, the package's default-run is chosen, then the
+    one named after the package, then the first.
+    """
+    try:
+        with open(manifest_path, 'rb') as f:
+            package = tomllib.load(f).get('package', {})
+    except (OSError, tomllib.TOMLDecodeError):
+        package = {}
+    executables: Dict[str, str] = {}
+    for line in messages.splitlines():
+        try:
+            message = json.loads(line)
+        except ValueError:
+            continue
+        if message.get('reason') != 'compiler-artifact' or not message.get('executable'):
+            continue
+        if os.path.realpath(message['manifest_path']) != os.path.realpath(manifest_path):
+            continue
+        executables[message['target']['name']] = message['executable']
+    for name in (package.get('default-run'), package.get('name')):
+        if name in executables:
+            return executables[name]
+    return next(iter(executables.values()), None)
+
+
+cargo_builder = CargoBuilder(CARGO_VENDOR_DIR, CARGO_TARGET_DIR, CARGO_HOME_DIR, CARGO_TARGET_MAX_BYTES, CARGO_BUILD_SLOTS)
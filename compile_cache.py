@@ -0,0 +1,377 @@
+import hashlib
+import logging
+import os
+import shutil
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Callable, Dict, Any, Iterator, List, Optional, Tuple
+
+
+class SingleFlight:
+    """Deduplicate concurrent calls that share a key.
+
+    The first caller for a key runs the function; callers arriving while it
+    is in flight wait for it and receive the same result (or exception).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[str, Dict[str, Any]] = {}
+
+    def do(self, key: str, fn: Callable[[], Any]) -> Tuple[Any, bool]:
+        """Run fn once per in-flight key; returns (result, shared)"""
+        with self._lock:
+            call = self._calls.get(key)
+            if call is None:
+                call = {'done': threading.Event(), 'result': None, 'error': None}
+                self._calls[key] = call
+                leader = True
+            else:
+                leader = False
+
+        if not leader:
+            call['done'].wait()
+            if call['error'] is not None:
+                raise call['error']
+            return call['result'], True
+
+        try:
+            call['result'] = fn()
+        except BaseException as e:
+            call['error'] = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call['done'].set()
+        return call['result'], False
+
+
+def dir_size(path: str) -> int:
+    """Total size in bytes of the files under path"""
+    total = 0
+    for dirpath, _, filenames in os.walk(path):
+        for name in filenames:
+            try:
+                total += os.lstat(os.path.join(dirpath, name)).st_size
+            except OSError:
+                pass
+    return total
+
+
+def make_read_only(path: str):
+    """Drop write permission from everything under path, so runs sharing it can't change it"""
+    for dirpath, dirnames, filenames in os.walk(path):
+        for name in filenames:
+            target = os.path.join(dirpath, name)
+            if not os.path.islink(target):
+                os.chmod(target, os.stat(target).st_mode & ~0o222)
+        os.chmod(dirpath, os.stat(dirpath).st_mode & ~0o222)
+
+
+def remove_tree(path: str):
+    """shutil.rmtree that also removes trees left read-only by make_read_only"""
+    for dirpath, _, _ in os.walk(path):
+        try:
+            os.chmod(dirpath, 0o755)
+        except OSError:
+            pass
+    shutil.rmtree(path, ignore_errors=True)
+
+
+def evict_lru_dirs(root: str, keep: str, max_bytes: int,
+                   dir_lock: Callable[[str], threading.Lock]) -> List[str]:
+    """Remove the least recently modified directories under root until it fits in max_bytes.
+
+    keep, and directories whose dir_lock(path) is held, are left alone.
+    Each victim is removed while holding its lock, taken without waiting,
+    so a checkout that starts meanwhile can't see it half deleted; the
+    checkout just recreates it. Returns the removed paths.
+    """
+    total = 0
+    entries = []
+    for entry in os.scandir(root):
+        if not entry.is_dir(follow_symlinks=False):
+            continue
+        size = dir_size(entry.path)
+        total += size
+        if entry.path != keep:
+            entries.append((entry.stat().st_mtime, entry.path, size))
+    removed = []
+    for _, path, size in sorted(entries):
+        if total <= max_bytes:
+            break
+        lock = dir_lock(path)
+        if not lock.acquire(blocking=False):
+            continue
+        try:
+            remove_tree(path)
+        finally:
+            lock.release()
+        total -= size
+        removed.append(path)
+    return removed
+
+
+# Cache entries pinned by the current thread's cache_leases() blocks: [(cache, key)]
+_lease_state = threading.local()
+
+
+@contextmanager
+def cache_leases() -> Iterator[None]:
+    """Keep every cache entry this thread looks up from being evicted until the block exits.
+
+    Execution jobs run inside one, so a binary, class directory or package
+    environment stays on disk for as long as the run that looked it up.
+    """
+    pins = getattr(_lease_state, 'pins', None)
+    outermost = pins is None
+    if outermost:
+        pins = _lease_state.pins = []
+    start = len(pins)
+    try:
+        yield
+    finally:
+        released = pins[start:]
+        del pins[start:]
+        if outermost:
+            _lease_state.pins = None
+        for cache, key in released:
+            cache._unpin(key)
+
+
+class CompileCache:
+    """Content-addressed on-disk cache of build artifacts.
+
+    Each entry is a directory named by the hash of everything that affects
+    the build output (source, compiler version, flags). Entries are built in
+    a private directory and renamed into place, so readers never see a
+    partial build. Total size is bounded with least-recently-used eviction;
+    entries leased by a running job (see cache_leases) are never evicted.
+    """
+
+    def __init__(self, root: str, max_bytes: int):
+        self.root = root
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._entries: 'OrderedDict[str, int]' = OrderedDict()
+        # key -> number of cache_leases() blocks holding it
+        self._pins: Dict[str, int] = {}
+        self._total_bytes = 0
+        self._flight = SingleFlight()
+        self.hits = 0
+        self.misses = 0
+
+        os.makedirs(root, exist_ok=True)
+        self._load_index()
+
+    @staticmethod
+    def make_key(*parts: str) -> str:
+        """Hash the inputs that determine a build's output"""
+        digest = hashlib.sha256()
+        for part in parts:
+            data = part.encode('utf-8')
+            # Length-prefix each part so ('ab', 'c') and ('a', 'bc') differ
+            digest.update(len(data).to_bytes(8, 'big'))
+            digest.update(data)
+        return digest.hexdigest()
+
+    def _load_index(self):
+        """Rebuild the LRU index from disk, oldest entries first"""
+        entries = []
+        for name in os.listdir(self.root):
+            path = os.path.join(self.root, name)
+            if name.startswith('.'):
+                # Leftover from a build interrupted by a crash
+                remove_tree(path)
+                continue
+            try:
+                entries.append((os.stat(path).st_mtime, name, dir_size(path)))
+            except OSError:
+                continue
+
+        for _, name, size in sorted(entries):
+            self._entries[name] = size
+            self._total_bytes += size
+
+    def _entry_path(self, key: str) -> str:
+        return os.path.join(self.root, key)
+
+    def lookup(self, key: str) -> Optional[str]:
+        """Return the artifact directory for key, leased to the caller's thread, and mark it recently used"""
+        path = self._entry_path(key)
+        with self._lock:
+            # Checked under the lock: eviction moves entries out of place while holding it
+            if not os.path.isdir(path):
+                size = self._entries.pop(key, None)
+                if size is not None:
+                    self._total_bytes -= size
+                return None
+            if key in self._entries:
+                self._entries.move_to_end(key)
+            else:
+                # Built by another process sharing the cache directory
+                size = dir_size(path)
+                self._entries[key] = size
+                self._total_bytes += size
+            pins = getattr(_lease_state, 'pins', None)
+            if pins is not None:
+                self._pins[key] = self._pins.get(key, 0) + 1
+                pins.append((self, key))
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return path
+
+    def _unpin(self, key: str):
+        with self._lock:
+            count = self._pins.pop(key, 0) - 1
+            if count > 0:
+                self._pins[key] = count
+
+    def get_or_build(self, key: str, build: Callable[[str], Tuple[bool, str]]) -> Tuple[Optional[str], Optional[str], bool]:
+        """Return (artifact_dir, build_error, cache_hit) for key.
+
+        build is called with an empty directory to write artifacts into and
+        returns (success, error_output). Failed builds are not cached.
+        Concurrent requests for the same key share a single build.
+        """
+        path = self.lookup(key)
+        if path:
+            self.hits += 1
+            return path, None, True
+
+        def build_entry():
+            path = self.lookup(key)
+            if path:
+                return path, None
+            build_dir = tempfile.mkdtemp(prefix='.build-', dir=self.root)
+            try:
+                success, error = build(build_dir)
+                if not success:
+                    return None, error
+                final_path = self._entry_path(key)
+                try:
+                    os.rename(build_dir, final_path)
+                except OSError:
+                    # Another process finished the same build first
+                    pass
+                else:
+                    self._add(key, final_path)
+                return final_path, None
+            finally:
+                if os.path.isdir(build_dir):
+                    remove_tree(build_dir)
+
+        (path, error), shared = self._flight.do(key, build_entry)
+        if shared and path:
+            self.hits += 1
+        else:
+            self.misses += 1
+        if path:
+            # Lease the entry for this caller; if it was evicted in the meantime, build it again
+            path = self.lookup(key)
+            if path is None:
+                return self.get_or_build(key, build)
+        return path, error, shared and path is not None
+
+    def _add(self, key: str, path: str):
+        size = dir_size(path)
+        with self._lock:
+            self._total_bytes += size - self._entries.get(key, 0)
+            self._entries[key] = size
+            self._entries.move_to_end(key)
+        self._evict(keep=key)
+
+    def _evict(self, keep: str):
+        """Remove least recently used entries that no job has leased until under the size bound"""
+        while True:
+            with self._lock:
+                if self._total_bytes <= self.max_bytes:
+                    return
+                victim = next((key for key in self._entries if key != keep and key not in self._pins), None)
+                if victim is None:
+                    return
+                size = self._entries.pop(victim)
+                self._total_bytes -= size
+                # Moved aside while locked so lookup() never returns a directory being deleted
+                doomed = os.path.join(self.root, f'.evicted-{victim}')
+                try:
+                    os.rename(self._entry_path(victim), doomed)
+                except OSError:
+                    continue
+            logging.debug(f"Evicting compile cache entry {victim}")
+            remove_tree(doomed)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'bytes': self._total_bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+            }
+
+
+class WorkDirCache:
+    """Persistent working directories that tools reuse between builds.
+
+    The same key always gets the same directory back, so state a compiler
+    keeps there (rustc -C incremental session data) survives from one
+    build to the next. A directory is locked while checked out. At most
+    every check_interval seconds the total size is measured, and idle
+    directories are removed least recently used first while it is over
+    max_bytes.
+    """
+
+    def __init__(self, root: str, max_bytes: int, check_interval: float = 60):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.check_interval = check_interval
+        os.makedirs(root, exist_ok=True)
+        self._lock = threading.Lock()
+        self._dir_locks: Dict[str, threading.Lock] = {}
+        self._last_check = 0.0
+        self.checkouts = 0
+        self.evictions = 0
+
+    def _dir_lock(self, path: str) -> threading.Lock:
+        with self._lock:
+            return self._dir_locks.setdefault(path, threading.Lock())
+
+    @contextmanager
+    def checkout(self, key: str) -> Iterator[str]:
+        """Hold the directory for key (created on first use) for the caller"""
+        path = os.path.join(self.root, hashlib.sha256(key.encode('utf-8')).hexdigest()[:32])
+        with self._dir_lock(path):
+            os.makedirs(path, exist_ok=True)
+            with self._lock:
+                self.checkouts += 1
+            try:
+                yield path
+            finally:
+                os.utime(path)
+        self._evict(keep=path)
+
+    def _evict(self, keep: str):
+        with self._lock:
+            if time.monotonic() - self._last_check < self.check_interval:
+                return
+            self._last_check = time.monotonic()
+        for path in evict_lru_dirs(self.root, keep, self.max_bytes, self._dir_lock):
+            with self._lock:
+                self.evictions += 1
+            logging.info(f"Evicted work directory {path}")
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'checkouts': self.checkouts,
+                'evictions': self.evictions,
+                'max_bytes': self.max_bytes,
+            }
@@ -0,0 +1,179 @@
+import hashlib
+import json
+import os
+import re
+import sys
+import tempfile
+import threading
+from typing import Dict, Any, List, Optional, Tuple
+
+from compile_cache import CompileCache, make_read_only
+from process_runner import COMPILE_LIMITS, run_process
+from toolchains import toolchain_registry
+
+# Packages Python projects may install: a directory of wheels (pip download / pip wheel -w)
+PYTHON_WHEELHOUSE_DIR = os.environ.get('PYTHON_WHEELHOUSE_DIR', os.path.join(os.getcwd(), 'vendor', 'wheels'))
+# Packages Node projects may install: an npm cache directory (npm cache add / npm install --cache)
+NPM_CACHE_DIR = os.environ.get('NPM_CACHE_DIR', os.path.join(os.getcwd(), 'vendor', 'npm-cache'))
+# Installed environments, one per dependency spec, evicted least recently used past the byte limit
+DEPENDENCY_ENV_DIR = os.environ.get('DEPENDENCY_ENV_DIR', os.path.join(tempfile.gettempdir(), 'codecraft-dependency-envs'))
+DEPENDENCY_ENV_MAX_BYTES = int(os.environ.get('DEPENDENCY_ENV_MAX_BYTES', str(4 * 1024 * 1024 * 1024)))
+# Wall-clock limit for one pip or npm install
+DEPENDENCY_INSTALL_TIMEOUT = int(os.environ.get('DEPENDENCY_INSTALL_TIMEOUT', '300'))
+
+# package.json fields that decide what npm installs
+NPM_DEPENDENCY_FIELDS = ('dependencies', 'devDependencies', 'optionalDependencies', 'overrides')
+
+# Requirement lines that would reach past the wheelhouse: URLs, direct references (name @ url) and local paths
+_REQUIREMENT_URL_RE = re.compile(r'^[\w+.-]+:|://|@|[/\\]|^[.~]')
+# pip options, on their own line or after a requirement (--hash, --config-settings, ...)
+_REQUIREMENT_OPTION_RE = re.compile(r'(?:^|\s)-')
+
+
+class DependencyError(Exception):
+    """Raised for dependency specs that can't be installed offline (options, URLs, bad package.json)"""
+
+
+def python_requirements(text: str) -> List[str]:
+    """The requirement lines of a requirements.txt, without comments and blank lines.
+
+    pip options are refused: --index-url and friends would go online, and
+    -e/-r point at files outside the spec the environment is keyed by.
+    """
+    requirements = []
+    # pip joins lines ending in a backslash before parsing them
+    for line in text.replace('\\\n', '').splitlines():
+        line = line.split(' #', 1)[0].strip()
+        if not line or line.startswith('#'):
+            continue
+        if _REQUIREMENT_OPTION_RE.search(line):
+            raise DependencyError(f'requirements.txt options are not supported: {line}')
+        if _REQUIREMENT_URL_RE.search(line):
+            raise DependencyError(f'Requirements must name packages from the wheelhouse: {line}')
+        requirements.append(line)
+    return requirements
+
+
+def npm_dependencies(package_json: str) -> Dict[str, Any]:
+    """The fields of a package.json that decide what npm installs"""
+    try:
+        package = json.loads(package_json)
+    except ValueError as e:
+        raise DependencyError(f'package.json: {e}')
+    if not isinstance(package, dict):
+        raise DependencyError('package.json must contain an object')
+    return {field: package[field] for field in NPM_DEPENDENCY_FIELDS if package.get(field)}
+
+
+class DependencyEnvironments:
+    """Third-party packages for Python and Node projects, installed once per dependency spec.
+
+    An environment is a compile cache entry keyed by a hash of the
+    normalized spec (requirements.txt lines, or the dependency fields of
+    package.json plus any package-lock.json) and the interpreter version.
+    Python packages are installed with pip --target into a site-packages
+    directory that runs put on PYTHONPATH; Node packages into a
+    node_modules tree that runs link to. Installs are offline, from
+    the wheelhouse or the npm cache only, and never run package code:
+    wheels only (no sdist builds) and npm --ignore-scripts. Finished
+    environments are made read-only, since every run with the same spec
+    shares one, and the cache evicts the least recently used.
+    """
+
+    def __init__(self, cache: CompileCache, wheelhouse_dir: str, npm_cache_dir: str):
+        self.cache = cache
+        self.wheelhouse_dir = wheelhouse_dir
+        self.npm_cache_dir = npm_cache_dir
+        self._lock = threading.Lock()
+        self._wheelhouse: Tuple[Optional[float], str] = (None, '')
+        self.installs = 0
+        self.failures = 0
+
+    def python_available(self) -> bool:
+        return os.path.isdir(self.wheelhouse_dir)
+
+    def node_available(self) -> bool:
+        return os.path.isdir(self.npm_cache_dir) and toolchain_registry.is_available('npm')
+
+    def wheelhouse_fingerprint(self) -> str:
+        """Identifies the wheels on offer, so adding a newer version rebuilds unpinned specs"""
+        try:
+            mtime = os.stat(self.wheelhouse_dir).st_mtime
+        except OSError:
+            return ''
+        with self._lock:
+            if mtime == self._wheelhouse[0]:
+                return self._wheelhouse[1]
+        names = sorted(name for name in os.listdir(self.wheelhouse_dir) if name.endswith('.whl'))
+        fingerprint = hashlib.sha256('\n'.join(names).encode('utf-8')).hexdigest()
+        with self._lock:
+            self._wheelhouse = (mtime, fingerprint)
+        return fingerprint
+
+    def python_env(self, requirements: List[str]) -> Tuple[Optional[str], Optional[str], bool]:
+        """(site-packages directory, install error, cache hit) for requirements from python_requirements()"""
+        version = '.'.join(map(str, sys.version_info[:3]))
+        key = CompileCache.make_key('python-env', version, *sorted(requirements), self.wheelhouse_fingerprint())
+
+        def build(build_dir: str) -> Tuple[bool, str]:
+            requirements_path = os.path.join(build_dir, 'requirements.txt')
+            with open(requirements_path, 'w') as f:
+                f.write('\n'.join(requirements) + '\n')
+            env = dict(os.environ, PIP_CONFIG_FILE=os.devnull, PIP_NO_INPUT='1', PIP_DISABLE_PIP_VERSION_CHECK='1')
+            result = run_process(
+                [sys.executable, '-m', 'pip', 'install', '--no-index', '--find-links', self.wheelhouse_dir,
+                 '--only-binary', ':all:', '--no-warn-script-location', '--quiet',
+                 '--target', os.path.join(build_dir, 'site-packages'), '-r', requirements_path],
+                cwd=build_dir, timeout=DEPENDENCY_INSTALL_TIMEOUT, env=env, limits=COMPILE_LIMITS
+            )
+            os.unlink(requirements_path)
+            return self._finish(build_dir, result.returncode == 0), result.stderr
+
+        path, error, hit = self.cache.get_or_build(key, build)
+        return (os.path.join(path, 'site-packages') if path else None), error, hit
+
+    def node_env(self, dependencies: Dict[str, Any], lockfile: Optional[str]) -> Tuple[Optional[str], Optional[str], bool]:
+        """(node_modules directory, install error, cache hit) for dependencies from npm_dependencies()"""
+        versions = [toolchain_registry.version_string(name) for name in ('node', 'npm')]
+        key = CompileCache.make_key('node-env', *versions, json.dumps(dependencies, sort_keys=True), lockfile or '')
+
+        def build(build_dir: str) -> Tuple[bool, str]:
+            with open(os.path.join(build_dir, 'package.json'), 'w') as f:
+                json.dump({'name': 'env', 'version': '0.0.0', 'private': True, **dependencies}, f)
+            if lockfile:
+                with open(os.path.join(build_dir, 'package-lock.json'), 'w') as f:
+                    f.write(lockfile)
+            env = dict(os.environ, NPM_CONFIG_USERCONFIG=os.devnull, NPM_CONFIG_UPDATE_NOTIFIER='false')
+            # npm runs on V8, which reserves far more address space than it uses, so no RLIMIT_AS
+            result = run_process(
+                ['npm', 'install', '--offline', '--cache', self.npm_cache_dir,
+                 '--ignore-scripts', '--no-audit', '--no-fund', '--loglevel=error'],
+                cwd=build_dir, timeout=DEPENDENCY_INSTALL_TIMEOUT, env=env,
+                limits=COMPILE_LIMITS.replace(memory_bytes=None)
+            )
+            os.makedirs(os.path.join(build_dir, 'node_modules'), exist_ok=True)
+            return self._finish(build_dir, result.returncode == 0), result.stderr
+
+        path, error, hit = self.cache.get_or_build(key, build)
+        return (os.path.join(path, 'node_modules') if path else None), error, hit
+
+    def _finish(self, build_dir: str, success: bool) -> bool:
+        with self._lock:
+            self.installs += 1
+            if not success:
+                self.failures += 1
+        if success:
+            make_read_only(build_dir)
+        return success
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = {'installs': self.installs, 'failures': self.failures}
+        stats['python_available'] = self.python_available()
+        stats['node_available'] = self.node_available()
+        stats['cache'] = self.cache.stats()
+        return stats
+
+
+dependency_envs = DependencyEnvironments(CompileCache(DEPENDENCY_ENV_DIR, DEPENDENCY_ENV_MAX_BYTES),
+                                         PYTHON_WHEELHOUSE_DIR, NPM_CACHE_DIR)
@@ -0,0 +1,587 @@
+import hashlib
+import json
+import logging
+import os
+import re
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
+import uuid
+import zlib
+from collections import OrderedDict
+from concurrent.futures import Future, TimeoutError as FuturesTimeout
+from typing import Callable, Dict, Any, List, Optional, Tuple
+
+from compile_cache import CompileCache, SingleFlight
+from process_runner import kill_process_group
+from toolchains import toolchain_registry
+
+# Warm language servers kept per server kind (0 disables language servers)
+LSP_POOL_SIZE = int(os.environ.get('LSP_POOL_SIZE', '1'))
+# Documents one server keeps open; the least recently validated is closed beyond this
+LSP_MAX_DOCUMENTS = int(os.environ.get('LSP_MAX_DOCUMENTS', '50'))
+# Seconds to wait for a server to publish diagnostics before falling back to the compiler
+LSP_DIAGNOSTICS_TIMEOUT = float(os.environ.get('LSP_DIAGNOSTICS_TIMEOUT', '3'))
+# Where servers get their scratch workspaces
+LSP_WORKSPACE_ROOT = os.environ.get('LSP_WORKSPACE_ROOT', os.path.join(tempfile.gettempdir(), 'codecraft-lsp'))
+# Compiler validation results remembered by code hash (0 disables)
+VALIDATION_CACHE_MAX_ENTRIES = int(os.environ.get('VALIDATION_CACHE_MAX_ENTRIES', '2000'))
+
+# Seconds to wait for a server to answer 'initialize'
+STARTUP_TIMEOUT = 60
+# Seconds before a server that failed to start is tried again
+RESTART_BACKOFF = 60
+
+SEVERITIES = {1: 'error', 2: 'warning', 3: 'information', 4: 'hint'}
+
+# file:line[:column]: [severity[code]:] message, as printed by gcc, gofmt, javac and rustc --error-format=short
+_COMPILER_LINE_RE = re.compile(
+    r'^(?P<file>[^:\n]+):(?P<line>\d+):(?:(?P<column>\d+):)?\s*'
+    r'(?:(?P<severity>fatal error|error|warning|note)(?:\[(?P<code>\w+)\])?:\s*)?(?P<message>.+)$',
+    re.MULTILINE
+)
+
+
+def make_diagnostic(line: int, column: int, message: str, severity: str = 'error',
+                    end_line: Optional[int] = None, end_column: Optional[int] = None,
+                    source: Optional[str] = None, code: Optional[str] = None) -> Dict[str, Any]:
+    """A diagnostic as returned by /api/validate; lines and columns are 1-based"""
+    return {
+        'line': line,
+        'column': column,
+        'end_line': end_line if end_line is not None else line,
+        'end_column': end_column if end_column is not None else column,
+        'severity': severity,
+        'message': message,
+        'source': source,
+        'code': code,
+    }
+
+
+def parse_compiler_diagnostics(output: str, source: Optional[str] = None) -> List[Dict[str, Any]]:
+    """Extract diagnostics from compiler output in the common file:line:column format"""
+    diagnostics = []
+    for match in _COMPILER_LINE_RE.finditer(output or ''):
+        severity = match.group('severity') or 'error'
+        diagnostic = make_diagnostic(
+            int(match.group('line')),
+            int(match.group('column') or 1),
+            match.group('message').strip(),
+            severity='error' if severity == 'fatal error' else severity,
+            source=source,
+            code=match.group('code'),
+        )
+        # gofmt repeats errors at the end of input
+        if diagnostic not in diagnostics:
+            diagnostics.append(diagnostic)
+    return diagnostics
+
+
+class CheckNotRun(Exception):
+    """Raised by a compiler check that could not run (missing toolchain, timeout); it says nothing about the code"""
+
+
+class ValidationCache:
+    """LRU cache of compiler validation results with single-flight checks.
+
+    Editors re-validate unchanged code and several tabs often send the
+    same source; each distinct (language, toolchain, code) is checked by
+    the compiler once, and identical requests arriving while that check
+    runs wait for it instead of starting their own. A check that raises
+    CheckNotRun is passed on to every waiter and never cached.
+    """
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries: 'OrderedDict[str, List[Dict[str, Any]]]' = OrderedDict()
+        self._flight = SingleFlight()
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+    @staticmethod
+    def make_key(language: str, toolchain_versions: List[str], code: str) -> str:
+        code_hash = hashlib.sha256(code.encode('utf-8')).hexdigest()
+        return CompileCache.make_key('validate', language, *toolchain_versions, code_hash)
+
+    def get_or_check(self, key: str, check: Callable[[], List[Dict[str, Any]]]) -> List[Dict[str, Any]]:
+        """Cached diagnostics for key, running check (once across concurrent callers) on a miss"""
+        if self.max_entries <= 0:
+            return check()
+        with self._lock:
+            diagnostics = self._entries.get(key)
+            if diagnostics is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return [dict(diagnostic) for diagnostic in diagnostics]
+
+        def check_and_store() -> List[Dict[str, Any]]:
+            result = check()
+            with self._lock:
+                self._entries[key] = result
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+            return result
+
+        diagnostics, shared = self._flight.do(key, check_and_store)
+        with self._lock:
+            if shared:
+                self.coalesced += 1
+            else:
+                self.misses += 1
+        return [dict(diagnostic) for diagnostic in diagnostics]
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses + self.coalesced
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'hits': self.hits,
+                'misses': self.misses,
+                'coalesced': self.coalesced,
+                # Requests answered without running a check of their own
+                'hit_rate': round((self.hits + self.coalesced) / lookups, 3) if lookups else None,
+            }
+
+
+class LanguageServerSpec:
+    """How to start a language server and lay out documents in its workspace.
+
+    Each open document gets its own directory ('directory' layout) so
+    programs that all define main don't clash; Cargo projects use the
+    'cargo-bin' layout, where every src/bin/*.rs file is its own crate.
+    """
+
+    def __init__(self, name: str, command: List[str], scaffold: Optional[Dict[str, str]] = None,
+                 layout: str = 'directory', initialization_options: Optional[Dict[str, Any]] = None):
+        self.name = name
+        self.command = command
+        self.scaffold = scaffold or {}
+        self.layout = layout
+        self.initialization_options = initialization_options
+
+    def document_path(self, root: str, slot: int, file_name: str) -> str:
+        if self.layout == 'cargo-bin':
+            return os.path.join(root, 'src', 'bin', f'doc{slot}.rs')
+        return os.path.join(root, f'doc{slot}', file_name)
+
+
+# Servers by toolchain name (see toolchains.TOOLCHAIN_PROBES); handlers list the ones they can use
+LANGUAGE_SERVERS: Dict[str, LanguageServerSpec] = {
+    'pyright': LanguageServerSpec('pyright', ['pyright-langserver', '--stdio']),
+    'pylsp': LanguageServerSpec('pylsp', ['pylsp']),
+    'clangd': LanguageServerSpec('clangd', ['clangd', '--log=error']),
+    'gopls': LanguageServerSpec('gopls', ['gopls', 'serve'], scaffold={'go.mod': 'module codecraft\n\ngo 1.21\n'}),
+    'rust-analyzer': LanguageServerSpec(
+        'rust-analyzer', ['rust-analyzer'],
+        scaffold={'Cargo.toml': '[package]\nname = "codecraft"\nversion = "0.1.0"\nedition = "2021"\n'},
+        layout='cargo-bin',
+        # Only the server's own analysis: cargo check on save and cache priming are far too slow per keystroke
+        initialization_options={'checkOnSave': False, 'cachePriming': {'enable': False}},
+    ),
+    'jdtls': LanguageServerSpec('jdtls', ['jdtls', '-data', '.jdtls-data']),
+}
+
+
+def _utf16_length(text: str) -> int:
+    return len(text.encode('utf-16-le')) // 2
+
+
+def _position(text: str, offset: int) -> Dict[str, int]:
+    """LSP position (0-based line, UTF-16 character) of a string offset"""
+    line = text.count('\n', 0, offset)
+    line_start = text.rfind('\n', 0, offset) + 1
+    return {'line': line, 'character': _utf16_length(text[line_start:offset])}
+
+
+def text_edit(old: str, new: str) -> Dict[str, Any]:
+    """A single incremental change turning old into new (the span between common prefix and suffix)"""
+    limit = min(len(old), len(new))
+    prefix = 0
+    while prefix < limit and old[prefix] == new[prefix]:
+        prefix += 1
+    suffix = 0
+    while suffix < limit - prefix and old[len(old) - 1 - suffix] == new[len(new) - 1 - suffix]:
+        suffix += 1
+    return {
+        'range': {'start': _position(old, prefix), 'end': _position(old, len(old) - suffix)},
+        'text': new[prefix:len(new) - suffix],
+    }
+
+
+class Document:
+    """A document a server has open"""
+
+    def __init__(self, slot: int, path: str, text: str):
+        self.slot = slot
+        self.path = path
+        self.uri = 'file://' + path
+        self.text = text
+        self.version = 1
+        self.lock = threading.Lock()
+
+
+class LanguageServer:
+    """A running language server speaking LSP over stdio"""
+
+    def __init__(self, spec: LanguageServerSpec, language_id: str):
+        self.spec = spec
+        self.language_id = language_id
+        os.makedirs(LSP_WORKSPACE_ROOT, exist_ok=True)
+        self.root = tempfile.mkdtemp(prefix=f'{spec.name}-', dir=LSP_WORKSPACE_ROOT)
+        for name, content in spec.scaffold.items():
+            path = os.path.join(self.root, name)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, 'w') as f:
+                f.write(content)
+
+        self.process = subprocess.Popen(
+            spec.command,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            cwd=self.root,
+            start_new_session=True,
+        )
+        self._write_lock = threading.Lock()
+        self._lock = threading.Condition()
+        self._next_id = 0
+        self._pending: Dict[int, Future] = {}
+        # uri -> (version or None, sequence number, diagnostics)
+        self._published: Dict[str, Tuple[Optional[int], int, List[Dict[str, Any]]]] = {}
+        self._sequence = 0
+        self._closed = False
+        self._next_slot = 0
+        self.documents: 'OrderedDict[str, Document]' = OrderedDict()
+        self._documents_lock = threading.Lock()
+        threading.Thread(target=self._read_loop, daemon=True).start()
+
+        try:
+            capabilities = self.request('initialize', {
+                'processId': os.getpid(),
+                'rootUri': 'file://' + self.root,
+                'workspaceFolders': [{'uri': 'file://' + self.root, 'name': 'codecraft'}],
+                'initializationOptions': spec.initialization_options,
+                'capabilities': {
+                    'textDocument': {
+                        'synchronization': {'didSave': False},
+                        'publishDiagnostics': {'versionSupport': True},
+                    },
+                    'workspace': {'configuration': True, 'workspaceFolders': True},
+                },
+            }, STARTUP_TIMEOUT).get('capabilities', {})
+        except Exception:
+            self.close()
+            raise
+        sync = capabilities.get('textDocumentSync', 1)
+        if isinstance(sync, dict):
+            sync = sync.get('change', 1)
+        # 2 = Incremental; otherwise every change resends the whole document
+        self.incremental = sync == 2
+        self.notify('initialized', {})
+
+    def is_alive(self) -> bool:
+        return not self._closed and self.process.poll() is None
+
+    def close(self):
+        with self._lock:
+            self._closed = True
+            self._lock.notify_all()
+        kill_process_group(self.process.pid)
+        for stream in (self.process.stdin, self.process.stdout):
+            try:
+                stream.close()
+            except OSError:
+                pass
+        self.process.wait()
+        shutil.rmtree(self.root, ignore_errors=True)
+
+    def _send(self, message: Dict[str, Any]):
+        body = json.dumps(dict(message, jsonrpc='2.0')).encode('utf-8')
+        with self._write_lock:
+            self.process.stdin.write(b'Content-Length: %d\r\n\r\n' % len(body) + body)
+            self.process.stdin.flush()
+
+    def request(self, method: str, params: Dict[str, Any], timeout: float) -> Any:
+        future = Future()
+        with self._lock:
+            self._next_id += 1
+            request_id = self._next_id
+            self._pending[request_id] = future
+        self._send({'id': request_id, 'method': method, 'params': params})
+        try:
+            return future.result(timeout)
+        finally:
+            with self._lock:
+                self._pending.pop(request_id, None)
+
+    def notify(self, method: str, params: Dict[str, Any]):
+        self._send({'method': method, 'params': params})
+
+    def _read_message(self) -> Optional[Dict[str, Any]]:
+        length = None
+        while True:
+            line = self.process.stdout.readline()
+            if not line:
+                return None
+            line = line.strip()
+            if not line:
+                break
+            name, _, value = line.decode('ascii', 'replace').partition(':')
+            if name.lower() == 'content-length':
+                length = int(value)
+        if length is None:
+            return {}
+        return json.loads(self.process.stdout.read(length))
+
+    def _read_loop(self):
+        try:
+            while True:
+                message = self._read_message()
+                if message is None:
+                    break
+                self._dispatch(message)
+        except (OSError, ValueError) as e:
+            logging.warning(f"Lost contact with {self.spec.name}: {e}")
+        finally:
+            with self._lock:
+                self._closed = True
+                pending = list(self._pending.values())
+                self._lock.notify_all()
+            for future in pending:
+                if not future.done():
+                    future.set_exception(ConnectionError(f'{self.spec.name} exited'))
+
+    def _dispatch(self, message: Dict[str, Any]):
+        method = message.get('method')
+        if method is None:
+            with self._lock:
+                future = self._pending.get(message.get('id'))
+            if future is not None and not future.done():
+                if 'error' in message:
+                    future.set_exception(RuntimeError(message['error'].get('message', 'Request failed')))
+                else:
+                    future.set_result(message.get('result') or {})
+        elif 'id' in message:
+            # Requests from the server: answer with defaults so it never blocks on us
+            result = None
+            if method == 'workspace/configuration':
+                result = [None] * len(message.get('params', {}).get('items', []))
+            self._send({'id': message['id'], 'result': result})
+        elif method == 'textDocument/publishDiagnostics':
+            params = message['params']
+            with self._lock:
+                self._sequence += 1
+                self._published[params['uri']] = (params.get('version'), self._sequence, params['diagnostics'])
+                self._lock.notify_all()
+
+    def _wait_for_diagnostics(self, document: Document, after: int, timeout: float) -> Optional[List[Dict[str, Any]]]:
+        """Diagnostics published for the document's current version, or None on timeout"""
+        deadline = time.monotonic() + timeout
+        with self._lock:
+            while True:
+                published = self._published.get(document.uri)
+                if published is not None:
+                    version, sequence, diagnostics = published
+                    if version == document.version or (version is None and sequence > after):
+                        return diagnostics
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or self._closed:
+                    return None
+                self._lock.wait(remaining)
+
+    def _open(self, key: str, text: str, file_name: str) -> Document:
+        with self._documents_lock:
+            slot = self._next_slot
+            self._next_slot += 1
+        path = self.spec.document_path(self.root, slot, file_name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'w') as f:
+            f.write(text)
+        document = Document(slot, path, text)
+        self.notify('workspace/didChangeWatchedFiles', {'changes': [{'uri': document.uri, 'type': 1}]})
+        self.notify('textDocument/didOpen', {'textDocument': {
+            'uri': document.uri, 'languageId': self.language_id, 'version': document.version, 'text': text,
+        }})
+        return document
+
+    def _close(self, document: Document):
+        with self._lock:
+            self._published.pop(document.uri, None)
+        try:
+            self.notify('textDocument/didClose', {'textDocument': {'uri': document.uri}})
+        except OSError:
+            pass
+        if self.spec.layout == 'cargo-bin':
+            os.unlink(document.path)
+        else:
+            shutil.rmtree(os.path.dirname(document.path), ignore_errors=True)
+
+    def diagnose(self, key: str, text: str, file_name: str, timeout: float,
+                 keep_open: bool = True) -> Optional[List[Dict[str, Any]]]:
+        """Sync a document's new text and return the server's diagnostics for it (LSP objects)"""
+        evicted = []
+        with self._documents_lock:
+            document = self.documents.get(key)
+            if document is not None:
+                self.documents.move_to_end(key)
+        if document is not None and os.path.basename(document.path) != file_name and self.spec.layout == 'directory':
+            # The file name follows the code (a renamed Java class); reopen under the new name
+            with self._documents_lock:
+                self.documents.pop(key, None)
+            self._close(document)
+            document = None
+
+        if document is None:
+            with self._lock:
+                after = self._sequence
+            document = self._open(key, text, file_name)
+            if keep_open:
+                with self._documents_lock:
+                    self.documents[key] = document
+                    while len(self.documents) > LSP_MAX_DOCUMENTS:
+                        evicted.append(self.documents.popitem(last=False)[1])
+            for old in evicted:
+                self._close(old)
+            try:
+                with document.lock:
+                    return self._wait_for_diagnostics(document, after, timeout)
+            finally:
+                if not keep_open:
+                    self._close(document)
+
+        with document.lock:
+            if text != document.text:
+                change = text_edit(document.text, text) if self.incremental else {'text': text}
+                with self._lock:
+                    after = self._sequence
+                document.version += 1
+                document.text = text
+                self.notify('textDocument/didChange', {
+                    'textDocument': {'uri': document.uri, 'version': document.version},
+                    'contentChanges': [change],
+                })
+            else:
+                # Unchanged text: the last diagnostics still apply
+                after = -1
+            return self._wait_for_diagnostics(document, after, timeout)
+
+
+class DiagnosticsService:
+    """Pool of warm language servers that validate code as it is typed.
+
+    Servers start in the background on first use, so requests fall back to
+    the compiler-based validation (None from diagnose) until one is ready
+    or whenever no server for the language is installed. A client that
+    sends a document id keeps its document open on one server, and later
+    requests only push the edited span, so per-keystroke validation costs
+    one incremental reanalysis rather than a compiler start.
+    """
+
+    def __init__(self, pool_size: int, timeout: float):
+        self.pool_size = pool_size
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        # server name -> slot -> LanguageServer | 'starting' | time of last failed start
+        self._servers: Dict[str, List[Any]] = {}
+        self.requests = 0
+        self.fallbacks = 0
+
+    def _spec_for(self, server_names: Tuple[str, ...]) -> Optional[LanguageServerSpec]:
+        for name in server_names:
+            if name in LANGUAGE_SERVERS and toolchain_registry.is_available(name):
+                return LANGUAGE_SERVERS[name]
+        return None
+
+    def _server(self, spec: LanguageServerSpec, language_id: str, slot: int) -> Optional[LanguageServer]:
+        """The server in a slot if it is ready, starting it in the background otherwise"""
+        with self._lock:
+            slots = self._servers.setdefault(spec.name, [None] * self.pool_size)
+            current = slots[slot]
+            if isinstance(current, LanguageServer):
+                if current.is_alive():
+                    return current
+                current = None
+            if current == 'starting' or (isinstance(current, float) and time.monotonic() - current < RESTART_BACKOFF):
+                return None
+            slots[slot] = 'starting'
+
+        def start():
+            try:
+                server = LanguageServer(spec, language_id)
+            except Exception as e:
+                logging.error(f"Failed to start {spec.name}: {e}")
+                server = time.monotonic()
+            with self._lock:
+                slots[slot] = server
+
+        threading.Thread(target=start, daemon=True).start()
+        return None
+
+    def diagnose(self, server_names: Tuple[str, ...], language_id: str, code: str, file_name: str,
+                 document_id: Optional[str] = None) -> Optional[List[Dict[str, Any]]]:
+        """Diagnostics from a warm language server, or None if none could answer in time"""
+        with self._lock:
+            self.requests += 1
+        spec = self._spec_for(server_names) if self.pool_size > 0 else None
+        diagnostics = None
+        if spec is not None:
+            # Documents stick to one server so their incremental state stays in one place
+            key = document_id or uuid.uuid4().hex
+            server = self._server(spec, language_id, zlib.crc32(key.encode('utf-8')) % self.pool_size)
+            if server is not None:
+                try:
+                    diagnostics = server.diagnose(key, code, file_name, self.timeout, keep_open=document_id is not None)
+                except (OSError, ConnectionError, FuturesTimeout) as e:
+                    logging.warning(f"{spec.name} failed to produce diagnostics: {e}")
+        if diagnostics is None:
+            with self._lock:
+                self.fallbacks += 1
+            return None
+        return [self._convert(diagnostic, spec.name) for diagnostic in diagnostics]
+
+    @staticmethod
+    def _convert(diagnostic: Dict[str, Any], server_name: str) -> Dict[str, Any]:
+        start = diagnostic['range']['start']
+        end = diagnostic['range']['end']
+        code = diagnostic.get('code')
+        return make_diagnostic(
+            start['line'] + 1, start['character'] + 1, diagnostic['message'],
+            severity=SEVERITIES.get(diagnostic.get('severity', 1), 'error'),
+            end_line=end['line'] + 1, end_column=end['character'] + 1,
+            source=diagnostic.get('source') or server_name,
+            code=str(code) if code is not None else None,
+        )
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            servers = {}
+            for name, slots in self._servers.items():
+                ready = [slot for slot in slots if isinstance(slot, LanguageServer) and slot.is_alive()]
+                servers[name] = {
+                    'ready': len(ready),
+                    'starting': sum(slot == 'starting' for slot in slots),
+                    'open_documents': sum(len(server.documents) for server in ready),
+                }
+            return {
+                'pool_size': self.pool_size,
+                'requests': self.requests,
+                'fallbacks': self.fallbacks,
+                'servers': servers,
+            }
+
+    def shutdown(self):
+        with self._lock:
+            servers = [slot for slots in self._servers.values() for slot in slots if isinstance(slot, LanguageServer)]
+            self._servers.clear()
+        for server in servers:
+            server.close()
+
+
+diagnostics_service = DiagnosticsService(LSP_POOL_SIZE, LSP_DIAGNOSTICS_TIMEOUT)
+validation_cache = ValidationCache(VALIDATION_CACHE_MAX_ENTRIES)
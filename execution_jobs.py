@@ -0,0 +1,465 @@
+import functools
+import logging
+import queue
+import threading
+import time
+import uuid
+from collections import deque
+from contextlib import contextmanager
+from concurrent.futures import TimeoutError as FuturesTimeout
+from typing import Callable, Deque, Dict, Any, Iterator, List, Optional, Tuple
+
+from compile_cache import cache_leases
+
+
+class QueueFullError(Exception):
+    """Raised when the execution queue is at its configured depth"""
+
+
+# Run timeout of the lane whose worker is running the current thread, and the job's owner
+_lane_state = threading.local()
+
+
+def lane_timeout() -> Optional[float]:
+    """Run timeout of the execution lane running this thread, or None outside a lane"""
+    return getattr(_lane_state, 'run_timeout', None)
+
+
+def current_owner() -> Optional[str]:
+    """User key of the job running on this thread, or None outside a job"""
+    return getattr(_lane_state, 'owner', None)
+
+
+@contextmanager
+def lane_timeout_scope(run_timeout: Optional[float]):
+    """Apply a lane's run timeout on a helper thread working for one of its jobs"""
+    previous = lane_timeout()
+    _lane_state.run_timeout = run_timeout
+    try:
+        yield
+    finally:
+        _lane_state.run_timeout = previous
+
+
+# Scheduling weight and concurrent-run cap of each user class
+DEFAULT_USER_CLASSES: Dict[str, Dict[str, float]] = {
+    'authenticated': {'weight': 4, 'max_running': 2},
+    'guest': {'weight': 1, 'max_running': 1},
+}
+
+# Recent queue waits kept per user class for the percentiles in stats()
+WAIT_SAMPLES = 1000
+
+
+class _OwnerQueue:
+    """Jobs waiting for one user, with their position in the fair schedule"""
+
+    def __init__(self, user_class: str, pass_value: float):
+        self.user_class = user_class
+        self.jobs: Deque[Tuple[Any, float]] = deque()
+        self.running = 0
+        # Virtual time at which the owner's next job is due; advances by 1/weight per dispatched job
+        self.pass_value = pass_value
+
+
+class FairScheduler:
+    """Weighted fair queue of jobs from many users (stride scheduling).
+
+    Each user's jobs wait in their own FIFO. Workers take the next job from
+    the eligible user with the lowest pass value, and that user's pass
+    advances by 1/weight, so over time users of a class with weight 4 get
+    four dispatches for every one of a weight-1 user, and a user with many
+    queued jobs can't starve anyone else. Users already running their
+    class's max_running jobs are skipped until one finishes. A user who
+    has been idle re-enters at the current virtual time rather than with
+    banked credit.
+    """
+
+    def __init__(self, user_classes: Dict[str, Dict[str, float]], max_queued_per_user: int,
+                 default_class: str = 'guest'):
+        self.user_classes = user_classes
+        self.max_queued_per_user = max_queued_per_user
+        self.default_class = default_class
+        self._cond = threading.Condition()
+        self._owners: Dict[str, _OwnerQueue] = {}
+        self._virtual_time = 0.0
+        self._waits: Dict[str, Deque[float]] = {name: deque(maxlen=WAIT_SAMPLES) for name in user_classes}
+        self._dispatched: Dict[str, int] = {name: 0 for name in user_classes}
+
+    def put(self, owner: str, user_class: str, item: Any):
+        """Queue an item for owner, raising QueueFullError if they already have too many waiting"""
+        self.put_many(owner, user_class, [item])
+
+    def put_many(self, owner: str, user_class: str, items: List[Any]):
+        """Queue items for owner in order; all are queued, or none if that would exceed their limit"""
+        if user_class not in self.user_classes:
+            user_class = self.default_class
+        with self._cond:
+            queue = self._owners.get(owner)
+            if (len(queue.jobs) if queue else 0) + len(items) > self.max_queued_per_user:
+                raise QueueFullError(f'Too many of your executions are waiting ({self.max_queued_per_user} max)')
+            if queue is None:
+                queue = self._owners[owner] = _OwnerQueue(user_class, self._virtual_time)
+            elif not queue.jobs:
+                queue.pass_value = max(queue.pass_value, self._virtual_time)
+            enqueued_at = time.monotonic()
+            queue.jobs.extend((item, enqueued_at) for item in items)
+            self._cond.notify(len(items))
+
+    def get(self) -> Tuple[str, Any]:
+        """Block until some user has an eligible job; returns (owner, item)"""
+        with self._cond:
+            while True:
+                chosen = None
+                for owner, queue in self._owners.items():
+                    if not queue.jobs or queue.running >= self.user_classes[queue.user_class]['max_running']:
+                        continue
+                    if chosen is None or queue.pass_value < self._owners[chosen].pass_value:
+                        chosen = owner
+                if chosen is not None:
+                    break
+                self._cond.wait()
+
+            queue = self._owners[chosen]
+            item, enqueued_at = queue.jobs.popleft()
+            queue.running += 1
+            self._virtual_time = max(self._virtual_time, queue.pass_value)
+            queue.pass_value += 1 / self.user_classes[queue.user_class]['weight']
+            self._waits[queue.user_class].append(time.monotonic() - enqueued_at)
+            self._dispatched[queue.user_class] += 1
+            return chosen, item
+
+    def done(self, owner: str):
+        """Record that one of owner's jobs finished"""
+        with self._cond:
+            queue = self._owners[owner]
+            queue.running -= 1
+            if not queue.jobs and not queue.running:
+                del self._owners[owner]
+            # A user who was at their cap may be eligible again
+            self._cond.notify_all()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            classes = {}
+            for name, config in self.user_classes.items():
+                owners = [queue for queue in self._owners.values() if queue.user_class == name]
+                waits = sorted(self._waits[name])
+                classes[name] = {
+                    'weight': config['weight'],
+                    'max_running': config['max_running'],
+                    'users': len(owners),
+                    'running': sum(queue.running for queue in owners),
+                    'queued': sum(len(queue.jobs) for queue in owners),
+                    'dispatched': self._dispatched[name],
+                    'wait_avg': round(sum(waits) / len(waits), 3) if waits else None,
+                    'wait_p95': round(waits[int(len(waits) * 0.95) - 1 if len(waits) > 1 else 0], 3) if waits else None,
+                    'wait_max': round(waits[-1], 3) if waits else None,
+                }
+            return classes
+
+
+class JobManager:
+    """Runs code executions on a bounded worker pool, shared fairly between users.
+
+    At most max_workers jobs run at once and at most max_queue more wait
+    for a worker; submissions beyond that are rejected with QueueFullError
+    so callers can shed load instead of tying up web workers. Waiting jobs
+    are dispatched by a FairScheduler, so each user is capped at their
+    class's concurrent runs and queued work is shared out by class weight.
+    Finished jobs are kept for result_ttl seconds so clients can poll for
+    them. With run_timeout set, handlers running on this manager's workers
+    time programs out after that many seconds (see lane_timeout).
+    """
+
+    def __init__(self, max_workers: int, max_queue: int, result_ttl: int = 600,
+                 user_classes: Optional[Dict[str, Dict[str, float]]] = None,
+                 max_queued_per_user: Optional[int] = None, name: str = 'execution',
+                 run_timeout: Optional[float] = None):
+        self.name = name
+        self.run_timeout = run_timeout
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.result_ttl = result_ttl
+        self.scheduler = FairScheduler(user_classes or DEFAULT_USER_CLASSES, max_queued_per_user or max_queue)
+        self._lock = threading.Lock()
+        self._jobs: Dict[str, Dict[str, Any]] = {}
+        self._done: Dict[str, threading.Event] = {}
+        self._queued = 0
+        self._running = 0
+        self.rejected = 0
+        self.completed = 0
+        self.cancelled = 0
+        for index in range(max_workers):
+            threading.Thread(target=self._worker, daemon=True, name=f'{name}-{index}').start()
+
+    def submit(self, fn: Callable[..., Dict[str, Any]], *args,
+               owner: Optional[Tuple[str, str]] = None, **kwargs) -> str:
+        """Queue fn(*args, **kwargs) and return the new job id.
+
+        owner is (user key, user class) for fair scheduling; jobs without
+        one share a single guest queue.
+        """
+        return self.submit_many([functools.partial(fn, *args, **kwargs)], owner=owner)[0]
+
+    def submit_many(self, calls: List[Callable[[], Dict[str, Any]]],
+                    owner: Optional[Tuple[str, str]] = None) -> List[str]:
+        """Queue several calls for one owner and return their job ids in order.
+
+        Either every call is queued or, with QueueFullError, none is.
+        """
+        self._prune()
+        owner_key, user_class = owner or ('anonymous', self.scheduler.default_class)
+
+        job_ids = [uuid.uuid4().hex for _ in calls]
+        with self._lock:
+            if self._queued + len(calls) > self.max_queue:
+                self.rejected += 1
+                raise QueueFullError(f'Execution queue is full ({self.max_queue} waiting)')
+            self._queued += len(calls)
+            for job_id in job_ids:
+                self._jobs[job_id] = {
+                    'id': job_id,
+                    'status': 'queued',
+                    'result': None,
+                    'error': None,
+                    'created_at': time.time(),
+                    'started_at': None,
+                    'finished_at': None,
+                }
+                self._done[job_id] = threading.Event()
+
+        try:
+            self.scheduler.put_many(owner_key, user_class, [(job_id, fn, (), {}) for job_id, fn in zip(job_ids, calls)])
+        except QueueFullError:
+            with self._lock:
+                self._queued -= len(calls)
+                self.rejected += 1
+                for job_id in job_ids:
+                    del self._jobs[job_id]
+                    del self._done[job_id]
+            raise
+        return job_ids
+
+    def cancel(self, job_id: str) -> bool:
+        """Stop a job that hasn't started from ever running; returns whether it was still queued"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or job['status'] != 'queued':
+                return False
+            job['status'] = 'cancelled'
+            self.cancelled += 1
+            return True
+
+    def _worker(self):
+        _lane_state.run_timeout = self.run_timeout
+        while True:
+            owner, (job_id, fn, args, kwargs) = self.scheduler.get()
+            _lane_state.owner = owner
+            try:
+                self._run(job_id, fn, args, kwargs)
+            finally:
+                _lane_state.owner = None
+                self.scheduler.done(owner)
+
+    def _run(self, job_id: str, fn: Callable[..., Dict[str, Any]], args, kwargs) -> Optional[Dict[str, Any]]:
+        job = self._jobs[job_id]
+        with self._lock:
+            self._queued -= 1
+            if job['status'] == 'cancelled':
+                # Cancelled while queued; it still passed through the scheduler to leave it
+                job['finished_at'] = time.time()
+                done = self._done.get(job_id)
+            else:
+                self._running += 1
+                job['status'] = 'running'
+                job['started_at'] = time.time()
+        if job['status'] == 'cancelled':
+            if done is not None:
+                done.set()
+            return None
+
+        try:
+            # Cache entries the job looks up stay on disk until it finishes
+            with cache_leases():
+                result = fn(*args, **kwargs)
+            job['result'] = result
+            job['status'] = 'finished'
+            return result
+        except Exception as e:
+            logging.error(f"Execution job {job_id} failed: {e}")
+            job['error'] = f'Execution failed: {str(e)}'
+            job['status'] = 'failed'
+            return None
+        finally:
+            with self._lock:
+                self._running -= 1
+                self.completed += 1
+                job['finished_at'] = time.time()
+                done = self._done.get(job_id)
+            if done is not None:
+                done.set()
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Get a snapshot of a job's state"""
+        job = self._jobs.get(job_id)
+        return dict(job) if job else None
+
+    def wait(self, job_id: str, timeout: Optional[float] = None) -> Dict[str, Any]:
+        """Block until a job finishes and return its final state"""
+        done = self._done.get(job_id)
+        if done is not None and not done.wait(timeout):
+            raise FuturesTimeout()
+        return self.get(job_id)
+
+    def _prune(self):
+        """Forget finished jobs older than result_ttl"""
+        cutoff = time.time() - self.result_ttl
+        with self._lock:
+            expired = [
+                job_id for job_id, job in self._jobs.items()
+                if job['finished_at'] is not None and job['finished_at'] < cutoff
+            ]
+            for job_id in expired:
+                del self._jobs[job_id]
+                self._done.pop(job_id, None)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = {
+                'workers': self.max_workers,
+                'running': self._running,
+                'queued': self._queued,
+                'max_queue': self.max_queue,
+                'completed': self.completed,
+                'rejected': self.rejected,
+                'cancelled': self.cancelled,
+                'run_timeout': self.run_timeout,
+                # Fraction of workers busy and of queue slots taken
+                'utilization': round(self._running / self.max_workers, 3),
+                'queue_utilization': round(self._queued / self.max_queue, 3) if self.max_queue else None,
+            }
+        stats['user_classes'] = self.scheduler.stats()
+        return stats
+
+
+class ExecutionLanes:
+    """Independent JobManagers for different kinds of work.
+
+    Each lane has its own workers, queue depth and run timeout, so quick
+    work (validation as the user types, short runs) never waits behind
+    long runs in another lane. Job ids are unique across lanes.
+    """
+
+    def __init__(self, lanes: Dict[str, JobManager]):
+        self.lanes = lanes
+
+    def submit(self, lane: str, fn: Callable[..., Any], *args, **kwargs) -> str:
+        """Queue fn on the named lane; see JobManager.submit"""
+        return self.lanes[lane].submit(fn, *args, **kwargs)
+
+    def _lane_of(self, job_id: str) -> Optional[JobManager]:
+        for manager in self.lanes.values():
+            if manager.get(job_id) is not None:
+                return manager
+        return None
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        manager = self._lane_of(job_id)
+        return manager.get(job_id) if manager else None
+
+    def wait(self, job_id: str, timeout: Optional[float] = None) -> Optional[Dict[str, Any]]:
+        manager = self._lane_of(job_id)
+        return manager.wait(job_id, timeout) if manager else None
+
+    def stats(self) -> Dict[str, Any]:
+        return {name: manager.stats() for name, manager in self.lanes.items()}
+
+
+class BatchRunner:
+    """Runs batches of independent executions concurrently on an execution lane.
+
+    Each item is queued as a job of the batch's owner on jobs, so batches
+    from different users share the lane's workers by class weight and each
+    user is capped on running and waiting items like any other run. A batch
+    that doesn't fit the lane's queue or its owner's limit is rejected whole
+    with QueueFullError. Results are yielded as items finish. Items that
+    have not started by the batch deadline are cancelled; items still
+    running at the deadline finish in the background (each is bounded by
+    its handler's timeout) and are reported as not finished.
+    """
+
+    def __init__(self, jobs: JobManager):
+        self.jobs = jobs
+        self._lock = threading.Lock()
+        self.batches = 0
+        self.items = 0
+        self.rejected = 0
+        self.deadline_exceeded = 0
+
+    @staticmethod
+    def _run_item(fn: Callable[[], Dict[str, Any]], submitted_at: float, index: int,
+                  finished: queue.SimpleQueue) -> Dict[str, Any]:
+        started = time.monotonic()
+        try:
+            outcome = {'status': 'finished', 'result': fn(), 'error': None,
+                       'queue_time': round(started - submitted_at, 3)}
+        except Exception as e:
+            logging.error(f"Batch item failed: {e}")
+            outcome = {'status': 'failed', 'result': None, 'error': f'Execution failed: {str(e)}',
+                       'queue_time': round(started - submitted_at, 3)}
+        finished.put((index, outcome))
+        return outcome
+
+    def run(self, tasks: List[Callable[[], Dict[str, Any]]], timeout: float,
+            owner: Optional[Tuple[str, str]] = None) -> Iterator[Tuple[int, Dict[str, Any]]]:
+        """Queue tasks for owner and return an iterator of (index, item) as each finishes.
+
+        Raises QueueFullError immediately if the batch does not fit.
+        """
+        finished = queue.SimpleQueue()
+        submitted_at = time.monotonic()
+        calls = [functools.partial(self._run_item, task, submitted_at, index, finished)
+                 for index, task in enumerate(tasks)]
+        try:
+            job_ids = self.jobs.submit_many(calls, owner=owner)
+        except QueueFullError:
+            with self._lock:
+                self.rejected += 1
+            raise
+        with self._lock:
+            self.batches += 1
+            self.items += len(tasks)
+        return self._collect(dict(enumerate(job_ids)), finished, submitted_at + timeout, timeout)
+
+    def _collect(self, pending: Dict[int, str], finished: queue.SimpleQueue, deadline: float,
+                 timeout: float) -> Iterator[Tuple[int, Dict[str, Any]]]:
+        try:
+            while pending:
+                try:
+                    index, outcome = finished.get(timeout=max(deadline - time.monotonic(), 0))
+                except queue.Empty:
+                    break
+                del pending[index]
+                yield index, outcome
+        finally:
+            # Reached on deadline, or when the consumer stops early (e.g. a client disconnect)
+            for job_id in pending.values():
+                self.jobs.cancel(job_id)
+
+        if pending:
+            with self._lock:
+                self.deadline_exceeded += 1
+        for index in sorted(pending):
+            yield index, {'status': 'deadline_exceeded', 'result': None,
+                          'error': f'Batch deadline of {timeout} seconds exceeded', 'queue_time': None}
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'lane': self.jobs.name,
+                'batches': self.batches,
+                'items': self.items,
+                'rejected': self.rejected,
+                'deadline_exceeded': self.deadline_exceeded,
+            }
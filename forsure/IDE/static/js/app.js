@@ -101,6 +101,7 @@ class CodeEditor {
             javascript: '// Write your JavaScript code here\nconsole.log("Hello, World!");',
             java: '// Write your Java code here\npublic class Main { public static void main(String[] args) { System.out.println("Hello, World!"); } }',
             c: '// Write your C code here\n#include <stdio.h>\nint main() { printf("Hello, World!\\n"); return 0; }',
+            cpp: '// Write your C++ code here\n#include <bits/stdc++.h>\nusing namespace std;\nint main() { cout << "Hello, World!" << endl; return 0; }',
             go: '// Write your Go code here\npackage main\nimport "fmt"\nfunc main() { fmt.Println("Hello, World!") }',
             rust: '// Write your Rust code here\nfn main() { println!("Hello, World!"); }'
         };
@@ -164,6 +165,7 @@ function updateFilename(language) {
         javascript: '.js',
         java: '.java',
         c: '.c',
+        cpp: '.cpp',
         go: '.go',
         rust: '.rs'
     };
@@ -184,6 +186,8 @@ async function runCode(codeEditor) {
 
     const code = codeEditor.editor.getValue();
     const language = codeEditor.currentLanguage;
+    // Unmodified templates are deterministic, so the server may reuse an earlier result
+    const cache = code === codeEditor.getDefaultCode(language);
     const outputDiv = document.getElementById('output');
     const runButton = document.getElementById('runCodeBtn');
 
@@ -193,36 +197,37 @@ async function runCode(codeEditor) {
     outputDiv.innerHTML = '<div class="text-muted"><i class="fas fa-spinner fa-spin me-1"></i>Executing code...</div>';
 
     try {
-        const response = await fetch('/execute', {
+        if (!supportsStreaming()) {
+            // This browser can't read a response incrementally; wait for the whole result
+            await runCodeBuffered(code, language, outputDiv, cache);
+            return;
+        }
+
+        const response = await fetch('/execute/stream', {
             method: 'POST',
             headers: {
                 'Content-Type': 'application/json',
             },
             body: JSON.stringify({
                 code: code,
-                language: language
+                language: language,
+                cache: cache
             })
         });
 
-        const result = await response.json();
-        
-        if (response.ok) {
-            // Display output
-            let outputHtml = '';
-            if (result.output) {
-                outputHtml += `<div class="output-section"><strong>Output:</strong><pre>${escapeHtml(result.output)}</pre></div>`;
-            }
-            if (result.error) {
-                outputHtml += `<div class="output-section error"><strong>Error:</strong><pre>${escapeHtml(result.error)}</pre></div>`;
-            }
-            if (result.execution_time) {
-                outputHtml += `<div class="output-section"><small class="text-muted">Execution time: ${result.execution_time.toFixed(3)}s</small></div>`;
-            }
-            
-            outputDiv.innerHTML = outputHtml || '<div class="text-muted">No output</div>';
-        } else {
+        if (!response.ok) {
+            const result = await response.json();
             outputDiv.innerHTML = `<div class="error">Error: ${escapeHtml(result.error || 'Unknown error')}</div>`;
+            return;
         }
+
+        if (!response.body) {
+            // The job is already running; read its events in one piece rather than submitting it again
+            await renderExecutionStream(bufferedReader(await response.text()), outputDiv);
+            return;
+        }
+
+        await renderExecutionStream(response.body.getReader(), outputDiv);
     } catch (error) {
         console.error('Error running code:', error);
         outputDiv.innerHTML = `<div class="error">Network error: ${escapeHtml(error.message)}</div>`;
@@ -233,6 +238,140 @@ async function runCode(codeEditor) {
     }
 }
 
+// Whether fetch responses expose a readable body stream
+function supportsStreaming() {
+    return typeof ReadableStream !== 'undefined' && typeof Response !== 'undefined' && 'body' in Response.prototype;
+}
+
+// A reader over text that has already arrived, yielding it as a single chunk
+function bufferedReader(text) {
+    let chunk = new TextEncoder().encode(text);
+    return {
+        read: async () => {
+            const value = chunk;
+            chunk = null;
+            return value ? { value, done: false } : { value: undefined, done: true };
+        }
+    };
+}
+
+// Render Server-Sent Events from /execute/stream as they arrive
+async function renderExecutionStream(reader, outputDiv) {
+    outputDiv.innerHTML = `
+        <div class="output-section"><small class="text-muted execution-phase"></small></div>
+        <div class="output-section"><strong>Output:</strong><pre class="execution-output"></pre></div>
+    `;
+    const phaseLabel = outputDiv.querySelector('.execution-phase');
+    const outputPre = outputDiv.querySelector('.execution-output');
+    const decoder = new TextDecoder();
+    let buffer = '';
+    let streamedStderr = '';
+
+    const handleEvent = (event, payload) => {
+        if (event === 'phase') {
+            const name = payload.name === 'compile' ? 'Compiling' : 'Running';
+            if (payload.state === 'start') {
+                phaseLabel.innerHTML = `<i class="fas fa-spinner fa-spin me-1"></i>${name}...`;
+            } else if (payload.name === 'compile' && payload.cached) {
+                phaseLabel.textContent = 'Using cached build';
+            }
+        } else if (event === 'stdout') {
+            outputPre.appendChild(document.createTextNode(payload.text));
+        } else if (event === 'stderr') {
+            const span = document.createElement('span');
+            span.className = 'error';
+            span.textContent = payload.text;
+            outputPre.appendChild(span);
+            streamedStderr += payload.text;
+        } else if (event === 'result') {
+            phaseLabel.textContent = '';
+            if (payload.cache_hit || payload.truncated) {
+                // Nothing was streamed for a cached result; a truncated stream's head
+                // is replaced with the server's bounded head and tail
+                outputPre.textContent = payload.output || '';
+            }
+            if (payload.truncated) {
+                outputDiv.insertAdjacentHTML('beforeend', `<div class="output-section"><small class="text-muted">Output truncated (${payload.stdout_bytes} bytes written to stdout, ${payload.stderr_bytes} to stderr)</small></div>`);
+            }
+            if (payload.error && payload.error !== streamedStderr) {
+                outputDiv.insertAdjacentHTML('beforeend', `<div class="output-section error"><strong>Error:</strong><pre>${escapeHtml(payload.error)}</pre></div>`);
+            }
+            if (payload.execution_time) {
+                outputDiv.insertAdjacentHTML('beforeend', `<div class="output-section"><small class="text-muted">${formatTimings(payload)}</small></div>`);
+            }
+            if (!outputPre.textContent) {
+                outputPre.parentElement.innerHTML = '<div class="text-muted">No output</div>';
+            }
+        }
+    };
+
+    while (true) {
+        const { value, done } = await reader.read();
+        if (done) {
+            break;
+        }
+        buffer += decoder.decode(value, { stream: true });
+
+        // Events are separated by a blank line
+        let boundary;
+        while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+            const rawEvent = buffer.slice(0, boundary);
+            buffer = buffer.slice(boundary + 2);
+
+            let event = 'message';
+            let data = '';
+            for (const line of rawEvent.split('\n')) {
+                if (line.startsWith('event: ')) {
+                    event = line.slice(7);
+                } else if (line.startsWith('data: ')) {
+                    data += line.slice(6);
+                }
+            }
+            if (data) {
+                handleEvent(event, JSON.parse(data));
+            }
+        }
+    }
+}
+
+// Non-streaming fallback using the synchronous /execute endpoint
+async function runCodeBuffered(code, language, outputDiv, cache = false) {
+    const response = await fetch('/execute', {
+        method: 'POST',
+        headers: {
+            'Content-Type': 'application/json',
+        },
+        body: JSON.stringify({
+            code: code,
+            language: language,
+            cache: cache
+        })
+    });
+
+    const result = await response.json();
+    
+    if (response.ok) {
+        // Display output
+        let outputHtml = '';
+        if (result.output) {
+            outputHtml += `<div class="output-section"><strong>Output:</strong><pre>${escapeHtml(result.output)}</pre></div>`;
+        }
+        if (result.truncated) {
+            outputHtml += `<div class="output-section"><small class="text-muted">Output truncated (${result.stdout_bytes} bytes written to stdout, ${result.stderr_bytes} to stderr)</small></div>`;
+        }
+        if (result.error) {
+            outputHtml += `<div class="output-section error"><strong>Error:</strong><pre>${escapeHtml(result.error)}</pre></div>`;
+        }
+        if (result.execution_time) {
+            outputHtml += `<div class="output-section"><small class="text-muted">${formatTimings(result)}</small></div>`;
+        }
+        
+        outputDiv.innerHTML = outputHtml || '<div class="text-muted">No output</div>';
+    } else {
+        outputDiv.innerHTML = `<div class="error">Error: ${escapeHtml(result.error || 'Unknown error')}</div>`;
+    }
+}
+
 // Function to save code
 async function saveCode(codeEditor) {
     if (!codeEditor.isEditorReady) {
@@ -279,6 +418,25 @@ async function saveCode(codeEditor) {
     }
 }
 
+// Helper function to describe where execution time went
+function formatTimings(result) {
+    let text = `Execution time: ${result.execution_time.toFixed(3)}s`;
+    const phases = [];
+    if (result.compile_time !== undefined) {
+        phases.push(`compile ${result.compile_time.toFixed(3)}s`);
+    }
+    if (result.run_time !== undefined) {
+        phases.push(`run ${result.run_time.toFixed(3)}s`);
+    }
+    if (result.cpu_time) {
+        phases.push(`CPU ${(result.cpu_time.user + result.cpu_time.system).toFixed(3)}s`);
+    }
+    if (phases.length) {
+        text += ` (${phases.join(', ')})`;
+    }
+    return text;
+}
+
 // Helper function to escape HTML
 function escapeHtml(text) {
     const div = document.createElement('div');
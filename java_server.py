@@ -0,0 +1,326 @@
+import locale
+import logging
+import os
+import queue
+import re
+import secrets
+import selectors
+import subprocess
+import threading
+import time
+from typing import List, Optional, Tuple
+
+from compile_cache import CompileCache
+from process_runner import (
+    OUTPUT_LIMIT_BYTES, BoundedBuffer, CapturedOutput, ProcessResult, ResourceLimits,
+    kill_process_group, run_process, spawn,
+)
+from sandbox import Sandbox, SandboxPool
+
+SERVER_SOURCE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'workers', 'JavaRunServer.java')
+SERVER_CLASS = 'JavaRunServer'
+
+# Seconds to wait for a new JVM to report it is ready
+STARTUP_TIMEOUT = 30
+# Extra seconds allowed on top of the run timeout for in-memory compilation
+COMPILE_GRACE = 20
+
+
+class JavaServerError(Exception):
+    """Raised when a worker JVM cannot serve a run and should be discarded"""
+
+    def __init__(self, message: str, timed_out: bool = False, started: bool = False):
+        super().__init__(message)
+        # Whether the worker stopped answering within the run's time limit
+        self.timed_out = timed_out
+        # Whether user code may already have run (so it must not be retried)
+        self.started = started
+
+
+def security_manager_flags(javac_version: str) -> List[str]:
+    """JVM options that let the worker trap System.exit with a security manager.
+
+    JDK 18-23 refuse System.setSecurityManager unless started with
+    -Djava.security.manager=allow (understood since JDK 12); JDK 24 refuses
+    to start with it, and older JDKs allow it by default.
+    """
+    match = re.search(r'(\d+)(?:\.(\d+))?', javac_version)
+    if not match:
+        return []
+    major = int(match.group(2)) if match.group(1) == '1' and match.group(2) else int(match.group(1))
+    return ['-Djava.security.manager=allow'] if 12 <= major < 24 else []
+
+
+class JavaWorker:
+    """A long-lived JVM running workers/JavaRunServer.java.
+
+    A JVM cannot change its working directory, so each worker runs in the
+    sandbox it is given for its whole life; the pool wipes it between runs.
+    """
+
+    def __init__(self, classpath: str, heap_limit_mb: int, sandbox: Sandbox,
+                 limits: Optional[ResourceLimits] = None, jvm_flags: Optional[List[str]] = None):
+        self.sandbox = sandbox
+        self.process = spawn(
+            ['java', f'-Xmx{heap_limit_mb}m', '-XX:+UseSerialGC', *(jvm_flags or []), '-cp', classpath, SERVER_CLASS],
+            limits,
+            cwd=sandbox.path,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            start_new_session=True,
+        )
+        self.runs = 0
+        # Whether System.exit from a submission ends only its run (see JavaRunServer.installExitTrap)
+        self.exit_trap = False
+        self._buffer = bytearray()
+        self._selector = selectors.DefaultSelector()
+        self._selector.register(self.process.stdout.fileno(), selectors.EVENT_READ)
+
+        try:
+            ready = self._read_line(time.monotonic() + STARTUP_TIMEOUT)
+        except JavaServerError:
+            self.close()
+            raise
+        if ready not in ('READY 0', 'READY 1'):
+            self.close()
+            raise JavaServerError(f'Unexpected greeting from Java worker: {ready!r}')
+        self.exit_trap = ready == 'READY 1'
+
+    def is_alive(self) -> bool:
+        return self.process.poll() is None
+
+    def close(self):
+        """Stop the worker; closing stdin makes the server exit"""
+        self._selector.close()
+        kill_process_group(self.process.pid)
+        for stream in (self.process.stdin, self.process.stdout):
+            try:
+                stream.close()
+            except OSError:
+                pass
+        self.process.wait()
+
+    def _fill(self, deadline: float, started: bool = False):
+        timeout = deadline - time.monotonic()
+        if timeout <= 0 or not self._selector.select(timeout):
+            raise JavaServerError('Timed out waiting for the Java worker', timed_out=True, started=started)
+        data = os.read(self.process.stdout.fileno(), 64 * 1024)
+        if not data:
+            raise JavaServerError('Java worker exited', started=started)
+        self._buffer += data
+
+    def _read_line(self, deadline: float, started: bool = False) -> str:
+        while b'\n' not in self._buffer:
+            self._fill(deadline, started)
+        line, _, rest = bytes(self._buffer).partition(b'\n')
+        self._buffer = bytearray(rest)
+        return line.decode(errors='replace')
+
+    def _read_exact(self, size: int, deadline: float) -> bytes:
+        while len(self._buffer) < size:
+            self._fill(deadline, started=True)
+        data = bytes(self._buffer[:size])
+        del self._buffer[:size]
+        return data
+
+    def run(self, code: str, class_name: str, timeout: float,
+            input_data: Optional[str] = None) -> Tuple[str, float, ProcessResult]:
+        """Compile and run a submission; returns (status, compile_time, result).
+
+        status is OK, COMPILE_ERROR, TIMEOUT or OUTPUT_LIMIT. After TIMEOUT
+        or OUTPUT_LIMIT the server has exited and the worker must be discarded.
+        """
+        self.runs += 1
+        start = time.monotonic()
+        encoding = locale.getpreferredencoding(False)
+        source = code.encode('utf-8')
+        stdin = (input_data or '').encode(encoding)
+        token = secrets.token_hex(16)
+        header = f'RUN {token} {class_name} {int(timeout * 1000)} {OUTPUT_LIMIT_BYTES} {len(source)} {len(stdin)}\n'
+
+        try:
+            self.process.stdin.write(header.encode() + source + stdin)
+            self.process.stdin.flush()
+        except OSError as e:
+            raise JavaServerError(f'Failed to send run request: {e}')
+
+        deadline = start + timeout + COMPILE_GRACE
+        fields = self._read_line(deadline, started=True).split()
+        # Anything else means the program wrote to the protocol stream itself
+        if len(fields) != 10 or fields[0] != 'RESULT' or fields[1] != token:
+            raise JavaServerError('Malformed response from Java worker', started=True)
+        status = fields[2]
+        try:
+            returncode, compile_ms, run_ms, user_ms, system_ms, stdout_len, stderr_len = map(int, fields[3:])
+        except ValueError:
+            raise JavaServerError('Malformed response from Java worker', started=True)
+
+        stdout, stderr = BoundedBuffer(), BoundedBuffer()
+        stdout.write(self._read_exact(stdout_len, deadline))
+        stderr.write(self._read_exact(stderr_len, deadline))
+        captured = CapturedOutput(stdout, stderr, encoding,
+                                  timed_out=status == 'TIMEOUT',
+                                  limit_exceeded=status == 'OUTPUT_LIMIT')
+        rusage = {
+            'user_time': user_ms / 1000,
+            'system_time': system_ms / 1000,
+        }
+        result = ProcessResult(['java', class_name], returncode, captured, wall_time=run_ms / 1000, rusage=rusage)
+        return status, compile_ms / 1000, result
+
+
+class JavaWorkerPool:
+    """Pool of warm JVMs that compile in memory and run each submission in a fresh class loader.
+
+    The server class is compiled once into the compile cache. Each worker
+    holds a sandbox from sandbox_pool as its working directory, wiped after
+    every run, so files a program writes stay private to that run. Workers
+    are recycled after max_runs submissions, and any worker that timed out,
+    flooded output or stopped responding is replaced. Like
+    PythonZygotePool, run() returns None when no worker is available so
+    the caller falls back to javac/java; once a request has been sent the
+    program may already have run, so a worker that dies or garbles its
+    response is reported as an error rather than rerun. JDKs that no longer
+    allow a security manager can't trap System.exit, which would end the
+    worker, so the pool stops using workers there.
+    """
+
+    def __init__(self, size: int, compile_cache: CompileCache, sandbox_pool: SandboxPool, heap_limit_mb: int,
+                 max_runs: int = 50, limits: Optional[ResourceLimits] = None):
+        self.size = size
+        self.compile_cache = compile_cache
+        self.sandbox_pool = sandbox_pool
+        self.heap_limit_mb = heap_limit_mb
+        self.max_runs = max_runs
+        self.limits = limits
+        self._idle = queue.SimpleQueue()
+        self._lock = threading.Lock()
+        self._count = 0
+        # Runs that failed because their worker died or garbled its response
+        self.failures = 0
+        # Set when the JDK can't trap System.exit, so no more workers are started
+        self.unsupported: Optional[str] = None
+        self._classpath: Optional[str] = None
+
+    def _server_classpath(self, javac_version: str) -> Optional[str]:
+        """Compile JavaRunServer.java into the compile cache (once per javac version)"""
+        if self._classpath and os.path.isdir(self._classpath):
+            return self._classpath
+
+        with open(SERVER_SOURCE) as f:
+            source = f.read()
+        key = CompileCache.make_key('java-server', source, javac_version)
+
+        def build(build_dir: str) -> Tuple[bool, str]:
+            result = run_process(['javac', '-d', build_dir, SERVER_SOURCE], timeout=60, cwd=build_dir)
+            return result.returncode == 0, result.stderr
+
+        classpath, error, _ = self.compile_cache.get_or_build(key, build)
+        if error is not None:
+            logging.error(f"Failed to compile Java worker server: {error}")
+            return None
+        self._classpath = classpath
+        return classpath
+
+    def _spawn(self, javac_version: str) -> Optional[JavaWorker]:
+        with self._lock:
+            if self._count >= self.size or self.unsupported:
+                return None
+            self._count += 1
+        sandbox = None
+        try:
+            classpath = self._server_classpath(javac_version)
+            if classpath is None:
+                raise JavaServerError('Java worker server is not compiled')
+            sandbox = self.sandbox_pool.acquire()
+            worker = JavaWorker(classpath, self.heap_limit_mb, sandbox, self.limits, security_manager_flags(javac_version))
+        except Exception as e:
+            logging.error(f"Failed to start Java worker: {e}")
+            if sandbox is not None:
+                self.sandbox_pool.release(sandbox)
+            with self._lock:
+                self._count -= 1
+            return None
+
+        if not worker.exit_trap:
+            logging.warning("Java workers disabled: this JDK can't trap System.exit in a worker")
+            with self._lock:
+                self.unsupported = 'System.exit cannot be trapped on this JDK'
+            self._discard(worker)
+            return None
+        return worker
+
+    def _discard(self, worker: JavaWorker):
+        worker.close()
+        self.sandbox_pool.release(worker.sandbox)
+        with self._lock:
+            self._count -= 1
+
+    def acquire(self, javac_version: str) -> Optional[JavaWorker]:
+        """Get an idle worker, starting one if the pool has room"""
+        while True:
+            try:
+                worker = self._idle.get_nowait()
+            except queue.Empty:
+                return self._spawn(javac_version)
+            if worker.is_alive():
+                return worker
+            self._discard(worker)
+
+    def release(self, worker: JavaWorker):
+        if worker.runs >= self.max_runs or not worker.is_alive():
+            self._discard(worker)
+        else:
+            self._idle.put(worker)
+
+    def run(self, code: str, class_name: str, timeout: float, javac_version: str,
+            input_data: Optional[str] = None) -> Optional[Tuple[str, float, ProcessResult, Optional[str]]]:
+        """Run a submission on a warm JVM, or return None if none is available.
+
+        Returns (status, compile_time, result, quota_notice), where
+        quota_notice is set when the run stored more than its sandbox quota.
+        Raises subprocess.TimeoutExpired like process_runner.run_process, and
+        RuntimeError when the worker failed after the program may have run.
+        """
+        worker = self.acquire(javac_version)
+        if worker is None:
+            return None
+
+        try:
+            status, compile_time, result = worker.run(code, class_name, timeout, input_data)
+        except JavaServerError as e:
+            logging.warning(f"Discarding Java worker: {e}")
+            self._discard(worker)
+            if e.timed_out:
+                raise subprocess.TimeoutExpired(['java', class_name], timeout)
+            if e.started:
+                with self._lock:
+                    self.failures += 1
+                raise RuntimeError(str(e))
+            return None
+
+        quota_notice = self.sandbox_pool.check_quota(worker.sandbox)
+        if status in ('TIMEOUT', 'OUTPUT_LIMIT'):
+            # The server exits after these; reap it and start over next time
+            self._discard(worker)
+        else:
+            try:
+                worker.sandbox.wipe()
+            except OSError as e:
+                logging.warning(f"Discarding Java worker whose sandbox could not be wiped: {e}")
+                self._discard(worker)
+            else:
+                self.release(worker)
+
+        if status == 'TIMEOUT':
+            raise subprocess.TimeoutExpired(result.args, timeout, output=result.stdout, stderr=result.stderr)
+        return status, compile_time, result, quota_notice
+
+    def shutdown(self):
+        while True:
+            try:
+                worker = self._idle.get_nowait()
+            except queue.Empty:
+                return
+            self._discard(worker)
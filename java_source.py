@@ -0,0 +1,122 @@
+import re
+from typing import Iterator, List, Optional, Tuple
+
+# Comments and literals, skipped so keywords inside them are never mistaken for declarations
+_SKIP_RE = re.compile(
+    r'\s+'
+    r'|//[^\n]*'
+    r'|/\*.*?(?:\*/|\Z)'
+    r'|"""(?:\\.|[^\\])*?(?:"""|\Z)'
+    r'|"(?:\\.|[^"\\\n])*"?'
+    r"|'(?:\\.|[^'\\\n])*'?",
+    re.DOTALL
+)
+_IDENTIFIER_RE = re.compile(r'[^\W\d][\w$]*|\$[\w$]*')
+_NUMBER_RE = re.compile(r'\d[\w.]*')
+
+TYPE_KEYWORDS = ('class', 'interface', 'enum', 'record')
+
+# Class run when the source declares no usable type
+DEFAULT_CLASS = 'Main'
+
+
+def tokens(code: str) -> Iterator[str]:
+    """Identifiers, keywords and punctuation of Java source, without comments and literals"""
+    position = 0
+    length = len(code)
+    while position < length:
+        match = _SKIP_RE.match(code, position)
+        if match and match.end() > position:
+            if code[position] in '"\'':
+                yield '<literal>'
+            position = match.end()
+            continue
+        match = _IDENTIFIER_RE.match(code, position) or _NUMBER_RE.match(code, position)
+        if match:
+            yield match.group()
+            position = match.end()
+        else:
+            yield code[position]
+            position += 1
+
+
+class JavaSource:
+    """What's needed to compile and launch a single-file Java program"""
+
+    def __init__(self, package: Optional[str], file_class: str, main_class: str):
+        self.package = package
+        # Public top-level type, which javac requires the file to be named after
+        self.file_class = file_class
+        # Top-level type declaring main(), which is the one launched
+        self.main_class = main_class
+
+    @property
+    def file_name(self) -> str:
+        return f'{self.file_class}.java'
+
+    @property
+    def qualified_main_class(self) -> str:
+        return f'{self.package}.{self.main_class}' if self.package else self.main_class
+
+
+def parse_source(code: str) -> JavaSource:
+    """Find the package, the public top-level type and the type with main() by scanning tokens.
+
+    Only top-level declarations are considered (nested types would need
+    Outer$Inner launch names). Without a public type the file is named
+    after the main class; without a main method the public type, first
+    type or DEFAULT_CLASS is launched and the JVM reports the error.
+    """
+    package = None
+    # (name, is_public, has_main) for each top-level type, in order
+    types: List[Tuple[str, bool, bool]] = []
+    depth = 0
+    modifiers: List[str] = []
+    # Whether the braces at depth 1 are the body of a top-level type
+    in_type = False
+    window: List[str] = []
+
+    stream = tokens(code)
+    previous = None
+    for token in stream:
+        if depth == 0:
+            if token == 'package' and previous in (None, ';', ')'):
+                parts = []
+                for part in stream:
+                    if part == ';':
+                        break
+                    parts.append(part)
+                package = ''.join(parts) or None
+                previous = ';'
+                continue
+            if token in TYPE_KEYWORDS and previous != '.':
+                name = next(stream, None)
+                if name and _IDENTIFIER_RE.fullmatch(name):
+                    in_type = True
+                    types.append((name, 'public' in modifiers, False))
+                modifiers = []
+            elif token in (';', '}'):
+                modifiers = []
+            elif token != '{':
+                modifiers.append(token)
+
+        if token == '{':
+            depth += 1
+            if depth == 1:
+                window = []
+        elif token == '}':
+            depth = max(0, depth - 1)
+            if depth == 0:
+                in_type = False
+        elif depth == 1 and in_type:
+            # Members of a top-level type: look for "void main("
+            window = (window + [token])[-3:]
+            if window == ['void', 'main', '('] and not types[-1][2]:
+                name, is_public, _ = types[-1]
+                types[-1] = (name, is_public, True)
+        previous = token
+
+    public = next((name for name, is_public, _ in types if is_public), None)
+    main = next((name for name, _, has_main in types if has_main), None)
+    launched = main or public or (types[0][0] if types else DEFAULT_CLASS)
+    return JavaSource(package, public or launched, launched)
@@ -6,69 +6,454 @@ import ast
 import sys
 import base64
 import binascii
+import hashlib
 import json
+import logging
+import threading
 import urllib.parse
 from abc import ABC, abstractmethod
-from typing import Dict, Any, Tuple, Optional, List
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Any, Tuple, Optional, List
+from python_zygote import PythonZygotePool, zygotes_supported
+from java_server import JavaWorkerPool
+from java_source import JavaSource, parse_source
+from node_server import NodeServerPool
+from process_runner import COMPILE_LIMITS, OUTPUT_LIMIT_BYTES, RUN_LIMITS, OutputCallback, ProcessResult, run_process
+from compile_cache import CompileCache, WorkDirCache, dir_size
+from sandbox import Sandbox, sandbox_pool
+from toolchains import toolchain_registry
+from project_builds import ProjectError, materialize, normalize_files, project_builder, runtime_files
+from workspaces import workspace_cache
+from precompiled_headers import precompiled_headers
+from cargo_builds import CargoError, cargo_builder
+from dependency_envs import DependencyError, dependency_envs, npm_dependencies, python_requirements
+from execution_jobs import current_owner, lane_timeout, lane_timeout_scope
+from diagnostics import CheckNotRun, ValidationCache, diagnostics_service, make_diagnostic, parse_compiler_diagnostics, validation_cache
+
+# Number of warm Python interpreters kept ready for fork-per-run execution (0 disables)
+PYTHON_ZYGOTE_POOL_SIZE = int(os.environ.get('PYTHON_ZYGOTE_POOL_SIZE', '4'))
+# Forks served by one zygote before it is replaced
+PYTHON_ZYGOTE_MAX_RUNS = int(os.environ.get('PYTHON_ZYGOTE_MAX_RUNS', '100'))
+
+# Warm Node processes that run each submission in a fresh worker thread (0 disables)
+NODE_SERVER_POOL_SIZE = int(os.environ.get('NODE_SERVER_POOL_SIZE', '4'))
+# Submissions served by one Node process before it is replaced
+NODE_SERVER_MAX_RUNS = int(os.environ.get('NODE_SERVER_MAX_RUNS', '200'))
+# Node processes whose RSS grows past this are replaced after their current run
+NODE_SERVER_MAX_RSS_BYTES = int(os.environ.get('NODE_SERVER_MAX_RSS_BYTES', str(256 * 1024 * 1024)))
+
+# Warm JVMs that compile in memory and run submissions in isolated class loaders (0 disables)
+JAVA_WORKER_POOL_SIZE = int(os.environ.get('JAVA_WORKER_POOL_SIZE', '0'))
+# Submissions served by one worker JVM before it is replaced
+JAVA_WORKER_MAX_RUNS = int(os.environ.get('JAVA_WORKER_MAX_RUNS', '50'))
+
+# Content-addressed cache of compiled artifacts shared by the compiled-language handlers
+COMPILE_CACHE_DIR = os.environ.get('COMPILE_CACHE_DIR', os.path.join(tempfile.gettempdir(), 'codecraft-compile-cache'))
+COMPILE_CACHE_MAX_BYTES = int(os.environ.get('COMPILE_CACHE_MAX_BYTES', str(512 * 1024 * 1024)))
+compile_cache = CompileCache(COMPILE_CACHE_DIR, COMPILE_CACHE_MAX_BYTES)
+
+# Go's own build cache, shared by every Go build so the standard library is compiled once
+GO_BUILD_CACHE_DIR = os.environ.get('GO_BUILD_CACHE_DIR', os.path.join(tempfile.gettempdir(), 'codecraft-gocache'))
+GO_BUILD_CACHE_MAX_BYTES = int(os.environ.get('GO_BUILD_CACHE_MAX_BYTES', str(1024 * 1024 * 1024)))
+# Minimum seconds between checks of the Go build cache size
+GO_BUILD_CACHE_CHECK_INTERVAL = int(os.environ.get('GO_BUILD_CACHE_CHECK_INTERVAL', '60'))
+
+# C++ build profiles selectable per request ("profile"), the default one, and the language standard
+CPP_PROFILES: Dict[str, List[str]] = {'debug': ['-O0'], 'release': ['-O2']}
+CPP_DEFAULT_PROFILE = os.environ.get('CPP_DEFAULT_PROFILE', 'release')
+CPP_STANDARD = os.environ.get('CPP_STANDARD', 'gnu++17')
+
+# Rust build profiles selectable per request ("profile") and the default one
+RUST_PROFILES: Dict[str, List[str]] = {'fast': ['-C', 'opt-level=0'], 'release': ['-C', 'opt-level=3']}
+RUST_DEFAULT_PROFILE = os.environ.get('RUST_DEFAULT_PROFILE', 'fast')
+# Profiles whose builds keep rustc incremental state, one directory per user and profile
+RUST_INCREMENTAL_PROFILES = ('fast',)
+RUST_INCREMENTAL_DIR = os.environ.get('RUST_INCREMENTAL_DIR', os.path.join(tempfile.gettempdir(), 'codecraft-rust-incremental'))
+RUST_INCREMENTAL_MAX_BYTES = int(os.environ.get('RUST_INCREMENTAL_MAX_BYTES', str(1024 * 1024 * 1024)))
+rust_incremental = WorkDirCache(RUST_INCREMENTAL_DIR, RUST_INCREMENTAL_MAX_BYTES)
+
+# Files a Python project may start from, in order of preference
+PYTHON_PROJECT_ENTRY_POINTS = ('main.py', '__main__.py')
+# Files a Node project may start from when package.json names no "main"
+NODE_PROJECT_ENTRY_POINTS = ('index.js', 'main.js')
+
+# Test cases run at once by judge mode, and the most one request may submit
+JUDGE_PARALLELISM = int(os.environ.get('JUDGE_PARALLELISM', str(os.cpu_count() or 1)))
+JUDGE_MAX_CASES = int(os.environ.get('JUDGE_MAX_CASES', '200'))
+
+# Receives streaming events: ('phase', {'name', 'state', ...}) and ('stdout' | 'stderr', {'text'})
+EventCallback = Callable[[str, Dict[str, Any]], None]
+
+# Runs a prepared program once: (input_data, cwd, on_output) -> ProcessResult
+ProgramRunner = Callable[[Optional[str], str, Optional[OutputCallback]], ProcessResult]
+
+class PreparedProgram:
+    """Code compiled (or written out) once so it can be run many times"""
+    
+    def __init__(self, run: Optional[ProgramRunner] = None, compile_error: Optional[str] = None,
+                 compile_time: Optional[float] = None, cached_build: bool = False,
+                 release: Optional[Callable[[], None]] = None):
+        self.run = run
+        self.compile_error = compile_error
+        self.compile_time = compile_time
+        self.cached_build = cached_build
+        self._release = release
+    
+    def close(self):
+        if self._release:
+            self._release()
+            self._release = None
+
+def normalize_output(text: str) -> str:
+    """Ignore trailing whitespace on each line and trailing blank lines when comparing output"""
+    return '\n'.join(line.rstrip() for line in text.rstrip().splitlines())
 
 class LanguageHandler(ABC):
     """Abstract base class for language handlers"""
     
+    # Toolchains (see toolchains.TOOLCHAIN_PROBES) the handler needs to run code
+    toolchains: Tuple[str, ...] = ()
+    # Language servers (see diagnostics.LANGUAGE_SERVERS) that can check this language, preferred first
+    language_servers: Tuple[str, ...] = ()
+    # Seconds a run may take outside an execution lane
+    default_timeout: float = 30
+    # Build profile of this instance, and every profile of the language by name (set by the factory)
+    profile: Optional[str] = None
+    profiles: Dict[str, 'LanguageHandler'] = {}
+    # Handlers that implement prepare(code) -> PreparedProgram, used by judge()
+    supports_judge: bool = False
+    # Handlers that implement execute_project(files, project_key, on_event, input_data)
+    supports_projects: bool = False
+    
+    @property
+    def timeout(self) -> float:
+        """Seconds a run may take: the current execution lane's limit, else default_timeout"""
+        return lane_timeout() or self.default_timeout
+    
+    @timeout.setter
+    def timeout(self, value: float):
+        self.default_timeout = value
+    
     @abstractmethod
-    def execute(self, code: str) -> Dict[str, Any]:
-        """Execute code and return result"""
+    def execute(self, code: str, on_event: Optional[EventCallback] = None,
+                input_data: Optional[str] = None) -> Dict[str, Any]:
+        """Execute code with input_data as stdin and return the result, optionally reporting progress to on_event"""
         pass
     
     @abstractmethod
-    def validate(self, code: str) -> Tuple[bool, Optional[str]]:
-        """Validate code syntax"""
+    def validate(self, code: str) -> Tuple[Optional[bool], Optional[str]]:
+        """Validate code syntax: (valid, message), with valid None if the check could not run"""
         pass
     
     @abstractmethod
     def get_language_info(self) -> Dict[str, str]:
         """Get language information"""
         pass
+    
+    def is_available(self) -> bool:
+        """Whether every toolchain this handler needs is installed"""
+        return all(toolchain_registry.is_available(name) for name in self.toolchains)
+    
+    def source_file_name(self, code: str) -> str:
+        """Name the source file must have for the toolchain to accept it"""
+        return 'main' + self.get_language_info()['file_extension']
+    
+    def diagnose(self, code: str, document_id: Optional[str] = None) -> Tuple[Optional[List[Dict[str, Any]]], str]:
+        """Structured diagnostics and where they came from ('language-server' or 'compiler').
+        
+        A warm language server answers when one is ready; document_id keeps
+        the document open there so later calls only send what changed.
+        Compiler checks are cached and shared through validation_cache.
+        When the compiler check could not run, returns (None, the reason).
+        """
+        language = self.get_language_info()['monaco_language']
+        diagnostics = diagnostics_service.diagnose(self.language_servers, language, code,
+                                                   self.source_file_name(code), document_id)
+        if diagnostics is not None:
+            return diagnostics, 'language-server'
+        versions = [toolchain_registry.version_string(name) for name in self.toolchains]
+        key = ValidationCache.make_key(language, versions, code)
+        try:
+            return validation_cache.get_or_check(key, lambda: self.compiler_diagnostics(code)), 'compiler'
+        except CheckNotRun as e:
+            return None, str(e)
+    
+    def compiler_diagnostics(self, code: str) -> List[Dict[str, Any]]:
+        """Diagnostics parsed from the output of validate(); raises CheckNotRun if it could not run"""
+        is_valid, message = self.validate(code)
+        if is_valid is None:
+            raise CheckNotRun(message)
+        if is_valid:
+            return []
+        source = self.toolchains[0] if self.toolchains else None
+        return parse_compiler_diagnostics(message, source) or [make_diagnostic(1, 1, message or 'Syntax error', source=source)]
+    
+    def judge(self, code: str, cases: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Compile once, then run the program against each {stdin, expected_output} case in parallel"""
+        start_time = time.time()
+        
+        if not self.is_available():
+            return {'error': f'{self.get_language_info()["name"]} is not installed on this system', 'cases': []}
+        
+        program = self.prepare(code)
+        try:
+            if program.compile_error is not None:
+                return {
+                    'error': f'Compilation Error:\n{program.compile_error}',
+                    'compile_time': round(program.compile_time or 0, 3),
+                    'cases': []
+                }
+            
+            workers = max(1, min(JUDGE_PARALLELISM, len(cases)))
+            run_timeout = lane_timeout()
+            
+            def judge_case(case: Dict[str, Any]) -> Dict[str, Any]:
+                # Cases run on helper threads; keep the lane's run timeout
+                with lane_timeout_scope(run_timeout):
+                    return self._judge_case(program, case)
+            
+            with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='judge') as executor:
+                results = list(executor.map(judge_case, cases))
+        finally:
+            program.close()
+        
+        response = {
+            'error': None,
+            'cases': results,
+            'total': len(results),
+            'passed': sum(1 for case in results if case['status'] == 'passed'),
+            'execution_time': round(time.time() - start_time, 3)
+        }
+        if program.compile_time is not None:
+            response['compile_time'] = round(program.compile_time, 3)
+            response['cached_build'] = program.cached_build
+        return response
+    
+    def prepare_compiled(self, compile_program: Callable[[], Tuple[Optional[str], Optional[str], bool]],
+                         command: Callable[[str], List[str]], env: Optional[Dict[str, str]] = None) -> PreparedProgram:
+        """Build with compile_program (a cached _compile) and run command(artifact_dir) for each case"""
+        compile_start = time.time()
+        artifact_dir, compile_error, cache_hit = compile_program()
+        compile_time = time.time() - compile_start
+        if compile_error is not None:
+            return PreparedProgram(compile_error=compile_error, compile_time=compile_time)
+        
+        def run(input_data: Optional[str], cwd: str, on_output: Optional[OutputCallback]) -> ProcessResult:
+            return run_process(
+                command(artifact_dir),
+                timeout=self.timeout,
+                cwd=cwd,
+                env=env,
+                input_data=input_data,
+                on_output=on_output,
+                limits=self.run_limits
+            )
+        
+        return PreparedProgram(run, compile_time=compile_time, cached_build=cache_hit)
+    
+    def _judge_case(self, program: PreparedProgram, case: Dict[str, Any]) -> Dict[str, Any]:
+        expected = case.get('expected_output')
+        with sandbox_pool.session() as sandbox:
+            try:
+                result = program.run(case.get('stdin'), sandbox.path, None)
+            except subprocess.TimeoutExpired:
+                return {'status': 'timeout', 'output': '', 'error': f'Timed out after {self.timeout} seconds',
+                        'exit_code': None, 'matched': False if expected is not None else None}
+            except Exception as e:
+                return {'status': 'error', 'output': '', 'error': f'Execution error: {str(e)}',
+                        'exit_code': None, 'matched': False if expected is not None else None}
+            # run_time already covers the case; end-to-end time is reported for the whole judge
+            outcome = self.build_result(result, None, sandbox=sandbox)
+        
+        outcome['exit_code'] = result.returncode
+        outcome['matched'] = None
+        if expected is not None:
+            outcome['matched'] = normalize_output(result.stdout) == normalize_output(expected)
+        
+        if result.returncode != 0 or result.output_limit_exceeded:
+            outcome['status'] = 'runtime_error'
+        elif expected is None:
+            outcome['status'] = 'ok'
+        else:
+            outcome['status'] = 'passed' if outcome['matched'] else 'failed'
+        return outcome
+    
+    @staticmethod
+    def emit(on_event: Optional[EventCallback], event: str, **data):
+        """Report a streaming event if anyone is listening"""
+        if on_event:
+            on_event(event, data)
+    
+    @staticmethod
+    def output_forwarder(on_event: Optional[EventCallback]) -> Optional[OutputCallback]:
+        """Adapt on_event to process_runner's (stream, text) output callback"""
+        if not on_event:
+            return None
+        return lambda stream, text: on_event(stream, {'text': text})
+    
+    @staticmethod
+    def build_result(result: ProcessResult, start_time: Optional[float], compile_time: Optional[float] = None,
+                     sandbox: Optional[Sandbox] = None, **extra) -> Dict[str, Any]:
+        """Turn a finished process into the execution result returned to clients.
+        
+        execution_time is the end-to-end wall time since start_time (omitted
+        when it is None); run_time and compile_time split it by phase, and
+        cpu_time comes from the child's rusage.
+        """
+        error = result.stderr if result.returncode != 0 else None
+        notices = []
+        if result.output_limit_exceeded:
+            notices.append(f'Output limit of {OUTPUT_LIMIT_BYTES} bytes exceeded; the program was stopped')
+        if sandbox is not None:
+            notices.append(sandbox_pool.check_quota(sandbox))
+        for notice in filter(None, notices):
+            error = f'{error}\n{notice}' if error else notice
+        
+        response = {'output': result.stdout, 'error': error}
+        if start_time is not None:
+            response['execution_time'] = round(time.time() - start_time, 3)
+        response.update({
+            'run_time': round(result.wall_time, 3),
+            'truncated': result.truncated,
+            'stdout_bytes': result.stdout_bytes,
+            'stderr_bytes': result.stderr_bytes
+        })
+        if compile_time is not None:
+            response['compile_time'] = round(compile_time, 3)
+        if result.rusage:
+            response['cpu_time'] = {
+                'user': round(result.rusage['user_time'], 3),
+                'system': round(result.rusage['system_time'], 3)
+            }
+        response.update(extra)
+        return response
+    
+    def version_label(self, label: str) -> str:
+        """Label followed by the detected version of the primary toolchain"""
+        version = toolchain_registry.version(self.toolchains[0]) if self.toolchains else None
+        return f"{label} {version}" if version else label
 
 class PythonHandler(LanguageHandler):
     """Handler for Python code execution"""
     
+    toolchains = ('python',)
+    language_servers = ('pyright', 'pylsp')
+    supports_judge = True
+    supports_projects = True
+    
     def __init__(self):
         self.timeout = 30  # 30 seconds timeout
+        self.run_limits = RUN_LIMITS
+        
+        # Warm interpreters that fork a fresh child per run, skipping interpreter startup
+        self.zygote_pool = None
+        if PYTHON_ZYGOTE_POOL_SIZE > 0 and zygotes_supported():
+            self.zygote_pool = PythonZygotePool(PYTHON_ZYGOTE_POOL_SIZE, max_runs=PYTHON_ZYGOTE_MAX_RUNS)
+            self.zygote_pool.warm()
     
-    def execute(self, code: str) -> Dict[str, Any]:
+    def execute(self, code: str, on_event: Optional[EventCallback] = None, input_data: Optional[str] = None) -> Dict[str, Any]:
         """Execute Python code safely"""
         start_time = time.time()
         
         try:
-            # Create temporary file
-            with tempfile.NamedTemporaryFile(mode='w', suffix='.py', delete=False) as f:
-                f.write(code)
-                temp_file = f.name
-            
-            try:
-                # Execute Python code with timeout
-                result = subprocess.run(
-                    [sys.executable, temp_file],
-                    capture_output=True,
-                    text=True,
-                    timeout=self.timeout,
-                    cwd=tempfile.gettempdir()
-                )
-                
-                execution_time = time.time() - start_time
+            # Run in a private scratch directory that is wiped afterwards
+            with sandbox_pool.session() as sandbox:
+                script = sandbox.write('main.py', code)
+                self.emit(on_event, 'phase', name='run', state='start')
+                result = self._run_script(script, input_data, sandbox.path, self.output_forwarder(on_event))
+                self.emit(on_event, 'phase', name='run', state='end', returncode=result.returncode)
                 
-                return {
-                    'output': result.stdout,
-                    'error': result.stderr if result.returncode != 0 else None,
-                    'execution_time': round(execution_time, 3)
-                }
+                return self.build_result(result, start_time, sandbox=sandbox)
+                    
+        except subprocess.TimeoutExpired:
+            return {
+                'output': '',
+                'error': f'Code execution timed out after {self.timeout} seconds',
+                'execution_time': self.timeout
+            }
+        except Exception as e:
+            return {
+                'output': '',
+                'error': f'Execution error: {str(e)}',
+                'execution_time': time.time() - start_time
+            }
+    
+    def _run_script(self, script: str, input_data: Optional[str], cwd: str,
+                    on_output: Optional[OutputCallback], packages_dir: Optional[str] = None) -> ProcessResult:
+        # Prefer a forked child of a warm zygote; fall back to a cold interpreter.
+        # Zygotes import nothing third-party, so runs with packages always start cold.
+        result = None
+        if self.zygote_pool and packages_dir is None:
+            result = self.zygote_pool.run(
+                script, cwd, self.timeout,
+                input_data=input_data,
+                on_output=on_output,
+                limits=self.run_limits
+            )
+        
+        if result is None:
+            # Execute Python code with timeout
+            result = run_process(
+                [sys.executable, script],
+                timeout=self.timeout,
+                cwd=cwd,
+                env=dict(os.environ, PYTHONPATH=packages_dir, PYTHONNOUSERSITE='1') if packages_dir else None,
+                input_data=input_data,
+                on_output=on_output,
+                limits=self.run_limits
+            )
+        return result
+    
+    def execute_project(self, files: Dict[str, str], project_key: str, on_event: Optional[EventCallback] = None,
+                        input_data: Optional[str] = None) -> Dict[str, Any]:
+        """Run a multi-file Python project, with the packages its requirements.txt names.
+        
+        Packages come from a shared environment installed once per
+        requirements spec (see dependency_envs.py), so only the first run
+        of a spec pays for the install.
+        """
+        start_time = time.time()
+        
+        try:
+            files = normalize_files(files)
+            requirements = python_requirements(files.get('requirements.txt', ''))
+        except (ProjectError, DependencyError) as e:
+            return {'output': '', 'error': str(e), 'execution_time': 0}
+        entry_point = next((path for path in PYTHON_PROJECT_ENTRY_POINTS if path in files), None)
+        if entry_point is None:
+            return {'output': '', 'error': f'A Python project needs a {" or ".join(PYTHON_PROJECT_ENTRY_POINTS)} at its root',
+                    'execution_time': 0}
+        
+        try:
+            packages_dir, install_time, cache_hit = None, None, None
+            if requirements:
+                if not dependency_envs.python_available():
+                    return {'output': '', 'error': 'Installing packages is not available (no wheelhouse is configured)',
+                            'execution_time': 0}
+                self.emit(on_event, 'phase', name='install', state='start')
+                install_start = time.time()
+                packages_dir, install_error, cache_hit = dependency_envs.python_env(requirements)
+                install_time = round(time.time() - install_start, 3)
+                self.emit(on_event, 'phase', name='install', state='end', cached=cache_hit, success=install_error is None)
+                if install_error is not None:
+                    return {
+                        'output': '',
+                        'error': f'Dependency Installation Error:\n{install_error}',
+                        'execution_time': time.time() - start_time,
+                        'install_time': install_time
+                    }
+            
+            with sandbox_pool.session() as sandbox:
+                materialize(files, sandbox.path)
+                self.emit(on_event, 'phase', name='run', state='start')
+                result = self._run_script(os.path.join(sandbox.path, entry_point), input_data, sandbox.path,
+                                          self.output_forwarder(on_event), packages_dir)
+                self.emit(on_event, 'phase', name='run', state='end', returncode=result.returncode)
                 
-            finally:
-                # Clean up temporary file
-                try:
-                    os.unlink(temp_file)
-                except OSError:
-                    pass
+                if packages_dir is None:
+                    return self.build_result(result, start_time, sandbox=sandbox)
+                return self.build_result(result, start_time, sandbox=sandbox, install_time=install_time,
+                                         cached_dependencies=cache_hit)
                     
         except subprocess.TimeoutExpired:
             return {
@@ -83,6 +468,25 @@ class PythonHandler(LanguageHandler):
                 'execution_time': time.time() - start_time
             }
     
+    def prepare(self, code: str) -> PreparedProgram:
+        """Write the script once into a sandbox that lives until the program is closed"""
+        sandbox = sandbox_pool.acquire()
+        script = sandbox.write('main.py', code)
+        return PreparedProgram(
+            lambda input_data, cwd, on_output: self._run_script(script, input_data, cwd, on_output),
+            release=lambda: sandbox_pool.release(sandbox)
+        )
+    
+    def compiler_diagnostics(self, code: str) -> List[Dict[str, Any]]:
+        try:
+            ast.parse(code)
+        except SyntaxError as e:
+            # Some errors (unclosed brackets) carry no usable end position
+            has_end = bool(e.end_lineno and e.end_offset and e.end_offset > 0)
+            return [make_diagnostic(e.lineno or 1, e.offset or 1, e.msg, end_line=e.end_lineno if has_end else None,
+                                    end_column=e.end_offset if has_end else None, source='python')]
+        return []
+    
     def validate(self, code: str) -> Tuple[bool, Optional[str]]:
         """Validate Python syntax"""
         try:
@@ -105,17 +509,98 @@ class PythonHandler(LanguageHandler):
 class JavaScriptHandler(LanguageHandler):
     """Handler for JavaScript code execution using Node.js"""
     
+    toolchains = ('node',)
+    supports_judge = True
+    supports_projects = True
+    
     def __init__(self):
         self.timeout = 30
+        # V8 reserves far more address space than it uses, so cap its heap instead of RLIMIT_AS
+        self.run_limits = RUN_LIMITS.replace(memory_bytes=None)
+        self.heap_limit_mb = RUN_LIMITS.memory_bytes // (1024 * 1024)
+        
+        # Warm Node processes; each run gets a fresh worker thread with its own heap limit.
+        # The servers are long-lived, so the CPU limit is left to the per-run timeout.
+        self.server_pool = None
+        if NODE_SERVER_POOL_SIZE > 0:
+            self.server_pool = NodeServerPool(
+                NODE_SERVER_POOL_SIZE,
+                max_runs=NODE_SERVER_MAX_RUNS,
+                max_rss_bytes=NODE_SERVER_MAX_RSS_BYTES,
+                limits=self.run_limits.replace(cpu_seconds=None)
+            )
+            if toolchain_registry.is_available('node'):
+                self.server_pool.warm()
     
-    def execute(self, code: str) -> Dict[str, Any]:
+    def execute(self, code: str, on_event: Optional[EventCallback] = None, input_data: Optional[str] = None) -> Dict[str, Any]:
         """Execute JavaScript code using Node.js"""
         start_time = time.time()
         
+        # Check if Node.js is available
+        if not toolchain_registry.is_available('node'):
+            return {
+                'output': '',
+                'error': 'Node.js is not installed on this system',
+                'execution_time': 0
+            }
+        
         try:
-            # Check if Node.js is available
-            subprocess.run(['node', '--version'], capture_output=True, check=True)
-        except (subprocess.CalledProcessError, FileNotFoundError):
+            # Run in a private scratch directory that is wiped afterwards
+            with sandbox_pool.session() as sandbox:
+                script = sandbox.write('main.js', code)
+                self.emit(on_event, 'phase', name='run', state='start')
+                result = self._run_script(script, input_data, sandbox.path, self.output_forwarder(on_event))
+                self.emit(on_event, 'phase', name='run', state='end', returncode=result.returncode)
+                
+                return self.build_result(result, start_time, sandbox=sandbox)
+                    
+        except subprocess.TimeoutExpired:
+            return {
+                'output': '',
+                'error': f'Code execution timed out after {self.timeout} seconds',
+                'execution_time': self.timeout
+            }
+        except Exception as e:
+            return {
+                'output': '',
+                'error': f'Execution error: {str(e)}',
+                'execution_time': time.time() - start_time
+            }
+    
+    def _run_script(self, script: str, input_data: Optional[str], cwd: str,
+                    on_output: Optional[OutputCallback]) -> ProcessResult:
+        # Prefer a worker thread in a warm Node process, which enters cwd for the run; fall back to a cold node
+        result = None
+        if self.server_pool:
+            result = self.server_pool.run(
+                script, self.timeout, cwd,
+                input_data=input_data,
+                on_output=on_output,
+                heap_limit_mb=self.heap_limit_mb
+            )
+        if result is None:
+            result = run_process(
+                ['node', f'--max-old-space-size={self.heap_limit_mb}', script],
+                timeout=self.timeout,
+                cwd=cwd,
+                input_data=input_data,
+                on_output=on_output,
+                limits=self.run_limits
+            )
+        return result
+    
+    def execute_project(self, files: Dict[str, str], project_key: str, on_event: Optional[EventCallback] = None,
+                        input_data: Optional[str] = None) -> Dict[str, Any]:
+        """Run a multi-file Node project, with the packages its package.json depends on.
+        
+        Packages come from a shared node_modules installed once per
+        dependency spec (see dependency_envs.py) and linked into the run's
+        sandbox. Projects always run in a cold node so relative paths
+        resolve against the project directory.
+        """
+        start_time = time.time()
+        
+        if not toolchain_registry.is_available('node'):
             return {
                 'output': '',
                 'error': 'Node.js is not installed on this system',
@@ -123,35 +608,57 @@ class JavaScriptHandler(LanguageHandler):
             }
         
         try:
-            # Create temporary file
-            with tempfile.NamedTemporaryFile(mode='w', suffix='.js', delete=False) as f:
-                f.write(code)
-                temp_file = f.name
+            files = normalize_files(files)
+            dependencies = npm_dependencies(files['package.json']) if 'package.json' in files else {}
+            main = json.loads(files['package.json']).get('main') if 'package.json' in files else None
+        except (ProjectError, DependencyError) as e:
+            return {'output': '', 'error': str(e), 'execution_time': 0}
+        candidates = (os.path.normpath(main),) if isinstance(main, str) and main else NODE_PROJECT_ENTRY_POINTS
+        entry_point = next((path for path in candidates if path in files), None)
+        if entry_point is None:
+            return {'output': '', 'error': f'A Node project needs {" or ".join(candidates)} (or a "main" in package.json)',
+                    'execution_time': 0}
+        
+        try:
+            modules_dir, install_time, cache_hit = None, None, None
+            if dependencies:
+                if not dependency_envs.node_available():
+                    return {'output': '', 'error': 'Installing packages is not available (npm and an npm cache are required)',
+                            'execution_time': 0}
+                self.emit(on_event, 'phase', name='install', state='start')
+                install_start = time.time()
+                modules_dir, install_error, cache_hit = dependency_envs.node_env(dependencies, files.get('package-lock.json'))
+                install_time = round(time.time() - install_start, 3)
+                self.emit(on_event, 'phase', name='install', state='end', cached=cache_hit, success=install_error is None)
+                if install_error is not None:
+                    return {
+                        'output': '',
+                        'error': f'Dependency Installation Error:\n{install_error}',
+                        'execution_time': time.time() - start_time,
+                        'install_time': install_time
+                    }
             
-            try:
-                # Execute JavaScript code
-                result = subprocess.run(
-                    ['node', temp_file],
-                    capture_output=True,
-                    text=True,
+            with sandbox_pool.session() as sandbox:
+                # Any node_modules the project carries is replaced by the installed one
+                materialize({path: content for path, content in files.items()
+                             if modules_dir is None or not path.startswith('node_modules/')}, sandbox.path)
+                if modules_dir is not None:
+                    os.symlink(modules_dir, os.path.join(sandbox.path, 'node_modules'))
+                self.emit(on_event, 'phase', name='run', state='start')
+                result = run_process(
+                    ['node', f'--max-old-space-size={self.heap_limit_mb}', entry_point],
                     timeout=self.timeout,
-                    cwd=tempfile.gettempdir()
+                    cwd=sandbox.path,
+                    input_data=input_data,
+                    on_output=self.output_forwarder(on_event),
+                    limits=self.run_limits
                 )
+                self.emit(on_event, 'phase', name='run', state='end', returncode=result.returncode)
                 
-                execution_time = time.time() - start_time
-                
-                return {
-                    'output': result.stdout,
-                    'error': result.stderr if result.returncode != 0 else None,
-                    'execution_time': round(execution_time, 3)
-                }
-                
-            finally:
-                # Clean up temporary file
-                try:
-                    os.unlink(temp_file)
-                except OSError:
-                    pass
+                if modules_dir is None:
+                    return self.build_result(result, start_time, sandbox=sandbox)
+                return self.build_result(result, start_time, sandbox=sandbox, install_time=install_time,
+                                         cached_dependencies=cache_hit)
                     
         except subprocess.TimeoutExpired:
             return {
@@ -166,7 +673,29 @@ class JavaScriptHandler(LanguageHandler):
                 'execution_time': time.time() - start_time
             }
     
-    def validate(self, code: str) -> Tuple[bool, Optional[str]]:
+    def prepare(self, code: str) -> PreparedProgram:
+        """Write the script once into a sandbox that lives until the program is closed"""
+        sandbox = sandbox_pool.acquire()
+        script = sandbox.write('main.js', code)
+        return PreparedProgram(
+            lambda input_data, cwd, on_output: self._run_script(script, input_data, cwd, on_output),
+            release=lambda: sandbox_pool.release(sandbox)
+        )
+    
+    def compiler_diagnostics(self, code: str) -> List[Dict[str, Any]]:
+        is_valid, message = self.validate(code)
+        if is_valid is None:
+            raise CheckNotRun(message)
+        if is_valid:
+            return []
+        # node --check prints '[stdin]:<line>', the source line, a caret line, then the error
+        lines = message.split('\n')
+        line = int(lines[0].rpartition(':')[2]) if lines[0].rpartition(':')[2].isdigit() else 1
+        column = lines[2].index('^') + 1 if len(lines) > 2 and '^' in lines[2] else 1
+        error = next((entry for entry in lines if 'Error' in entry and not entry.startswith(' ')), message)
+        return [make_diagnostic(line, column, error.strip(), source='node')]
+    
+    def validate(self, code: str) -> Tuple[Optional[bool], Optional[str]]:
         """Validate JavaScript syntax using Node.js"""
         try:
             # Use Node.js syntax check
@@ -183,15 +712,16 @@ class JavaScriptHandler(LanguageHandler):
             else:
                 return False, result.stderr.strip()
                 
-        except (subprocess.CalledProcessError, FileNotFoundError, subprocess.TimeoutExpired):
-            # If Node.js is not available or check fails, return basic validation
-            return True, "Syntax validation not available (Node.js required)"
+        except FileNotFoundError:
+            return None, "Syntax validation not available (Node.js required)"
+        except subprocess.TimeoutExpired:
+            return None, "Syntax validation timed out"
     
     def get_language_info(self) -> Dict[str, str]:
         """Get JavaScript language information"""
         return {
             'name': 'JavaScript',
-            'version': 'Node.js',
+            'version': self.version_label('Node.js'),
             'file_extension': '.js',
             'monaco_language': 'javascript'
         }
@@ -199,68 +729,165 @@ class JavaScriptHandler(LanguageHandler):
 class CHandler(LanguageHandler):
     """Handler for C code execution"""
     
+    toolchains = ('gcc',)
+    language_servers = ('clangd',)
+    supports_judge = True
+    supports_projects = True
+    # Compiler driver, its display name and the source file single-file programs are compiled from
+    compiler = 'gcc'
+    compiler_name = 'GCC'
+    source_name = 'main.c'
+    
     def __init__(self):
         self.timeout = 30
+        self.run_limits = RUN_LIMITS
+        self.compile_flags: List[str] = []
     
-    def execute(self, code: str) -> Dict[str, Any]:
+    def execute(self, code: str, on_event: Optional[EventCallback] = None, input_data: Optional[str] = None) -> Dict[str, Any]:
         """Execute C code"""
         start_time = time.time()
         
-        try:
-            # Check if GCC is available
-            subprocess.run(['gcc', '--version'], capture_output=True, check=True)
-        except (subprocess.CalledProcessError, FileNotFoundError):
+        # Check if the compiler is available
+        if not toolchain_registry.is_available(self.compiler):
             return {
                 'output': '',
-                'error': 'GCC compiler is not installed on this system',
+                'error': f'{self.compiler_name} compiler is not installed on this system',
                 'execution_time': 0
             }
         
         try:
-            # Create temporary C file
-            with tempfile.NamedTemporaryFile(mode='w', suffix='.c', delete=False) as f:
-                f.write(code)
-                temp_file = f.name
+            # Compile, reusing a cached binary for byte-identical source
+            self.emit(on_event, 'phase', name='compile', state='start')
+            compile_start = time.time()
+            artifact_dir, compile_error, cache_hit = self._compile(code)
+            compile_time = time.time() - compile_start
+            self.emit(on_event, 'phase', name='compile', state='end', cached=cache_hit, success=compile_error is None)
             
-            # Compile
-            exe_file = temp_file.replace('.c', '')
-            compile_result = subprocess.run(
-                ['gcc', temp_file, '-o', exe_file],
-                capture_output=True,
-                text=True,
-                timeout=15
-            )
-            
-            if compile_result.returncode != 0:
+            if compile_error is not None:
                 return {
                     'output': '',
-                    'error': f'Compilation Error:\n{compile_result.stderr}',
-                    'execution_time': time.time() - start_time
+                    'error': f'Compilation Error:\n{compile_error}',
+                    'execution_time': time.time() - start_time,
+                    'compile_time': round(compile_time, 3)
                 }
             
-            # Execute
-            result = subprocess.run(
-                [exe_file],
-                capture_output=True,
-                text=True,
-                timeout=self.timeout,
-                cwd=tempfile.gettempdir()
-            )
-            
-            execution_time = time.time() - start_time
+            # Execute in a private scratch directory that is wiped afterwards
+            self.emit(on_event, 'phase', name='run', state='start')
+            with sandbox_pool.session() as sandbox:
+                result = run_process(
+                    [os.path.join(artifact_dir, 'main')],
+                    timeout=self.timeout,
+                    cwd=sandbox.path,
+                    input_data=input_data,
+                    on_output=self.output_forwarder(on_event),
+                    limits=self.run_limits
+                )
+                self.emit(on_event, 'phase', name='run', state='end', returncode=result.returncode)
+                
+                return self.build_result(result, start_time, compile_time=compile_time, sandbox=sandbox, cached_build=cache_hit)
             
-            # Cleanup
-            try:
-                os.unlink(temp_file)
-                os.unlink(exe_file)
-            except OSError:
-                pass
+        except subprocess.TimeoutExpired:
+            return {
+                'output': '',
+                'error': f'Code execution timed out after {self.timeout} seconds',
+                'execution_time': self.timeout
+            }
+        except Exception as e:
+            return {
+                'output': '',
+                'error': f'Execution error: {str(e)}',
+                'execution_time': time.time() - start_time
+            }
+    
+    def include_flags(self) -> List[str]:
+        """Extra include options that only speed up compiling, so they stay out of cache keys"""
+        return []
+    
+    def project_flags(self) -> Dict[str, List[str]]:
+        """Compile flags for each driver in a multi-file project (see ProjectBuilder.build)"""
+        return {'gcc': self.compile_flags, 'g++': self.compile_flags}
+    
+    def _compile(self, code: str) -> Tuple[Optional[str], Optional[str], bool]:
+        """Compile source into a cached artifact directory containing 'main'"""
+        key = CompileCache.make_key(self.compiler, code, toolchain_registry.version_string(self.compiler), *self.compile_flags)
+        
+        def build(build_dir: str) -> Tuple[bool, str]:
+            source_file = os.path.join(build_dir, self.source_name)
+            with open(source_file, 'w') as f:
+                f.write(code)
             
+            compile_result = run_process(
+                [self.compiler, *self.compile_flags, *self.include_flags(), source_file, '-o', os.path.join(build_dir, 'main')],
+                timeout=15,
+                limits=COMPILE_LIMITS
+            )
+            os.unlink(source_file)
+            return compile_result.returncode == 0, compile_result.stderr
+        
+        return compile_cache.get_or_build(key, build)
+    
+    def prepare(self, code: str) -> PreparedProgram:
+        return self.prepare_compiled(lambda: self._compile(code), lambda artifact_dir: [os.path.join(artifact_dir, 'main')])
+    
+    def execute_project(self, files: Dict[str, str], project_key: str, on_event: Optional[EventCallback] = None,
+                        input_data: Optional[str] = None) -> Dict[str, Any]:
+        """Build a C/C++ project incrementally, recompiling only changed translation units, and run it"""
+        start_time = time.time()
+        
+        if not toolchain_registry.is_available(self.compiler):
             return {
-                'output': result.stdout,
-                'error': result.stderr if result.returncode != 0 else None,
-                'execution_time': round(execution_time, 3)
+                'output': '',
+                'error': f'{self.compiler_name} compiler is not installed on this system',
+                'execution_time': 0
             }
+        
+        try:
+            files = normalize_files(files)
+        except ProjectError as e:
+            return {'output': '', 'error': str(e), 'execution_time': 0}
+        
+        try:
+            # Build from the project's persistent workspace, where only changed files are rewritten
+            self.emit(on_event, 'phase', name='compile', state='start')
+            compile_start = time.time()
+            toolchain = '\n'.join(toolchain_registry.version_string(name) for name in ('gcc', 'g++'))
+            with workspace_cache.checkout(project_key, files) as workspace:
+                build = project_builder.build(project_key, files, workspace.path, self.project_flags(), toolchain)
+            compile_time = time.time() - compile_start
+            cache_hit = not build['compiled'] and not build['linked']
+            self.emit(on_event, 'phase', name='compile', state='end', cached=cache_hit, success=build['error'] is None)
+            
+            if build['error'] is not None:
+                return {
+                    'output': '',
+                    'error': f'Compilation Error:\n{build["error"]}',
+                    'execution_time': time.time() - start_time,
+                    'compile_time': round(compile_time, 3),
+                    'compiled_units': build['compiled'],
+                    'reused_units': build['reused'],
+                    'files_written': workspace.written
+                }
+            
+            # The run gets a private copy of the project's data files; sources stay in the workspace
+            self.emit(on_event, 'phase', name='run', state='start')
+            try:
+                with sandbox_pool.session() as sandbox:
+                    materialize(runtime_files(files), sandbox.path)
+                    result = run_process(
+                        [build['binary']],
+                        timeout=self.timeout,
+                        cwd=sandbox.path,
+                        input_data=input_data,
+                        on_output=self.output_forwarder(on_event),
+                        limits=self.run_limits
+                    )
+                    self.emit(on_event, 'phase', name='run', state='end', returncode=result.returncode)
+                    
+                    return self.build_result(result, start_time, compile_time=compile_time, sandbox=sandbox,
+                                             cached_build=cache_hit, compiled_units=build['compiled'],
+                                             reused_units=build['reused'], files_written=workspace.written)
+            finally:
+                project_builder.release(build)
             
         except subprocess.TimeoutExpired:
             return {
@@ -275,22 +902,19 @@ class CHandler(LanguageHandler):
                 'execution_time': time.time() - start_time
             }
     
-    def validate(self, code: str) -> Tuple[bool, Optional[str]]:
-        """Validate C syntax"""
+    def validate(self, code: str) -> Tuple[Optional[bool], Optional[str]]:
+        """Validate syntax with the compiler's -fsyntax-only"""
         try:
-            # Try syntax check with gcc
-            with tempfile.NamedTemporaryFile(mode='w', suffix='.c', delete=False) as f:
-                f.write(code)
-                temp_file = f.name
-            
-            result = subprocess.run(
-                ['gcc', '-fsyntax-only', temp_file],
-                capture_output=True,
-                text=True,
-                timeout=10
-            )
-            
-            os.unlink(temp_file)
+            with sandbox_pool.session() as sandbox:
+                sandbox.write(self.source_name, code)
+                
+                result = subprocess.run(
+                    [self.compiler, *self.compile_flags, *self.include_flags(), '-fsyntax-only', self.source_name],
+                    capture_output=True,
+                    text=True,
+                    cwd=sandbox.path,
+                    timeout=10
+                )
             
             if result.returncode == 0:
                 return True, None
@@ -298,31 +922,85 @@ class CHandler(LanguageHandler):
                 return False, result.stderr.strip()
                 
         except Exception as e:
-            return False, f"Validation error: {str(e)}"
+            return None, f"Validation error: {str(e)}"
     
     def get_language_info(self) -> Dict[str, str]:
         """Get C language information"""
         return {
             'name': 'C',
-            'version': 'GCC',
+            'version': self.version_label('GCC'),
             'file_extension': '.c',
             'monaco_language': 'c'
         }
 
+class CppHandler(CHandler):
+    """Handler for C++ code execution in one build profile.
+    
+    The factory registers one instance per profile in CPP_PROFILES. Heavy
+    standard headers are precompiled per profile (precompiled_headers.py),
+    which takes a typical #include <bits/stdc++.h> program from seconds to
+    a fraction of one.
+    """
+    
+    toolchains = ('g++',)
+    compiler = 'g++'
+    compiler_name = 'G++'
+    source_name = 'main.cpp'
+    
+    def __init__(self, profile: str = CPP_DEFAULT_PROFILE):
+        super().__init__()
+        self.profile = profile
+        self.optimization_flags = CPP_PROFILES[profile]
+        self.compile_flags = [f'-std={CPP_STANDARD}', *self.optimization_flags]
+    
+    def include_flags(self) -> List[str]:
+        pch_dir = precompiled_headers.include_dir(
+            self.compiler, toolchain_registry.version_string(self.compiler), self.compile_flags
+        )
+        return ['-I', pch_dir] if pch_dir else []
+    
+    def project_flags(self) -> Dict[str, List[str]]:
+        # C sources in a C++ project get the profile's optimization level but not the C++ standard
+        return {'gcc': self.optimization_flags, 'g++': self.compile_flags}
+    
+    def get_language_info(self) -> Dict[str, str]:
+        """Get C++ language information"""
+        return {
+            'name': 'C++',
+            'version': self.version_label('G++'),
+            'file_extension': '.cpp',
+            'monaco_language': 'cpp'
+        }
+
 class JavaHandler(LanguageHandler):
     """Handler for Java code execution"""
     
+    toolchains = ('javac', 'java')
+    language_servers = ('jdtls',)
+    supports_judge = True
+    
     def __init__(self):
         self.timeout = 30
+        # The JVM reserves far more address space than it uses, so cap its heap instead of RLIMIT_AS
+        self.run_limits = RUN_LIMITS.replace(memory_bytes=None)
+        self.heap_limit_mb = RUN_LIMITS.memory_bytes // (1024 * 1024)
+        self.compile_flags: List[str] = []
+        
+        # Optional long-lived JVMs; the server enforces the per-run timeout, so no CPU rlimit
+        self.worker_pool = None
+        if JAVA_WORKER_POOL_SIZE > 0:
+            self.worker_pool = JavaWorkerPool(
+                JAVA_WORKER_POOL_SIZE, compile_cache, sandbox_pool, self.heap_limit_mb,
+                max_runs=JAVA_WORKER_MAX_RUNS,
+                limits=self.run_limits.replace(cpu_seconds=None)
+            )
     
-    def execute(self, code: str) -> Dict[str, Any]:
+    def execute(self, code: str, on_event: Optional[EventCallback] = None, input_data: Optional[str] = None) -> Dict[str, Any]:
         """Execute Java code"""
         start_time = time.time()
         
-        try:
-            # Check if Java is available
-            subprocess.run(['javac', '-version'], capture_output=True, check=True)
-        except (subprocess.CalledProcessError, FileNotFoundError):
+        # Check if Java is available
+        if not (toolchain_registry.is_available('javac') and toolchain_registry.is_available('java')):
             return {
                 'output': '',
                 'error': 'Java compiler (javac) is not installed on this system',
@@ -330,65 +1008,44 @@ class JavaHandler(LanguageHandler):
             }
         
         try:
-            # Extract class name from code
-            class_name = 'Main'  # Default
-            lines = code.split('\n')
-            for line in lines:
-                if 'public class' in line:
-                    parts = line.split()
-                    if len(parts) >= 3:
-                        class_name = parts[2]
-                    break
-            
-            # Create temporary Java file
-            with tempfile.NamedTemporaryFile(mode='w', suffix='.java', delete=False) as f:
-                f.write(code)
-                temp_file = f.name
+            source = parse_source(code)
             
-            # Rename to match class name
-            java_file = os.path.join(os.path.dirname(temp_file), f'{class_name}.java')
-            os.rename(temp_file, java_file)
+            # Prefer a warm JVM; fall back to javac/java when none can take the run. The worker
+            # names the source after the class it launches, so both must be the same class.
+            if self.worker_pool and source.file_class == source.main_class:
+                response = self._execute_on_worker(code, source.qualified_main_class, start_time, on_event, input_data)
+                if response is not None:
+                    return response
             
-            # Compile
-            compile_result = subprocess.run(
-                ['javac', java_file],
-                capture_output=True,
-                text=True,
-                timeout=15,
-                cwd=os.path.dirname(java_file)
-            )
+            # Compile, reusing cached classes for byte-identical source
+            self.emit(on_event, 'phase', name='compile', state='start')
+            compile_start = time.time()
+            artifact_dir, compile_error, cache_hit = self._compile(code, source)
+            compile_time = time.time() - compile_start
+            self.emit(on_event, 'phase', name='compile', state='end', cached=cache_hit, success=compile_error is None)
             
-            if compile_result.returncode != 0:
+            if compile_error is not None:
                 return {
                     'output': '',
-                    'error': f'Compilation Error:\n{compile_result.stderr}',
-                    'execution_time': time.time() - start_time
+                    'error': f'Compilation Error:\n{compile_error}',
+                    'execution_time': time.time() - start_time,
+                    'compile_time': round(compile_time, 3)
                 }
             
-            # Execute
-            result = subprocess.run(
-                ['java', class_name],
-                capture_output=True,
-                text=True,
-                timeout=self.timeout,
-                cwd=os.path.dirname(java_file)
-            )
-            
-            execution_time = time.time() - start_time
-            
-            # Cleanup
-            try:
-                os.unlink(java_file)
-                class_file = os.path.join(os.path.dirname(java_file), f'{class_name}.class')
-                os.unlink(class_file)
-            except OSError:
-                pass
-            
-            return {
-                'output': result.stdout,
-                'error': result.stderr if result.returncode != 0 else None,
-                'execution_time': round(execution_time, 3)
-            }
+            # Execute in a private scratch directory that is wiped afterwards
+            self.emit(on_event, 'phase', name='run', state='start')
+            with sandbox_pool.session() as sandbox:
+                result = run_process(
+                    ['java', f'-Xmx{self.heap_limit_mb}m', '-cp', artifact_dir, source.qualified_main_class],
+                    timeout=self.timeout,
+                    cwd=sandbox.path,
+                    input_data=input_data,
+                    on_output=self.output_forwarder(on_event),
+                    limits=self.run_limits
+                )
+                self.emit(on_event, 'phase', name='run', state='end', returncode=result.returncode)
+                
+                return self.build_result(result, start_time, compile_time=compile_time, sandbox=sandbox, cached_build=cache_hit)
             
         except subprocess.TimeoutExpired:
             return {
@@ -403,15 +1060,105 @@ class JavaHandler(LanguageHandler):
                 'execution_time': time.time() - start_time
             }
     
-    def validate(self, code: str) -> Tuple[bool, Optional[str]]:
-        """Validate Java syntax"""
-        return True, "Java syntax validation available after compilation"
+    def _execute_on_worker(self, code: str, class_name: str, start_time: float,
+                           on_event: Optional[EventCallback], input_data: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """Compile and run on a worker JVM, or return None if no worker is available.
+        
+        The worker answers once the run is over, so output is forwarded as a
+        single event per stream rather than live.
+        """
+        served = self.worker_pool.run(code, class_name, self.timeout, toolchain_registry.version_string('javac'), input_data)
+        if served is None:
+            return None
+        status, compile_time, result, quota_notice = served
+        self.emit(on_event, 'phase', name='compile', state='start')
+        self.emit(on_event, 'phase', name='compile', state='end', cached=False, success=status != 'COMPILE_ERROR')
+        
+        if status == 'COMPILE_ERROR':
+            return {
+                'output': '',
+                'error': f'Compilation Error:\n{result.stderr}',
+                'execution_time': time.time() - start_time,
+                'compile_time': round(compile_time, 3)
+            }
+        
+        self.emit(on_event, 'phase', name='run', state='start')
+        for stream in ('stdout', 'stderr'):
+            text = getattr(result, stream)
+            if text:
+                self.emit(on_event, stream, text=text)
+        self.emit(on_event, 'phase', name='run', state='end', returncode=result.returncode)
+        
+        response = self.build_result(result, start_time, compile_time=compile_time, jvm_worker=True)
+        if quota_notice:
+            response['error'] = f"{response['error']}\n{quota_notice}" if response['error'] else quota_notice
+        return response
+    
+    def _compile(self, code: str, source: JavaSource) -> Tuple[Optional[str], Optional[str], bool]:
+        """Compile Java source into a cached directory of .class files.
+        
+        Each build gets its own directory from the compile cache and javac
+        writes classes there (in package directories) with -d, so concurrent
+        builds of different programs that both declare Main never share files.
+        """
+        key = CompileCache.make_key('java', code, source.file_name, toolchain_registry.version_string('javac'), *self.compile_flags)
+        
+        def build(build_dir: str) -> Tuple[bool, str]:
+            java_file = os.path.join(build_dir, source.file_name)
+            with open(java_file, 'w') as f:
+                f.write(code)
+            
+            compile_result = run_process(
+                ['javac', *self.compile_flags, '-d', build_dir, java_file],
+                timeout=15,
+                cwd=build_dir,
+                limits=COMPILE_LIMITS
+            )
+            os.unlink(java_file)
+            return compile_result.returncode == 0, compile_result.stderr
+        
+        return compile_cache.get_or_build(key, build)
+    
+    def prepare(self, code: str) -> PreparedProgram:
+        """Compile with javac once; each case starts its own JVM"""
+        source = parse_source(code)
+        return self.prepare_compiled(
+            lambda: self._compile(code, source),
+            lambda artifact_dir: ['java', f'-Xmx{self.heap_limit_mb}m', '-cp', artifact_dir, source.qualified_main_class]
+        )
+    
+    def source_file_name(self, code: str) -> str:
+        return parse_source(code).file_name
+    
+    def validate(self, code: str) -> Tuple[Optional[bool], Optional[str]]:
+        """Validate Java by compiling it; class files go to the sandbox and are discarded"""
+        if not toolchain_registry.is_available('javac'):
+            return None, "Java syntax validation not available (javac required)"
+        try:
+            with sandbox_pool.session() as sandbox:
+                java_file = sandbox.write(self.source_file_name(code), code)
+                
+                result = subprocess.run(
+                    ['javac', *self.compile_flags, '-d', sandbox.path, os.path.basename(java_file)],
+                    capture_output=True,
+                    text=True,
+                    cwd=sandbox.path,
+                    timeout=20
+                )
+            
+            if result.returncode == 0:
+                return True, None
+            else:
+                return False, result.stderr.strip()
+                
+        except Exception as e:
+            return None, f"Validation error: {str(e)}"
     
     def get_language_info(self) -> Dict[str, str]:
         """Get Java language information"""
         return {
             'name': 'Java',
-            'version': 'OpenJDK',
+            'version': self.version_label('OpenJDK'),
             'file_extension': '.java',
             'monaco_language': 'java'
         }
@@ -419,17 +1166,27 @@ class JavaHandler(LanguageHandler):
 class GoHandler(LanguageHandler):
     """Handler for Go code execution"""
     
+    toolchains = ('go',)
+    language_servers = ('gopls',)
+    supports_judge = True
+    
     def __init__(self):
         self.timeout = 30
+        # The Go runtime reserves more address space than RLIMIT_AS allows, so use its soft memory limit
+        self.run_limits = RUN_LIMITS.replace(memory_bytes=None)
+        self.run_env = dict(os.environ, GOMEMLIMIT=str(RUN_LIMITS.memory_bytes))
+        self.compile_flags: List[str] = []
+        self.build_cache_dir = GO_BUILD_CACHE_DIR
+        self.build_cache_max_bytes = GO_BUILD_CACHE_MAX_BYTES
+        self._last_cache_check = 0.0
+        self._cache_lock = threading.Lock()
     
-    def execute(self, code: str) -> Dict[str, Any]:
+    def execute(self, code: str, on_event: Optional[EventCallback] = None, input_data: Optional[str] = None) -> Dict[str, Any]:
         """Execute Go code"""
         start_time = time.time()
         
-        try:
-            # Check if Go is available
-            subprocess.run(['go', 'version'], capture_output=True, check=True)
-        except (subprocess.CalledProcessError, FileNotFoundError):
+        # Check if Go is available
+        if not toolchain_registry.is_available('go'):
             return {
                 'output': '',
                 'error': 'Go compiler is not installed on this system',
@@ -437,33 +1194,36 @@ class GoHandler(LanguageHandler):
             }
         
         try:
-            # Create temporary Go file
-            with tempfile.NamedTemporaryFile(mode='w', suffix='.go', delete=False) as f:
-                f.write(code)
-                temp_file = f.name
+            # Build, reusing a cached binary for byte-identical source
+            self.emit(on_event, 'phase', name='compile', state='start')
+            compile_start = time.time()
+            artifact_dir, compile_error, cache_hit = self._compile(code)
+            compile_time = time.time() - compile_start
+            self.emit(on_event, 'phase', name='compile', state='end', cached=cache_hit, success=compile_error is None)
             
-            # Execute Go code directly
-            result = subprocess.run(
-                ['go', 'run', temp_file],
-                capture_output=True,
-                text=True,
-                timeout=self.timeout,
-                cwd=tempfile.gettempdir()
-            )
-            
-            execution_time = time.time() - start_time
-            
-            # Cleanup
-            try:
-                os.unlink(temp_file)
-            except OSError:
-                pass
+            if compile_error is not None:
+                return {
+                    'output': '',
+                    'error': f'Compilation Error:\n{compile_error}',
+                    'execution_time': time.time() - start_time,
+                    'compile_time': round(compile_time, 3)
+                }
             
-            return {
-                'output': result.stdout,
-                'error': result.stderr if result.returncode != 0 else None,
-                'execution_time': round(execution_time, 3)
-            }
+            # Execute in a private scratch directory that is wiped afterwards
+            self.emit(on_event, 'phase', name='run', state='start')
+            with sandbox_pool.session() as sandbox:
+                result = run_process(
+                    [os.path.join(artifact_dir, 'main')],
+                    timeout=self.timeout,
+                    cwd=sandbox.path,
+                    env=self.run_env,
+                    input_data=input_data,
+                    on_output=self.output_forwarder(on_event),
+                    limits=self.run_limits
+                )
+                self.emit(on_event, 'phase', name='run', state='end', returncode=result.returncode)
+                
+                return self.build_result(result, start_time, compile_time=compile_time, sandbox=sandbox, cached_build=cache_hit)
             
         except subprocess.TimeoutExpired:
             return {
@@ -478,21 +1238,69 @@ class GoHandler(LanguageHandler):
                 'execution_time': time.time() - start_time
             }
     
-    def validate(self, code: str) -> Tuple[bool, Optional[str]]:
-        """Validate Go syntax"""
-        try:
-            with tempfile.NamedTemporaryFile(mode='w', suffix='.go', delete=False) as f:
+    def build_env(self) -> Dict[str, str]:
+        """Environment for go commands: the shared build cache and no toolchain downloads"""
+        env = dict(os.environ)
+        env['GOCACHE'] = self.build_cache_dir
+        env['GOTOOLCHAIN'] = 'local'
+        return env
+    
+    def _compile(self, code: str) -> Tuple[Optional[str], Optional[str], bool]:
+        """Build Go source into a cached artifact directory containing 'main'"""
+        key = CompileCache.make_key('go', code, toolchain_registry.version_string('go'), *self.compile_flags)
+        
+        def build(build_dir: str) -> Tuple[bool, str]:
+            source_file = os.path.join(build_dir, 'main.go')
+            with open(source_file, 'w') as f:
                 f.write(code)
-                temp_file = f.name
             
-            result = subprocess.run(
-                ['go', 'fmt', temp_file],
-                capture_output=True,
-                text=True,
-                timeout=10
+            compile_result = run_process(
+                # -trimpath keeps the random build directory out of the binary and the cache keys
+                ['go', 'build', '-trimpath', *self.compile_flags, '-o', os.path.join(build_dir, 'main'), source_file],
+                timeout=30,
+                cwd=build_dir,
+                env=self.build_env(),
+                limits=COMPILE_LIMITS
             )
-            
-            os.unlink(temp_file)
+            os.unlink(source_file)
+            self._trim_build_cache()
+            return compile_result.returncode == 0, compile_result.stderr
+        
+        return compile_cache.get_or_build(key, build)
+    
+    def _trim_build_cache(self):
+        """Clear GOCACHE once it grows past its cap; checked at most every GO_BUILD_CACHE_CHECK_INTERVAL"""
+        with self._cache_lock:
+            now = time.monotonic()
+            if now - self._last_cache_check < GO_BUILD_CACHE_CHECK_INTERVAL:
+                return
+            self._last_cache_check = now
+        
+        if dir_size(self.build_cache_dir) <= self.build_cache_max_bytes:
+            return
+        try:
+            run_process(['go', 'clean', '-cache'], timeout=60, env=self.build_env(), limits=COMPILE_LIMITS)
+        except subprocess.TimeoutExpired:
+            logging.warning("Timed out clearing the Go build cache")
+    
+    def prepare(self, code: str) -> PreparedProgram:
+        return self.prepare_compiled(lambda: self._compile(code), lambda artifact_dir: [os.path.join(artifact_dir, 'main')],
+                                     env=self.run_env)
+    
+    def validate(self, code: str) -> Tuple[Optional[bool], Optional[str]]:
+        """Validate Go by type-checking it; nothing is written back to the source"""
+        try:
+            with sandbox_pool.session() as sandbox:
+                sandbox.write('main.go', code)
+                
+                result = subprocess.run(
+                    ['go', 'build', *self.compile_flags, '-o', os.devnull, 'main.go'],
+                    capture_output=True,
+                    text=True,
+                    cwd=sandbox.path,
+                    env=self.build_env(),
+                    timeout=20
+                )
             
             if result.returncode == 0:
                 return True, None
@@ -500,31 +1308,45 @@ class GoHandler(LanguageHandler):
                 return False, result.stderr.strip()
                 
         except Exception as e:
-            return False, f"Validation error: {str(e)}"
+            return None, f"Validation error: {str(e)}"
     
     def get_language_info(self) -> Dict[str, str]:
         """Get Go language information"""
         return {
             'name': 'Go',
-            'version': 'Go',
+            'version': self.version_label('Go'),
             'file_extension': '.go',
             'monaco_language': 'go'
         }
 
 class RustHandler(LanguageHandler):
-    """Handler for Rust code execution"""
+    """Handler for Rust code execution in one build profile.
     
-    def __init__(self):
+    The factory registers one instance per profile in RUST_PROFILES.
+    Profiles in RUST_INCREMENTAL_PROFILES compile with -C incremental in a
+    persistent directory per user, so an edit-run loop only recompiles
+    what the edit touched. Snippets that use vendored crates, and Cargo
+    projects, are built offline with cargo (see cargo_builds.py).
+    """
+    
+    toolchains = ('rustc',)
+    language_servers = ('rust-analyzer',)
+    supports_judge = True
+    supports_projects = True
+    
+    def __init__(self, profile: str = RUST_DEFAULT_PROFILE):
         self.timeout = 30
+        self.run_limits = RUN_LIMITS
+        self.profile = profile
+        self.compile_flags: List[str] = list(RUST_PROFILES[profile])
+        self.incremental = profile in RUST_INCREMENTAL_PROFILES
     
-    def execute(self, code: str) -> Dict[str, Any]:
+    def execute(self, code: str, on_event: Optional[EventCallback] = None, input_data: Optional[str] = None) -> Dict[str, Any]:
         """Execute Rust code"""
         start_time = time.time()
         
-        try:
-            # Check if Rust is available
-            subprocess.run(['rustc', '--version'], capture_output=True, check=True)
-        except (subprocess.CalledProcessError, FileNotFoundError):
+        # Check if Rust is available
+        if not toolchain_registry.is_available('rustc'):
             return {
                 'output': '',
                 'error': 'Rust compiler (rustc) is not installed on this system',
@@ -532,50 +1354,161 @@ class RustHandler(LanguageHandler):
             }
         
         try:
-            # Create temporary Rust file
-            with tempfile.NamedTemporaryFile(mode='w', suffix='.rs', delete=False) as f:
-                f.write(code)
-                temp_file = f.name
+            # Compile, reusing a cached binary for byte-identical source
+            self.emit(on_event, 'phase', name='compile', state='start')
+            compile_start = time.time()
+            artifact_dir, compile_error, cache_hit = self._compile(code)
+            compile_time = time.time() - compile_start
+            self.emit(on_event, 'phase', name='compile', state='end', cached=cache_hit, success=compile_error is None)
             
-            # Compile
-            exe_file = temp_file.replace('.rs', '')
-            compile_result = subprocess.run(
-                ['rustc', temp_file, '-o', exe_file],
-                capture_output=True,
-                text=True,
-                timeout=20
-            )
-            
-            if compile_result.returncode != 0:
+            if compile_error is not None:
                 return {
                     'output': '',
-                    'error': f'Compilation Error:\n{compile_result.stderr}',
-                    'execution_time': time.time() - start_time
+                    'error': f'Compilation Error:\n{compile_error}',
+                    'execution_time': time.time() - start_time,
+                    'compile_time': round(compile_time, 3)
                 }
             
-            # Execute
-            result = subprocess.run(
-                [exe_file],
-                capture_output=True,
-                text=True,
-                timeout=self.timeout,
-                cwd=tempfile.gettempdir()
-            )
-            
-            execution_time = time.time() - start_time
+            # Execute in a private scratch directory that is wiped afterwards
+            self.emit(on_event, 'phase', name='run', state='start')
+            with sandbox_pool.session() as sandbox:
+                result = run_process(
+                    [os.path.join(artifact_dir, 'main')],
+                    timeout=self.timeout,
+                    cwd=sandbox.path,
+                    input_data=input_data,
+                    on_output=self.output_forwarder(on_event),
+                    limits=self.run_limits
+                )
+                self.emit(on_event, 'phase', name='run', state='end', returncode=result.returncode)
+                
+                return self.build_result(result, start_time, compile_time=compile_time, sandbox=sandbox,
+                                         cached_build=cache_hit, profile=self.profile)
             
-            # Cleanup
-            try:
-                os.unlink(temp_file)
-                os.unlink(exe_file)
-            except OSError:
-                pass
+        except subprocess.TimeoutExpired:
+            return {
+                'output': '',
+                'error': f'Code execution timed out after {self.timeout} seconds',
+                'execution_time': self.timeout
+            }
+        except Exception as e:
+            return {
+                'output': '',
+                'error': f'Execution error: {str(e)}',
+                'execution_time': time.time() - start_time
+            }
+    
+    def _compile(self, code: str) -> Tuple[Optional[str], Optional[str], bool]:
+        """Compile Rust source into a cached artifact directory containing 'main'"""
+        version = toolchain_registry.version_string('rustc')
+        dependencies = cargo_builder.snippet_dependencies(code) if toolchain_registry.is_available('cargo') else {}
+        if dependencies:
+            return self._compile_cargo(cargo_builder.snippet_files(code, dependencies),
+                                       f'cargo-snippet/{self.profile}/{current_owner() or "shared"}')
+        key = CompileCache.make_key('rust', code, version, *self.compile_flags)
+        
+        def rustc(source_dir: str, build_dir: str, extra_flags: List[str]) -> Tuple[bool, str]:
+            source_file = os.path.join(source_dir, 'main.rs')
+            with open(source_file, 'w') as f:
+                f.write(code)
             
+            compile_result = run_process(
+                ['rustc', *self.compile_flags, *extra_flags, 'main.rs', '-o', os.path.join(build_dir, 'main')],
+                cwd=source_dir,
+                timeout=20,
+                limits=COMPILE_LIMITS
+            )
+            os.unlink(source_file)
+            return compile_result.returncode == 0, compile_result.stderr
+        
+        def build(build_dir: str) -> Tuple[bool, str]:
+            owner = current_owner()
+            # Builds outside a user's job (batches) would all queue on one directory, so they skip it
+            if not self.incremental or owner is None:
+                return rustc(build_dir, build_dir, [])
+            # Incremental state is matched by source path, so the source is written to the same place every time
+            with rust_incremental.checkout(f'{version}/{self.profile}/{owner}') as work_dir:
+                return rustc(work_dir, build_dir, ['-C', f'incremental={os.path.join(work_dir, "incremental")}'])
+        
+        return compile_cache.get_or_build(key, build)
+    
+    def _compile_cargo(self, files: Dict[str, str], workspace_key: str) -> Tuple[Optional[str], Optional[str], bool]:
+        """Build a Cargo project offline into a cached artifact directory containing 'main'.
+        
+        The project is checked out into the workspace for workspace_key so
+        cargo sees unchanged files with their old mtimes and only rebuilds
+        the project's own crate; dependencies come from the shared target
+        directory. Cargo.lock is written as a private file rather than
+        linked, since cargo may rewrite it.
+        """
+        toolchain = [toolchain_registry.version_string(name) for name in ('rustc', 'cargo')]
+        file_hashes = json.dumps({path: hashlib.sha256(content.encode('utf-8')).hexdigest()
+                                  for path, content in sorted(files.items())})
+        key = CompileCache.make_key('cargo', file_hashes, *toolchain, self.profile, cargo_builder.fingerprint())
+        
+        def build(build_dir: str) -> Tuple[bool, str]:
+            sources = {path: content for path, content in files.items() if path != 'Cargo.lock'}
+            with workspace_cache.checkout(workspace_key, sources) as workspace:
+                if 'Cargo.lock' in files:
+                    lock_path = os.path.join(workspace.path, 'Cargo.lock')
+                    with open(lock_path + '.tmp', 'w') as f:
+                        f.write(files['Cargo.lock'])
+                    os.replace(lock_path + '.tmp', lock_path)
+                return cargo_builder.build(workspace.path, self.profile, os.path.join(build_dir, 'main'))
+        
+        return compile_cache.get_or_build(key, build)
+    
+    def execute_project(self, files: Dict[str, str], project_key: str, on_event: Optional[EventCallback] = None,
+                        input_data: Optional[str] = None) -> Dict[str, Any]:
+        """Build a Cargo project offline against the vendored crates and run its binary"""
+        start_time = time.time()
+        
+        if not (toolchain_registry.is_available('cargo') and cargo_builder.available()):
             return {
-                'output': result.stdout,
-                'error': result.stderr if result.returncode != 0 else None,
-                'execution_time': round(execution_time, 3)
+                'output': '',
+                'error': 'Cargo projects are not available (cargo and a vendored crate directory are required)',
+                'execution_time': 0
             }
+        
+        try:
+            files = normalize_files(files)
+            cargo_builder.check_project(files)
+        except (ProjectError, CargoError) as e:
+            return {'output': '', 'error': str(e), 'execution_time': 0}
+        
+        try:
+            self.emit(on_event, 'phase', name='compile', state='start')
+            compile_start = time.time()
+            artifact_dir, compile_error, cache_hit = self._compile_cargo(files, f'{project_key}/{self.profile}')
+            compile_time = time.time() - compile_start
+            self.emit(on_event, 'phase', name='compile', state='end', cached=cache_hit, success=compile_error is None)
+            
+            if compile_error is not None:
+                return {
+                    'output': '',
+                    'error': f'Compilation Error:\n{compile_error}',
+                    'execution_time': time.time() - start_time,
+                    'compile_time': round(compile_time, 3)
+                }
+            
+            # The run gets a private copy of the project's data files
+            self.emit(on_event, 'phase', name='run', state='start')
+            with sandbox_pool.session() as sandbox:
+                materialize({path: content for path, content in files.items()
+                             if not path.endswith('.rs') and os.path.basename(path) not in ('Cargo.toml', 'Cargo.lock')},
+                            sandbox.path)
+                result = run_process(
+                    [os.path.join(artifact_dir, 'main')],
+                    timeout=self.timeout,
+                    cwd=sandbox.path,
+                    input_data=input_data,
+                    on_output=self.output_forwarder(on_event),
+                    limits=self.run_limits
+                )
+                self.emit(on_event, 'phase', name='run', state='end', returncode=result.returncode)
+                
+                return self.build_result(result, start_time, compile_time=compile_time, sandbox=sandbox,
+                                         cached_build=cache_hit, profile=self.profile)
             
         except subprocess.TimeoutExpired:
             return {
@@ -590,21 +1523,23 @@ class RustHandler(LanguageHandler):
                 'execution_time': time.time() - start_time
             }
     
-    def validate(self, code: str) -> Tuple[bool, Optional[str]]:
-        """Validate Rust syntax"""
+    def prepare(self, code: str) -> PreparedProgram:
+        return self.prepare_compiled(lambda: self._compile(code), lambda artifact_dir: [os.path.join(artifact_dir, 'main')])
+    
+    def validate(self, code: str) -> Tuple[Optional[bool], Optional[str]]:
+        """Validate Rust by type-checking it without code generation"""
         try:
-            with tempfile.NamedTemporaryFile(mode='w', suffix='.rs', delete=False) as f:
-                f.write(code)
-                temp_file = f.name
-            
-            result = subprocess.run(
-                ['rustc', '--check-cfg', temp_file],
-                capture_output=True,
-                text=True,
-                timeout=10
-            )
-            
-            os.unlink(temp_file)
+            with sandbox_pool.session() as sandbox:
+                sandbox.write('main.rs', code)
+                
+                result = subprocess.run(
+                    ['rustc', *self.compile_flags, '--error-format=short', '--emit=metadata',
+                     '-o', os.path.join(sandbox.path, 'main.rmeta'), 'main.rs'],
+                    capture_output=True,
+                    text=True,
+                    cwd=sandbox.path,
+                    timeout=20
+                )
             
             if result.returncode == 0:
                 return True, None
@@ -612,13 +1547,13 @@ class RustHandler(LanguageHandler):
                 return False, result.stderr.strip()
                 
         except Exception as e:
-            return False, f"Validation error: {str(e)}"
+            return None, f"Validation error: {str(e)}"
     
     def get_language_info(self) -> Dict[str, str]:
         """Get Rust language information"""
         return {
             'name': 'Rust',
-            'version': 'Rustc',
+            'version': self.version_label('Rustc'),
             'file_extension': '.rs',
             'monaco_language': 'rust'
         }
@@ -626,7 +1561,7 @@ class RustHandler(LanguageHandler):
 class EncodingHandler(LanguageHandler):
     """Handler for encoding/decoding operations"""
     
-    def execute(self, code: str) -> Dict[str, Any]:
+    def execute(self, code: str, on_event: Optional[EventCallback] = None, input_data: Optional[str] = None) -> Dict[str, Any]:
         """Execute encoding/decoding operations"""
         start_time = time.time()
         
@@ -766,23 +1701,46 @@ class LanguageHandlerFactory:
     """Factory class for managing language handlers"""
     
     def __init__(self):
+        # Detect installed toolchains once; handlers read availability from the registry
+        toolchain_registry.start()
+        
+        # Aliases share one instance so they share its warm process pools
+        javascript = JavaScriptHandler()
+        encoding = EncodingHandler()
+        
+        # One handler per build profile; each knows its siblings for get_handler(language, profile)
+        cpp = self._profiled(CppHandler, CPP_PROFILES, CPP_DEFAULT_PROFILE)
+        
         self._handlers = {
             'python': PythonHandler(),
-            'javascript': JavaScriptHandler(),
-            'js': JavaScriptHandler(),  # Alias for JavaScript
+            'javascript': javascript,
+            'js': javascript,  # Alias for JavaScript
             'c': CHandler(),
+            'cpp': cpp,
+            'c++': cpp,  # Alias for C++
             'java': JavaHandler(),
             'go': GoHandler(),
-            'rust': RustHandler(),
-            'encoding': EncodingHandler(),
-            'encode': EncodingHandler(),  # Alias
+            'rust': self._profiled(RustHandler, RUST_PROFILES, RUST_DEFAULT_PROFILE),
+            'encoding': encoding,
+            'encode': encoding,  # Alias
         }
     
-    def get_handler(self, language: str) -> Optional[LanguageHandler]:
-        """Get handler for specified language"""
-        return self._handlers.get(language.lower())
+    @staticmethod
+    def _profiled(handler_class, profiles: Dict[str, List[str]], default: str) -> LanguageHandler:
+        """Create a handler per profile, link them as siblings and return the default one"""
+        handlers = {profile: handler_class(profile) for profile in profiles}
+        for handler in handlers.values():
+            handler.profiles = handlers
+        return handlers[default]
     
-    def get_available_languages(self) -> List[Dict[str, str]]:
+    def get_handler(self, language: str, profile: Optional[str] = None) -> Optional[LanguageHandler]:
+        """Get handler for specified language, in the given build profile if one is asked for"""
+        handler = self._handlers.get(language.lower())
+        if handler is None or profile is None or profile == handler.profile:
+            return handler
+        return handler.profiles.get(profile)
+    
+    def get_available_languages(self) -> List[Dict[str, Any]]:
         """Get list of available languages"""
         languages = []
         seen = set()
@@ -797,138 +1755,19 @@ class LanguageHandlerFactory:
                     'key': lang_key,
                     'name': lang_name,
                     'version': info['version'],
-                    'monaco_language': info['monaco_language']
+                    'monaco_language': info['monaco_language'],
+                    'available': handler.is_available(),
+                    'profiles': list(handler.profiles),
+                    'default_profile': handler.profile
                 })
                 seen.add(lang_name)
         
         return sorted(languages, key=lambda x: x['name'])
     
+    def get_supported_languages(self) -> List[str]:
+        """Get language keys, without aliases"""
+        return [language['key'] for language in self.get_available_languages()]
+    
     def register_handler(self, language: str, handler: LanguageHandler):
         """Register a new language handler"""
         self._handlers[language.lower()] = handler
-import subprocess
-import os
-import tempfile
-import logging
-
-class LanguageHandlerFactory:
-    def __init__(self):
-        self.handlers = {
-            'python': PythonHandler(),
-            'javascript': JavaScriptHandler(),
-            'java': JavaHandler(),
-            'c': CHandler(),
-            'cpp': CppHandler(),
-            'go': GoHandler(),
-            'rust': RustHandler(),
-        }
-    
-    def get_handler(self, language):
-        return self.handlers.get(language.lower())
-
-class BaseHandler:
-    def execute(self, code, input_data=""):
-        raise NotImplementedError
-
-class PythonHandler(BaseHandler):
-    def execute(self, code, input_data=""):
-        try:
-            with tempfile.NamedTemporaryFile(mode='w', suffix='.py', delete=False) as f:
-                f.write(code)
-                f.flush()
-                
-                result = subprocess.run(
-                    ['python3', f.name],
-                    input=input_data,
-                    capture_output=True,
-                    text=True,
-                    timeout=30
-                )
-                
-                os.unlink(f.name)
-                
-                return {
-                    'output': result.stdout,
-                    'error': result.stderr,
-                    'exit_code': result.returncode
-                }
-        except Exception as e:
-            return {
-                'output': '',
-                'error': str(e),
-                'exit_code': 1
-            }
-
-class JavaScriptHandler(BaseHandler):
-    def execute(self, code, input_data=""):
-        try:
-            with tempfile.NamedTemporaryFile(mode='w', suffix='.js', delete=False) as f:
-                f.write(code)
-                f.flush()
-                
-                result = subprocess.run(
-                    ['node', f.name],
-                    input=input_data,
-                    capture_output=True,
-                    text=True,
-                    timeout=30
-                )
-                
-                os.unlink(f.name)
-                
-                return {
-                    'output': result.stdout,
-                    'error': result.stderr,
-                    'exit_code': result.returncode
-                }
-        except Exception as e:
-            return {
-                'output': '',
-                'error': str(e),
-                'exit_code': 1
-            }
-
-class JavaHandler(BaseHandler):
-    def execute(self, code, input_data=""):
-        # Basic Java handler - would need more sophisticated compilation
-        return {
-            'output': '',
-            'error': 'Java execution not implemented yet',
-            'exit_code': 1
-        }
-
-class CHandler(BaseHandler):
-    def execute(self, code, input_data=""):
-        # Basic C handler - would need compilation
-        return {
-            'output': '',
-            'error': 'C execution not implemented yet',
-            'exit_code': 1
-        }
-
-class CppHandler(BaseHandler):
-    def execute(self, code, input_data=""):
-        # Basic C++ handler - would need compilation
-        return {
-            'output': '',
-            'error': 'C++ execution not implemented yet',
-            'exit_code': 1
-        }
-
-class GoHandler(BaseHandler):
-    def execute(self, code, input_data=""):
-        # Basic Go handler
-        return {
-            'output': '',
-            'error': 'Go execution not implemented yet',
-            'exit_code': 1
-        }
-
-class RustHandler(BaseHandler):
-    def execute(self, code, input_data=""):
-        # Basic Rust handler
-        return {
-            'output': '',
-            'error': 'Rust execution not implemented yet',
-            'exit_code': 1
-        }
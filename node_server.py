@@ -0,0 +1,257 @@
+import codecs
+import json
+import logging
+import os
+import queue
+import socket
+import subprocess
+import threading
+import time
+from typing import Dict, Any, Optional
+
+from process_runner import (
+    OUTPUT_LIMIT_BYTES, BoundedBuffer, CapturedOutput, OutputCallback, ProcessResult, ResourceLimits,
+    kill_process_group, spawn,
+)
+
+SERVER_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'workers', 'node_run_server.js')
+
+# Seconds to wait for a new server to report it is ready
+STARTUP_TIMEOUT = 10
+# Seconds allowed past the run timeout for the server to stop a worker thread
+TERMINATE_GRACE = 5
+
+
+class NodeServerError(Exception):
+    """Raised when a Node server cannot serve a run and should be discarded"""
+
+    def __init__(self, message: str, started: bool = False):
+        super().__init__(message)
+        # Whether user code may already have run (so it must not be retried)
+        self.started = started
+
+
+class NodeServer:
+    """A long-lived node process running workers/node_run_server.js"""
+
+    def __init__(self, limits: Optional[ResourceLimits] = None):
+        parent_sock, child_sock = socket.socketpair(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            self.process = spawn(
+                ['node', SERVER_SCRIPT, str(child_sock.fileno())],
+                limits,
+                pass_fds=(child_sock.fileno(),),
+                stdin=subprocess.DEVNULL,
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL,
+                # Each run enters its own sandbox; nothing runs in the server's own directory
+                cwd=os.sep,
+                start_new_session=True,
+            )
+        except Exception:
+            parent_sock.close()
+            raise
+        finally:
+            child_sock.close()
+
+        self.sock = parent_sock
+        self.runs = 0
+        self.rss_bytes = 0
+        self._buffer = b''
+
+        try:
+            ready = self._receive(time.monotonic() + STARTUP_TIMEOUT)
+        except NodeServerError:
+            self.close()
+            raise
+        if ready.get('event') != 'ready':
+            self.close()
+            raise NodeServerError(f'Unexpected greeting from Node server: {ready!r}')
+
+    def is_alive(self) -> bool:
+        return self.process.poll() is None
+
+    def close(self):
+        """Stop the server and any worker thread still running in it"""
+        try:
+            self.sock.close()
+        except OSError:
+            pass
+        kill_process_group(self.process.pid)
+        self.process.wait()
+
+    def _receive(self, deadline: float, started: bool = False) -> Dict[str, Any]:
+        """Read the next JSON message, raising socket.timeout at the deadline"""
+        while b'\n' not in self._buffer:
+            self.sock.settimeout(max(deadline - time.monotonic(), 0.001))
+            try:
+                data = self.sock.recv(64 * 1024)
+            except socket.timeout:
+                if started:
+                    raise
+                raise NodeServerError('Timed out waiting for the Node server')
+            except OSError as e:
+                raise NodeServerError(f'Lost contact with Node server: {e}', started=started)
+            if not data:
+                raise NodeServerError('Node server exited', started=started)
+            self._buffer += data
+        line, _, self._buffer = self._buffer.partition(b'\n')
+        try:
+            return json.loads(line)
+        except ValueError as e:
+            raise NodeServerError(f'Malformed message from Node server: {e}', started=started)
+
+    def run(self, script: str, timeout: float, cwd: str, input_data: Optional[str] = None,
+            on_output: Optional[OutputCallback] = None,
+            heap_limit_mb: Optional[int] = None) -> ProcessResult:
+        """Run a script in a fresh worker thread with cwd as the working directory, mirroring process_runner.run_process"""
+        self.runs += 1
+        start = time.monotonic()
+        request = {
+            'script': script,
+            'cwd': cwd,
+            'stdin': input_data or '',
+            'timeout_ms': int(timeout * 1000),
+            'output_limit': OUTPUT_LIMIT_BYTES,
+            'heap_limit_mb': heap_limit_mb,
+        }
+        try:
+            self.sock.sendall(json.dumps(request).encode() + b'\n')
+        except OSError as e:
+            raise NodeServerError(f'Failed to send run request: {e}')
+
+        buffers = {'stdout': BoundedBuffer(), 'stderr': BoundedBuffer()}
+        decoders = {name: codecs.getincrementaldecoder('utf-8')(errors='replace') for name in buffers}
+        deadline = start + timeout + TERMINATE_GRACE
+        timed_out = False
+        while True:
+            try:
+                message = self._receive(deadline, started=True)
+            except socket.timeout:
+                timed_out = True
+                exited = None
+                break
+            event = message.get('event')
+            if event in buffers:
+                kept = buffers[event].write(message['text'].encode('utf-8'))
+                text = decoders[event].decode(kept)
+                if text and on_output:
+                    on_output(event, text)
+            elif event == 'exit':
+                exited = message
+                timed_out = message['timed_out']
+                break
+            elif event == 'error':
+                # Sent before the worker starts, so the submission has not run
+                raise NodeServerError(message.get('message', 'Node server refused the run'))
+
+        captured = CapturedOutput(buffers['stdout'], buffers['stderr'], 'utf-8',
+                                  timed_out, bool(exited and exited['limit_exceeded']))
+        command = ['node', script]
+        if timed_out:
+            if exited is None:
+                # The worker thread could not be stopped; kill the server so the pool replaces it
+                self.close()
+            raise subprocess.TimeoutExpired(command, timeout, output=captured.stdout, stderr=captured.stderr)
+
+        self.rss_bytes = exited['rss_bytes']
+        return ProcessResult(command, exited['returncode'], captured, wall_time=exited['run_ms'] / 1000)
+
+
+class NodeServerPool:
+    """Pool of warm Node servers that run each submission in a fresh worker thread.
+
+    Each server runs one submission at a time, so the pool size bounds how
+    many warm runs happen concurrently; when every server is busy run()
+    returns None and the caller starts a cold node. Servers are recycled
+    after max_runs submissions or once their RSS passes max_rss_bytes.
+    """
+
+    def __init__(self, size: int, max_runs: int = 200, max_rss_bytes: int = 256 * 1024 * 1024,
+                 limits: Optional[ResourceLimits] = None):
+        self.size = size
+        self.max_runs = max_runs
+        self.max_rss_bytes = max_rss_bytes
+        self.limits = limits
+        self._idle = queue.SimpleQueue()
+        self._lock = threading.Lock()
+        self._count = 0
+
+    def _spawn(self) -> Optional[NodeServer]:
+        with self._lock:
+            if self._count >= self.size:
+                return None
+            self._count += 1
+        try:
+            return NodeServer(self.limits)
+        except Exception as e:
+            logging.error(f"Failed to start Node server: {e}")
+            with self._lock:
+                self._count -= 1
+            return None
+
+    def _discard(self, server: NodeServer):
+        server.close()
+        with self._lock:
+            self._count -= 1
+
+    def warm(self):
+        """Start servers in the background until the pool is full"""
+        def fill():
+            while True:
+                server = self._spawn()
+                if server is None:
+                    return
+                self._idle.put(server)
+
+        threading.Thread(target=fill, daemon=True).start()
+
+    def acquire(self) -> Optional[NodeServer]:
+        """Get an idle server, starting one if the pool has room"""
+        while True:
+            try:
+                server = self._idle.get_nowait()
+            except queue.Empty:
+                return self._spawn()
+            if server.is_alive():
+                return server
+            self._discard(server)
+
+    def release(self, server: NodeServer):
+        if server.runs >= self.max_runs or server.rss_bytes >= self.max_rss_bytes or not server.is_alive():
+            self._discard(server)
+            self.warm()
+        else:
+            self._idle.put(server)
+
+    def run(self, script: str, timeout: float, cwd: str, input_data: Optional[str] = None,
+            on_output: Optional[OutputCallback] = None,
+            heap_limit_mb: Optional[int] = None) -> Optional[ProcessResult]:
+        """Run a script on a warm server in cwd, or return None if none is available.
+
+        Raises subprocess.TimeoutExpired like process_runner.run_process.
+        """
+        server = self.acquire()
+        if server is None:
+            return None
+
+        try:
+            return server.run(script, timeout, cwd, input_data, on_output, heap_limit_mb)
+        except NodeServerError as e:
+            logging.warning(f"Discarding Node server: {e}")
+            self._discard(server)
+            server = None
+            if e.started:
+                raise RuntimeError(str(e))
+            return None
+        finally:
+            if server is not None:
+                self.release(server)
+
+    def shutdown(self):
+        while True:
+            try:
+                server = self._idle.get_nowait()
+            except queue.Empty:
+                return
+            self._discard(server)
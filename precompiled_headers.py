@@ -0,0 +1,103 @@
+import logging
+import os
+import tempfile
+import threading
+from typing import Dict, Any, List, Optional, Set, Tuple
+
+from compile_cache import CompileCache
+from process_runner import COMPILE_LIMITS, run_process
+
+# Standard headers precompiled for C++ runs; only the first #include of a program can use one
+CPP_PCH_HEADERS = [header.strip() for header in
+                   os.environ.get('CPP_PCH_HEADERS', 'bits/stdc++.h,iostream,vector').split(',') if header.strip()]
+# Precompiled headers are large (about 100MB for bits/stdc++.h), so they get their own cache
+CPP_PCH_DIR = os.environ.get('CPP_PCH_DIR', os.path.join(tempfile.gettempdir(), 'codecraft-pch'))
+CPP_PCH_MAX_BYTES = int(os.environ.get('CPP_PCH_MAX_BYTES', str(1024 * 1024 * 1024)))
+
+
+class PrecompiledHeaders:
+    """Precompiled standard headers, one set per compiler version and flags.
+
+    A set is a directory holding <header>.gch files (e.g. bits/stdc++.h.gch).
+    Compiling with -I on that directory makes the compiler pick up the
+    .gch when the program's first #include names one of the headers, and
+    fall through to the real header otherwise; a .gch built with different
+    flags is ignored the same way. Sets are built in the background the
+    first time they are asked for, so the compiles that trigger one run
+    without it rather than waiting.
+    """
+
+    def __init__(self, cache: CompileCache, headers: List[str]):
+        self.cache = cache
+        self.headers = headers
+        self._lock = threading.Lock()
+        self._building: Set[str] = set()
+        # Sets that failed to build in this process aren't retried
+        self._failed: Set[str] = set()
+        self.hits = 0
+        self.misses = 0
+
+    def include_dir(self, compiler: str, version: str, flags: List[str]) -> Optional[str]:
+        """Directory of PCHs to pass with -I, or None until they are built"""
+        if not self.headers:
+            return None
+        key = CompileCache.make_key('pch', compiler, version, *flags, *self.headers)
+        path = self.cache.lookup(key)
+        with self._lock:
+            if path:
+                self.hits += 1
+                return path
+            self.misses += 1
+            if key in self._building or key in self._failed:
+                return None
+            self._building.add(key)
+        threading.Thread(target=self._build, args=(key, compiler, flags), daemon=True, name='pch-build').start()
+        return None
+
+    def _build(self, key: str, compiler: str, flags: List[str]):
+        def build(build_dir: str) -> Tuple[bool, str]:
+            wrapper = os.path.join(build_dir, 'pch-wrapper.h')
+            built, errors = 0, []
+            for header in self.headers:
+                with open(wrapper, 'w') as f:
+                    f.write(f'#include <{header}>\n')
+                target = os.path.join(build_dir, header + '.gch')
+                os.makedirs(os.path.dirname(target), exist_ok=True)
+                result = run_process([compiler, *flags, '-x', 'c++-header', wrapper, '-o', target],
+                                     cwd=build_dir, timeout=120, limits=COMPILE_LIMITS)
+                if result.returncode == 0:
+                    built += 1
+                else:
+                    # Headers this toolchain lacks (bits/stdc++.h is libstdc++-only) are skipped
+                    errors.append(f'{header}: {result.stderr.strip()}')
+            os.unlink(wrapper)
+            return built > 0, '\n'.join(errors)
+
+        try:
+            path, error, _ = self.cache.get_or_build(key, build)
+            if path is None:
+                logging.warning(f"Could not precompile headers for {compiler} {' '.join(flags)}: {error}")
+                with self._lock:
+                    self._failed.add(key)
+        except Exception as e:
+            logging.error(f"Error precompiling headers: {e}")
+            with self._lock:
+                self._failed.add(key)
+        finally:
+            with self._lock:
+                self._building.discard(key)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = {
+                'headers': self.headers,
+                'hits': self.hits,
+                'misses': self.misses,
+                'building': len(self._building),
+                'failed': len(self._failed),
+            }
+        stats['cache'] = self.cache.stats()
+        return stats
+
+
+precompiled_headers = PrecompiledHeaders(CompileCache(CPP_PCH_DIR, CPP_PCH_MAX_BYTES), CPP_PCH_HEADERS)
@@ -0,0 +1,297 @@
+import codecs
+import locale
+import os
+import selectors
+import signal
+import subprocess
+import threading
+import time
+from typing import Callable, Dict, Any, List, Optional
+
+from resource_limits import ResourceLimits
+
+# Called with ('stdout' | 'stderr', text) as output arrives
+OutputCallback = Callable[[str, str], None]
+
+READ_CHUNK_SIZE = 64 * 1024
+
+# Bytes kept from the start and end of each stream; the middle is dropped
+OUTPUT_HEAD_BYTES = int(os.environ.get('OUTPUT_HEAD_BYTES', str(64 * 1024)))
+OUTPUT_TAIL_BYTES = int(os.environ.get('OUTPUT_TAIL_BYTES', str(64 * 1024)))
+# Total bytes a program may write before it is killed as an output flood
+OUTPUT_LIMIT_BYTES = int(os.environ.get('OUTPUT_LIMIT_BYTES', str(8 * 1024 * 1024)))
+
+
+# Limits for user programs
+RUN_LIMITS = ResourceLimits(
+    cpu_seconds=int(os.environ.get('RUN_CPU_SECONDS', '30')),
+    memory_bytes=int(os.environ.get('RUN_MEMORY_BYTES', str(512 * 1024 * 1024))),
+    # RLIMIT_NPROC counts every process and thread of the server's user, not just this run's
+    max_processes=int(os.environ.get('RUN_MAX_PROCESSES', '256')),
+    file_size_bytes=int(os.environ.get('RUN_FILE_SIZE_BYTES', str(16 * 1024 * 1024))),
+)
+
+# Compilers legitimately need more memory and time than most user programs
+COMPILE_LIMITS = ResourceLimits(
+    cpu_seconds=int(os.environ.get('COMPILE_CPU_SECONDS', '60')),
+    memory_bytes=int(os.environ.get('COMPILE_MEMORY_BYTES', str(2 * 1024 * 1024 * 1024))),
+    max_processes=int(os.environ.get('COMPILE_MAX_PROCESSES', '256')),
+    file_size_bytes=int(os.environ.get('COMPILE_FILE_SIZE_BYTES', str(256 * 1024 * 1024))),
+)
+
+
+def rusage_to_dict(rusage) -> Dict[str, Any]:
+    # ru_maxrss is left out: a child forked from the server carries the server's
+    # peak RSS across exec, so it would report the server's size, not the program's
+    return {
+        'user_time': rusage.ru_utime,
+        'system_time': rusage.ru_stime,
+    }
+
+
+class BoundedBuffer:
+    """Keeps the first head_bytes and a ring of the last tail_bytes written.
+
+    Memory stays bounded no matter how much is written; everything in
+    between is only counted.
+    """
+
+    def __init__(self, head_bytes: int = OUTPUT_HEAD_BYTES, tail_bytes: int = OUTPUT_TAIL_BYTES):
+        self.head_bytes = head_bytes
+        self.tail_bytes = tail_bytes
+        self.head = bytearray()
+        self.tail = bytearray()
+        self.total = 0
+
+    def write(self, data: bytes) -> bytes:
+        """Store data; returns the part that went into the head"""
+        self.total += len(data)
+        room = self.head_bytes - len(self.head)
+        kept = data[:room] if room > 0 else b''
+        self.head += kept
+
+        rest = data[len(kept):]
+        if rest and self.tail_bytes > 0:
+            self.tail += rest
+            overflow = len(self.tail) - self.tail_bytes
+            if overflow > 0:
+                del self.tail[:overflow]
+        return kept
+
+    @property
+    def truncated(self) -> bool:
+        return self.total > len(self.head) + len(self.tail)
+
+    def getvalue(self, encoding: str) -> str:
+        head = self.head.decode(encoding, errors='replace')
+        if not self.truncated:
+            return head + self.tail.decode(encoding, errors='replace')
+        omitted = self.total - len(self.head) - len(self.tail)
+        return f"{head}\n... [{omitted} bytes omitted] ...\n{self.tail.decode(encoding, errors='replace')}"
+
+
+class CapturedOutput:
+    """What pump_output collected from a child's stdout and stderr"""
+
+    def __init__(self, stdout: BoundedBuffer, stderr: BoundedBuffer, encoding: str,
+                 timed_out: bool, limit_exceeded: bool):
+        self.stdout = stdout.getvalue(encoding)
+        self.stderr = stderr.getvalue(encoding)
+        self.stdout_bytes = stdout.total
+        self.stderr_bytes = stderr.total
+        self.truncated = stdout.truncated or stderr.truncated
+        self.timed_out = timed_out
+        self.limit_exceeded = limit_exceeded
+
+
+class ProcessResult(subprocess.CompletedProcess):
+    """CompletedProcess with execution metadata"""
+
+    def __init__(self, args, returncode, captured: CapturedOutput, wall_time: float = 0.0,
+                 rusage: Optional[Dict[str, Any]] = None):
+        super().__init__(args, returncode, captured.stdout, captured.stderr)
+        self.wall_time = wall_time
+        # CPU time of the child and its waited-for descendants (see rusage_to_dict)
+        self.rusage = rusage
+        self.stdout_bytes = captured.stdout_bytes
+        self.stderr_bytes = captured.stderr_bytes
+        self.truncated = captured.truncated
+        # The program was killed for writing more than OUTPUT_LIMIT_BYTES
+        self.output_limit_exceeded = captured.limit_exceeded
+
+
+def kill_process_group(pid: int):
+    """Kill a child started in its own session together with anything it spawned"""
+    try:
+        os.killpg(pid, signal.SIGKILL)
+    except (ProcessLookupError, PermissionError):
+        pass
+
+
+def write_input(fd: int, input_data: Optional[str]):
+    """Feed stdin from a background thread so a full pipe can't deadlock us"""
+    def writer():
+        with os.fdopen(fd, 'wb') as stream:
+            if input_data:
+                try:
+                    stream.write(input_data.encode(locale.getpreferredencoding(False)))
+                except BrokenPipeError:
+                    pass
+
+    thread = threading.Thread(target=writer, daemon=True)
+    thread.start()
+    return thread
+
+
+def pump_output(stdout_fd: int, stderr_fd: int, deadline: Optional[float],
+                on_output: Optional[OutputCallback] = None,
+                limit_bytes: int = OUTPUT_LIMIT_BYTES) -> CapturedOutput:
+    """Read both pipes until EOF, the deadline, or the output limit.
+
+    Output is kept in bounded head/tail buffers so a flood can't exhaust
+    memory. The head is decoded incrementally and passed to on_output as
+    soon as the child writes it. The caller must kill the child when the
+    result reports timed_out or limit_exceeded.
+    """
+    encoding = locale.getpreferredencoding(False)
+    names = {stdout_fd: 'stdout', stderr_fd: 'stderr'}
+    buffers = {name: BoundedBuffer() for name in names.values()}
+    decoders = {
+        name: codecs.getincrementaldecoder(encoding)(errors='replace')
+        for name in buffers
+    }
+
+    selector = selectors.DefaultSelector()
+    for fd in names:
+        os.set_blocking(fd, False)
+        selector.register(fd, selectors.EVENT_READ)
+
+    timed_out = False
+    limit_exceeded = False
+    try:
+        while selector.get_map() and not limit_exceeded:
+            timeout = None
+            if deadline is not None:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    timed_out = True
+                    break
+
+            for key, _ in selector.select(timeout):
+                try:
+                    data = os.read(key.fd, READ_CHUNK_SIZE)
+                except BlockingIOError:
+                    continue
+                name = names[key.fd]
+                if not data:
+                    selector.unregister(key.fd)
+                    text = decoders[name].decode(b'', final=True)
+                else:
+                    text = decoders[name].decode(buffers[name].write(data))
+                if text and on_output:
+                    on_output(name, text)
+
+                if buffers['stdout'].total + buffers['stderr'].total > limit_bytes:
+                    limit_exceeded = True
+                    break
+    finally:
+        selector.close()
+
+    return CapturedOutput(buffers['stdout'], buffers['stderr'], encoding, timed_out, limit_exceeded)
+
+
+def wait_with_rusage(pid: int, deadline: Optional[float]):
+    """Reap a child with wait4, returning (returncode, rusage) or None at the deadline"""
+    delay = 0.001
+    while True:
+        waited_pid, status, rusage = os.wait4(pid, os.WNOHANG)
+        if waited_pid == pid:
+            return os.waitstatus_to_exitcode(status), rusage_to_dict(rusage)
+        if deadline is not None and time.monotonic() >= deadline:
+            return None
+        time.sleep(delay)
+        delay = min(delay * 2, 0.05)
+
+
+def spawn(command: List[str], limits: Optional[ResourceLimits] = None, **popen_args) -> subprocess.Popen:
+    """subprocess.Popen with limits applied to the child.
+
+    No preexec_fn: running Python between fork and exec can deadlock a
+    multithreaded server. The command is exec'd through prlimit(1) instead,
+    or, where that isn't installed, the limits are set with prlimit(2)
+    right after the child starts.
+    """
+    wrapped = limits.wrap(command) if limits else None
+    process = subprocess.Popen(wrapped or command, **popen_args)
+    if limits and wrapped is None:
+        try:
+            limits.apply(process.pid)
+        except OSError:
+            process.kill()
+            process.wait()
+            raise
+    return process
+
+
+def run_process(command: List[str], cwd: Optional[str] = None, timeout: Optional[float] = None,
+                input_data: Optional[str] = None, env: Optional[Dict[str, str]] = None,
+                on_output: Optional[OutputCallback] = None,
+                limits: Optional[ResourceLimits] = None) -> ProcessResult:
+    """Run a command and capture its output, like subprocess.run(capture_output=True, text=True).
+
+    The child runs in its own session so a timeout kills everything it
+    spawned, with limits applied as spawn() describes. Raises
+    subprocess.TimeoutExpired (with partial output) when the timeout
+    elapses. Captured output is bounded; a program that writes more than
+    OUTPUT_LIMIT_BYTES is killed and reported via output_limit_exceeded.
+    The result carries wait4 rusage for the child.
+    """
+    start = time.monotonic()
+    deadline = start + timeout if timeout is not None else None
+
+    process = spawn(
+        command,
+        limits,
+        stdin=subprocess.PIPE,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        cwd=cwd,
+        env=env,
+        start_new_session=True,
+    )
+
+    writer = write_input(os.dup(process.stdin.fileno()), input_data)
+    process.stdin.close()
+
+    try:
+        captured = pump_output(process.stdout.fileno(), process.stderr.fileno(), deadline, on_output)
+    except BaseException:
+        kill_process_group(process.pid)
+        process.wait()
+        raise
+    finally:
+        process.stdout.close()
+        process.stderr.close()
+
+    waited = None
+    if captured.limit_exceeded:
+        kill_process_group(process.pid)
+    elif not captured.timed_out:
+        # The child may have closed its pipes but still be running
+        waited = wait_with_rusage(process.pid, deadline)
+        if waited is None:
+            captured.timed_out = True
+
+    if captured.timed_out:
+        kill_process_group(process.pid)
+        process.wait()
+        writer.join(timeout=1)
+        raise subprocess.TimeoutExpired(command, timeout, output=captured.stdout, stderr=captured.stderr)
+
+    if waited is None:
+        waited = wait_with_rusage(process.pid, None)
+    returncode, rusage = waited
+    # Reaped with wait4 above; keep Popen from waiting on the pid again
+    process.returncode = returncode
+    writer.join(timeout=1)
+    return ProcessResult(command, returncode, captured, wall_time=time.monotonic() - start, rusage=rusage)
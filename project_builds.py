@@ -0,0 +1,291 @@
+import hashlib
+import json
+import logging
+import os
+import re
+import tempfile
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, List, Optional, Tuple
+
+from compile_cache import evict_lru_dirs
+from process_runner import COMPILE_LIMITS, run_process
+
+# Object files and linked binaries of multi-file projects, one directory per project
+PROJECT_CACHE_DIR = os.environ.get('PROJECT_CACHE_DIR', os.path.join(tempfile.gettempdir(), 'codecraft-project-cache'))
+PROJECT_CACHE_MAX_BYTES = int(os.environ.get('PROJECT_CACHE_MAX_BYTES', str(1024 * 1024 * 1024)))
+# Translation units compiled at once (like make -j)
+PROJECT_BUILD_JOBS = int(os.environ.get('PROJECT_BUILD_JOBS', str(os.cpu_count() or 1)))
+# Files and total bytes one project may contain
+PROJECT_MAX_FILES = int(os.environ.get('PROJECT_MAX_FILES', '500'))
+PROJECT_MAX_BYTES = int(os.environ.get('PROJECT_MAX_BYTES', str(16 * 1024 * 1024)))
+
+# Source extensions compiled as separate translation units, and the driver for each
+TRANSLATION_UNITS = {'.c': 'gcc', '.cc': 'g++', '.cpp': 'g++', '.cxx': 'g++'}
+
+# Headers are only read by the compiler; every other non-source file is data the program may open
+HEADER_EXTENSIONS = ('.h', '.hh', '.hpp', '.hxx')
+
+# Make-style dependency list: paths separated by unescaped whitespace
+_DEPFILE_PATH_RE = re.compile(r'(?:\\.|[^\s\\])+')
+
+
+class ProjectError(Exception):
+    """Raised when project files cannot be materialized (bad paths, too large)"""
+
+
+def content_hash(content: str) -> str:
+    return hashlib.sha256(content.encode('utf-8')).hexdigest()
+
+
+def normalize_path(path: str) -> str:
+    """Validate a project-relative path and return it in normalized form"""
+    normalized = os.path.normpath(path.replace('\\', '/')).lstrip('/')
+    if not path or os.path.isabs(path) or normalized == '..' or normalized.startswith('../') or normalized == '.':
+        raise ProjectError(f'Invalid project file path: {path!r}')
+    return normalized
+
+
+def normalize_files(files: Dict[str, str]) -> Dict[str, str]:
+    """Check a project's {path: content} map against the size limits"""
+    if len(files) > PROJECT_MAX_FILES:
+        raise ProjectError(f'A project may contain at most {PROJECT_MAX_FILES} files')
+    normalized = {normalize_path(path): content or '' for path, content in files.items()}
+    if sum(len(content.encode('utf-8')) for content in normalized.values()) > PROJECT_MAX_BYTES:
+        raise ProjectError(f'Project files exceed {PROJECT_MAX_BYTES} bytes')
+    return normalized
+
+
+def materialize(files: Dict[str, str], directory: str):
+    """Write project files under directory, creating subdirectories as needed"""
+    for path, content in files.items():
+        target = os.path.join(directory, path)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        with open(target, 'w') as f:
+            f.write(content)
+
+
+def runtime_files(files: Dict[str, str]) -> Dict[str, str]:
+    """Project files a built program may read at run time (everything but sources and headers)"""
+    return {path: content for path, content in files.items()
+            if not path.endswith(HEADER_EXTENSIONS) and os.path.splitext(path)[1] not in TRANSLATION_UNITS}
+
+
+def parse_depfile(text: str) -> List[str]:
+    """Prerequisites listed in a gcc -MMD depfile"""
+    _, _, prerequisites = text.replace('\\\n', ' ').partition(': ')
+    first_rule = prerequisites.split('\n\n', 1)[0].split('\n', 1)[0]
+    return [path.replace('\\ ', ' ') for path in _DEPFILE_PATH_RE.findall(first_rule)]
+
+
+class ProjectBuilder:
+    """Incremental builds of multi-file C/C++ projects.
+
+    Each translation unit is compiled to its own object file in the
+    project's cache directory. A manifest records, per unit, the content
+    hash of every project file it included (from gcc -MMD), so a rebuild
+    only recompiles units whose source or headers changed, compiling them
+    in parallel before one link. Projects are evicted least recently
+    built first once the cache grows past max_bytes. Each build hands
+    the caller a hard link of the binary in run_dir, made under the
+    project lock, so a concurrent relink or eviction can't change what
+    the caller runs; release() removes it.
+    """
+
+    def __init__(self, cache_dir: str, max_bytes: int, jobs: int):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.jobs = max(1, jobs)
+        self._lock = threading.Lock()
+        self._project_locks: Dict[str, threading.Lock] = {}
+        os.makedirs(cache_dir, exist_ok=True)
+        # Outside cache_dir so eviction never sees it, but on the same filesystem for hard links
+        self.run_dir = cache_dir.rstrip(os.sep) + '-runs'
+        os.makedirs(self.run_dir, exist_ok=True)
+        self._remove_stale_runs()
+        self.builds = 0
+        self.units_compiled = 0
+        self.units_reused = 0
+
+    def _remove_stale_runs(self):
+        """Remove binaries handed out by server processes that have exited"""
+        for name in os.listdir(self.run_dir):
+            try:
+                os.kill(int(name.split('-', 1)[0]), 0)
+                continue
+            except ProcessLookupError:
+                pass
+            except (ValueError, PermissionError):
+                continue
+            os.unlink(os.path.join(self.run_dir, name))
+
+    @staticmethod
+    def translation_units(files: Dict[str, str]) -> List[str]:
+        return sorted(path for path in files if os.path.splitext(path)[1] in TRANSLATION_UNITS)
+
+    def _project_lock(self, project_dir: str) -> threading.Lock:
+        with self._lock:
+            return self._project_locks.setdefault(project_dir, threading.Lock())
+
+    @staticmethod
+    def _load_manifest(project_dir: str) -> Dict[str, Any]:
+        try:
+            with open(os.path.join(project_dir, 'manifest.json')) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    @staticmethod
+    def _save_manifest(project_dir: str, manifest: Dict[str, Any]):
+        path = os.path.join(project_dir, 'manifest.json')
+        with open(path + '.tmp', 'w') as f:
+            json.dump(manifest, f)
+        os.replace(path + '.tmp', path)
+
+    @staticmethod
+    def _up_to_date(entry: Optional[Dict[str, Any]], file_hashes: Dict[str, str], object_path: str) -> bool:
+        if not entry or not os.path.exists(object_path):
+            return False
+        return all(file_hashes.get(path) == digest for path, digest in entry['deps'].items())
+
+    def _compile_unit(self, source_dir: str, unit: str, object_path: str, driver: str,
+                      flags: List[str]) -> Tuple[bool, str, List[str]]:
+        """Compile one unit; returns (success, diagnostics, project-relative dependencies)"""
+        os.makedirs(os.path.dirname(object_path), exist_ok=True)
+        temp_object = f'{object_path}.{threading.get_ident()}.tmp'
+        depfile = temp_object + '.d'
+        result = run_process(
+            [driver, *flags, '-I.', '-c', unit, '-o', temp_object, '-MMD', '-MF', depfile],
+            cwd=source_dir,
+            timeout=60,
+            limits=COMPILE_LIMITS
+        )
+        try:
+            if result.returncode != 0:
+                return False, result.stderr, []
+            with open(depfile) as f:
+                deps = parse_depfile(f.read())
+            os.replace(temp_object, object_path)
+            return True, result.stderr, deps
+        finally:
+            for leftover in (temp_object, depfile):
+                if os.path.exists(leftover):
+                    os.unlink(leftover)
+
+    def build(self, project_key: str, files: Dict[str, str], source_dir: str,
+              flags: Dict[str, List[str]], toolchain: str) -> Dict[str, Any]:
+        """Build the project checked out in source_dir into a cached binary.
+
+        flags maps each driver ('gcc', 'g++') to its compile flags; toolchain
+        identifies the compiler versions, and a change rebuilds everything.
+        Returns {binary, error, compiled, reused, linked}; binary is the
+        caller's own link to the build, to be passed to release() after the run.
+        """
+        units = self.translation_units(files)
+        if not units:
+            return {'binary': None, 'error': 'The project has no C or C++ source files', 'compiled': [], 'reused': 0,
+                    'linked': False}
+
+        project_dir = os.path.join(self.cache_dir, hashlib.sha256(project_key.encode('utf-8')).hexdigest()[:32])
+        with self._project_lock(project_dir):
+            os.makedirs(project_dir, exist_ok=True)
+            manifest = self._load_manifest(project_dir)
+            if manifest.get('toolchain') != toolchain or manifest.get('flags') != flags:
+                manifest = {'toolchain': toolchain, 'flags': flags, 'units': {}}
+            file_hashes = {path: content_hash(content) for path, content in files.items()}
+
+            stale = []
+            for unit in units:
+                object_path = os.path.join(project_dir, 'obj', unit + '.o')
+                if not self._up_to_date(manifest['units'].get(unit), file_hashes, object_path):
+                    stale.append(unit)
+
+            errors = []
+            if stale:
+                def compile_unit(unit: str):
+                    driver = TRANSLATION_UNITS[os.path.splitext(unit)[1]]
+                    object_path = os.path.join(project_dir, 'obj', unit + '.o')
+                    return unit, self._compile_unit(source_dir, unit, object_path, driver, flags.get(driver, []))
+
+                with ThreadPoolExecutor(max_workers=min(self.jobs, len(stale))) as pool:
+                    for unit, (success, output, deps) in pool.map(compile_unit, stale):
+                        if success:
+                            deps = {os.path.normpath(path) for path in deps}
+                            manifest['units'][unit] = {
+                                'deps': {path: file_hashes[path] for path in deps if path in file_hashes}
+                            }
+                        else:
+                            manifest['units'].pop(unit, None)
+                            errors.append(output)
+
+            # Forget units whose source was deleted from the project
+            for unit in set(manifest['units']) - set(units):
+                del manifest['units'][unit]
+                object_path = os.path.join(project_dir, 'obj', unit + '.o')
+                if os.path.exists(object_path):
+                    os.unlink(object_path)
+            self._save_manifest(project_dir, manifest)
+
+            with self._lock:
+                self.builds += 1
+                self.units_compiled += len(stale)
+                self.units_reused += len(units) - len(stale)
+
+            outcome = {'binary': None, 'error': None, 'compiled': stale, 'reused': len(units) - len(stale),
+                       'linked': False}
+            if errors:
+                outcome['error'] = '\n'.join(error.strip() for error in errors)
+                return outcome
+
+            binary = os.path.join(project_dir, 'main')
+            link_key = hashlib.sha256(json.dumps([units, manifest['units']], sort_keys=True).encode()).hexdigest()
+            if stale or manifest.get('link') != link_key or not os.path.exists(binary):
+                # C++ objects need the C++ driver to pull in libstdc++
+                linker = 'g++' if any(TRANSLATION_UNITS[os.path.splitext(unit)[1]] == 'g++' for unit in units) else 'gcc'
+                objects = [os.path.join(project_dir, 'obj', unit + '.o') for unit in units]
+                temp_binary = f'{binary}.{threading.get_ident()}.tmp'
+                result = run_process([linker, *objects, '-o', temp_binary, *flags.get('link', [])],
+                                     cwd=source_dir, timeout=60, limits=COMPILE_LIMITS)
+                if result.returncode != 0:
+                    if os.path.exists(temp_binary):
+                        os.unlink(temp_binary)
+                    outcome['error'] = result.stderr.strip()
+                    return outcome
+                # Replace atomically so runs of the previous binary are unaffected
+                os.replace(temp_binary, binary)
+                manifest['link'] = link_key
+                self._save_manifest(project_dir, manifest)
+                outcome['linked'] = True
+            outcome['binary'] = os.path.join(self.run_dir, f'{os.getpid()}-{uuid.uuid4().hex}')
+            os.link(binary, outcome['binary'])
+
+        os.utime(project_dir)
+        self._evict(keep=project_dir)
+        return outcome
+
+    @staticmethod
+    def release(build: Dict[str, Any]):
+        """Remove the binary link build() handed out"""
+        if build.get('binary'):
+            try:
+                os.unlink(build['binary'])
+            except FileNotFoundError:
+                pass
+
+    def _evict(self, keep: str):
+        """Drop least recently built projects while the cache is over its size limit"""
+        for path in evict_lru_dirs(self.cache_dir, keep, self.max_bytes, self._project_lock):
+            logging.info(f"Evicted project build cache {path}")
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'builds': self.builds,
+                'units_compiled': self.units_compiled,
+                'units_reused': self.units_reused,
+                'jobs': self.jobs,
+            }
+
+
+project_builder = ProjectBuilder(PROJECT_CACHE_DIR, PROJECT_CACHE_MAX_BYTES, PROJECT_BUILD_JOBS)
@@ -0,0 +1,239 @@
+import json
+import logging
+import os
+import queue
+import socket
+import subprocess
+import sys
+import threading
+import time
+from typing import Dict, Any, Optional
+
+from process_runner import OutputCallback, ProcessResult, ResourceLimits, kill_process_group, pump_output, write_input
+
+SERVER_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'python_zygote_server.py')
+MAX_MESSAGE_SIZE = 1 << 16
+
+
+def zygotes_supported() -> bool:
+    """Fork servers need fork() and fd passing over Unix sockets"""
+    return (
+        hasattr(os, 'fork')
+        and hasattr(socket, 'send_fds')
+        and hasattr(socket, 'SOCK_SEQPACKET')
+        and sys.platform.startswith('linux')
+    )
+
+
+class ZygoteError(Exception):
+    """Raised when a zygote cannot serve a run and should be discarded"""
+
+    def __init__(self, message: str, started: bool = False):
+        super().__init__(message)
+        # Whether user code may already have run (so it must not be retried)
+        self.started = started
+
+
+class PythonZygote:
+    """A pre-started interpreter that forks a fresh child for every run"""
+
+    def __init__(self, python: str = sys.executable):
+        self.python = python
+        parent_sock, child_sock = socket.socketpair(socket.AF_UNIX, socket.SOCK_SEQPACKET)
+        try:
+            self.process = subprocess.Popen(
+                [python, SERVER_SCRIPT, str(child_sock.fileno())],
+                pass_fds=(child_sock.fileno(),),
+                stdin=subprocess.DEVNULL,
+                stdout=subprocess.DEVNULL,
+            )
+        except Exception:
+            parent_sock.close()
+            raise
+        finally:
+            child_sock.close()
+
+        self.sock = parent_sock
+        self.runs = 0
+
+    def is_alive(self) -> bool:
+        return self.process.poll() is None
+
+    def close(self):
+        """Stop the zygote; closing the socket makes the server exit"""
+        try:
+            self.sock.close()
+        except OSError:
+            pass
+        try:
+            self.process.wait(timeout=2)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+            self.process.wait()
+
+    def _receive(self, timeout: Optional[float]) -> Dict[str, Any]:
+        self.sock.settimeout(timeout)
+        message = self.sock.recv(MAX_MESSAGE_SIZE)
+        if not message:
+            raise ZygoteError('Zygote closed the control socket')
+        return json.loads(message)
+
+    def run(self, script: str, cwd: str, timeout: float, input_data: Optional[str] = None,
+            on_output: Optional[OutputCallback] = None, limits: Optional[ResourceLimits] = None) -> ProcessResult:
+        """Run a script in a forked child, mirroring process_runner.run_process"""
+        self.runs += 1
+        start = time.monotonic()
+        stdin_r, stdin_w = os.pipe()
+        stdout_r, stdout_w = os.pipe()
+        stderr_r, stderr_w = os.pipe()
+        child_fds = [stdin_r, stdout_w, stderr_w]
+
+        try:
+            request = json.dumps({
+                'script': script,
+                'cwd': cwd,
+                'limits': limits.to_dict() if limits else None,
+            }).encode()
+            socket.send_fds(self.sock, [request], child_fds)
+        except OSError as e:
+            for fd in (stdin_w, stdout_r, stderr_r):
+                os.close(fd)
+            raise ZygoteError(f'Failed to send run request: {e}')
+        finally:
+            # The zygote holds its own duplicates now
+            for fd in child_fds:
+                os.close(fd)
+
+        writer = write_input(stdin_w, input_data)
+        try:
+            try:
+                started = self._receive(timeout=5)
+            except (OSError, ValueError) as e:
+                raise ZygoteError(f'Zygote did not start the run: {e}')
+            pid = started['pid']
+
+            captured = pump_output(stdout_r, stderr_r, start + timeout, on_output)
+            if captured.timed_out or captured.limit_exceeded:
+                kill_process_group(pid)
+
+            try:
+                wait = 5 if captured.timed_out or captured.limit_exceeded else max(start + timeout - time.monotonic(), 0.001)
+                exited = self._receive(timeout=wait)
+            except socket.timeout:
+                # Output closed but the child is still running
+                captured.timed_out = True
+                kill_process_group(pid)
+                try:
+                    exited = self._receive(timeout=5)
+                except (OSError, ValueError) as e:
+                    raise ZygoteError(f'Zygote did not reap a timed out run: {e}', started=True)
+            except (OSError, ValueError) as e:
+                raise ZygoteError(f'Lost contact with zygote: {e}', started=True)
+        finally:
+            os.close(stdout_r)
+            os.close(stderr_r)
+            writer.join(timeout=1)
+
+        command = [self.python, script]
+        if captured.timed_out:
+            raise subprocess.TimeoutExpired(command, timeout, output=captured.stdout, stderr=captured.stderr)
+
+        return ProcessResult(command, exited['returncode'], captured,
+                             wall_time=time.monotonic() - start, rusage=exited.get('rusage'))
+
+
+class PythonZygotePool:
+    """Pool of warm Python zygotes.
+
+    Each zygote serves one run at a time, so the pool size bounds how many
+    warm runs can happen concurrently; when every zygote is busy the caller
+    falls back to a cold interpreter. Zygotes are recycled after max_runs
+    forks so long-lived state (hash seed, memory) is refreshed periodically.
+    """
+
+    def __init__(self, size: int, max_runs: int = 100, python: str = sys.executable):
+        self.size = size
+        self.max_runs = max_runs
+        self.python = python
+        self._idle = queue.SimpleQueue()
+        self._lock = threading.Lock()
+        self._count = 0
+
+    def _spawn(self) -> Optional[PythonZygote]:
+        with self._lock:
+            if self._count >= self.size:
+                return None
+            self._count += 1
+        try:
+            return PythonZygote(self.python)
+        except Exception as e:
+            logging.error(f"Failed to start Python zygote: {e}")
+            with self._lock:
+                self._count -= 1
+            return None
+
+    def _discard(self, zygote: PythonZygote):
+        zygote.close()
+        with self._lock:
+            self._count -= 1
+
+    def warm(self):
+        """Start zygotes in the background until the pool is full"""
+        def fill():
+            while True:
+                zygote = self._spawn()
+                if zygote is None:
+                    return
+                self._idle.put(zygote)
+
+        threading.Thread(target=fill, daemon=True).start()
+
+    def acquire(self) -> Optional[PythonZygote]:
+        """Get an idle zygote, starting one if the pool has room"""
+        while True:
+            try:
+                zygote = self._idle.get_nowait()
+            except queue.Empty:
+                return self._spawn()
+            if zygote.is_alive():
+                return zygote
+            self._discard(zygote)
+
+    def release(self, zygote: PythonZygote):
+        if zygote.runs >= self.max_runs or not zygote.is_alive():
+            self._discard(zygote)
+            self.warm()
+        else:
+            self._idle.put(zygote)
+
+    def run(self, script: str, cwd: str, timeout: float, input_data: Optional[str] = None,
+            on_output: Optional[OutputCallback] = None,
+            limits: Optional[ResourceLimits] = None) -> Optional[ProcessResult]:
+        """Run a script on a warm zygote, or return None if none is available.
+
+        Raises subprocess.TimeoutExpired like process_runner.run_process.
+        """
+        zygote = self.acquire()
+        if zygote is None:
+            return None
+
+        try:
+            return zygote.run(script, cwd, timeout, input_data, on_output, limits)
+        except ZygoteError as e:
+            logging.warning(f"Discarding Python zygote: {e}")
+            self._discard(zygote)
+            zygote = None
+            if e.started:
+                raise RuntimeError(str(e))
+            return None
+        finally:
+            if zygote is not None:
+                self.release(zygote)
+
+    def shutdown(self):
+        while True:
+            try:
+                zygote = self._idle.get_nowait()
+            except queue.Empty:
+                return
+            self._discard(zygote)
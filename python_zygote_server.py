@@ -0,0 +1,134 @@
+"""Fork server ("zygote") for warm Python executions.
+
+This script is started by PythonZygotePool with the number of a control
+socket as its only argument. It waits for run requests on that socket and
+forks a fresh child for each one, so user code never runs inside the zygote
+itself and every run starts from the same pristine interpreter state.
+
+Only the standard library modules needed for the protocol are imported here,
+keeping the child's sys.modules as close to a cold interpreter as possible.
+"""
+import atexit
+import json
+import os
+import runpy
+import socket
+import sys
+import traceback
+
+MAX_MESSAGE_SIZE = 1 << 16
+
+
+def _run_child(request, fds, control_fd):
+    """Run the requested script in the forked child; never returns"""
+    # Own process group so the parent can kill the whole tree on timeout
+    os.setsid()
+
+    for target, fd in enumerate(fds):
+        os.dup2(fd, target)
+    for fd in fds:
+        if fd > 2:
+            os.close(fd)
+    os.close(control_fd)
+
+    limits = request.get('limits')
+    if limits:
+        _apply_limits(limits)
+
+    script = request['script']
+    os.chdir(request['cwd'])
+    sys.argv = [script]
+    sys.path[0] = os.path.dirname(script)
+
+    exit_code = 0
+    try:
+        runpy.run_path(script, run_name='__main__')
+    except SystemExit as e:
+        exit_code = _exit_status(e.code)
+    except BaseException as e:
+        # Hide the runpy/zygote frames so tracebacks look like a cold run
+        tb = e.__traceback__
+        while tb is not None and tb.tb_frame.f_code.co_filename != script:
+            tb = tb.tb_next
+        traceback.print_exception(type(e), e, tb or e.__traceback__)
+        exit_code = 1
+
+    _finalize(exit_code)
+
+
+def _apply_limits(limits):
+    """Apply process_runner.ResourceLimits (sent as its to_dict()) to this child"""
+    # Shared with process_runner; whatever the import pulls in is dropped again
+    # so the user's program sees the same sys.modules as before
+    before = set(sys.modules)
+    from resource_limits import ResourceLimits
+    ResourceLimits.from_dict(limits).apply()
+    for name in set(sys.modules) - before:
+        del sys.modules[name]
+
+
+def _exit_status(code):
+    """Translate a SystemExit code the same way the interpreter does"""
+    if code is None:
+        return 0
+    if isinstance(code, int):
+        return code
+    print(code, file=sys.stderr)
+    return 1
+
+
+def _finalize(exit_code):
+    """Do the parts of interpreter shutdown user code can observe, then exit.
+
+    Skipping full module teardown saves several milliseconds per run.
+    """
+    threading = sys.modules.get('threading')
+    if threading is not None:
+        threading._shutdown()
+    atexit._run_exitfuncs()
+    for stream in (sys.stdout, sys.stderr):
+        try:
+            stream.flush()
+        except Exception:
+            pass
+    os._exit(exit_code & 0xFF)
+
+
+def _rusage_to_dict(rusage):
+    return {
+        'user_time': rusage.ru_utime,
+        'system_time': rusage.ru_stime,
+    }
+
+
+def serve(control_fd):
+    """Serve run requests until the parent closes the control socket"""
+    sock = socket.socket(fileno=control_fd)
+
+    while True:
+        try:
+            message, fds, _, _ = socket.recv_fds(sock, MAX_MESSAGE_SIZE, 3)
+        except OSError:
+            return
+        if not message:
+            return
+
+        request = json.loads(message)
+        pid = os.fork()
+        if pid == 0:
+            _run_child(request, fds, control_fd)
+
+        for fd in fds:
+            os.close(fd)
+        sock.send(json.dumps({'event': 'started', 'pid': pid}).encode())
+
+        _, status, rusage = os.wait4(pid, 0)
+        sock.send(json.dumps({
+            'event': 'exited',
+            'returncode': os.waitstatus_to_exitcode(status),
+            'rusage': _rusage_to_dict(rusage),
+        }).encode())
+
+
+if __name__ == '__main__':
+    serve(int(sys.argv[1]))
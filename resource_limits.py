@@ -0,0 +1,83 @@
+"""Kernel resource limits (setrlimit) for child processes.
+
+Standard library only: python_zygote_server imports this in its forked
+children, which must stay as close to a cold interpreter as possible.
+"""
+import resource
+import shutil
+from typing import Dict, List, Optional, Tuple
+
+# util-linux prlimit(1), used to set limits between fork and exec without running Python there
+PRLIMIT = shutil.which('prlimit')
+
+# (ResourceLimits field, resource kind, prlimit option)
+_LIMITS = (
+    ('cpu_seconds', resource.RLIMIT_CPU, '--cpu'),
+    ('memory_bytes', resource.RLIMIT_AS, '--as'),
+    ('max_processes', resource.RLIMIT_NPROC, '--nproc'),
+    ('file_size_bytes', resource.RLIMIT_FSIZE, '--fsize'),
+)
+
+
+class ResourceLimits:
+    """Kernel resource limits applied to a child before it runs.
+
+    None leaves a limit unchanged. Limits are clamped to the current hard
+    limit so an unprivileged server can't fail to start a child over them.
+    max_processes is RLIMIT_NPROC, which the kernel checks against every
+    process and thread of the user, so with all runs under the server's
+    user it caps the server and every concurrent run together: a fork bomb
+    guard, not a per-run quota. It is not enforced for root.
+    """
+
+    def __init__(self, cpu_seconds: Optional[int] = None, memory_bytes: Optional[int] = None,
+                 max_processes: Optional[int] = None, file_size_bytes: Optional[int] = None):
+        self.cpu_seconds = cpu_seconds
+        self.memory_bytes = memory_bytes
+        self.max_processes = max_processes
+        self.file_size_bytes = file_size_bytes
+
+    def replace(self, **changes) -> 'ResourceLimits':
+        values = self.to_dict()
+        values.update(changes)
+        return ResourceLimits(**values)
+
+    def to_dict(self) -> Dict[str, Optional[int]]:
+        """The limits as plain data, e.g. to send to the Python zygote"""
+        return {
+            'cpu_seconds': self.cpu_seconds,
+            'memory_bytes': self.memory_bytes,
+            'max_processes': self.max_processes,
+            'file_size_bytes': self.file_size_bytes,
+        }
+
+    @classmethod
+    def from_dict(cls, values: Dict[str, Optional[int]]) -> 'ResourceLimits':
+        return cls(**values)
+
+    def rlimits(self) -> List[Tuple[int, str, int, int]]:
+        """(resource kind, prlimit option, soft, hard) for each limit that is set"""
+        limits = []
+        for field, kind, option in _LIMITS:
+            soft = getattr(self, field)
+            if soft is None:
+                continue
+            # CPU time: SIGXCPU at the soft limit, SIGKILL a second later
+            hard = soft + 1 if kind == resource.RLIMIT_CPU else soft
+            _, current_hard = resource.getrlimit(kind)
+            if current_hard != resource.RLIM_INFINITY:
+                soft = min(soft, current_hard)
+                hard = min(hard, current_hard)
+            limits.append((kind, option, soft, hard))
+        return limits
+
+    def apply(self, pid: int = 0):
+        """Apply the limits to process pid (0: the current process)"""
+        for kind, _, soft, hard in self.rlimits():
+            resource.prlimit(pid, kind, (soft, hard))
+
+    def wrap(self, command: List[str]) -> Optional[List[str]]:
+        """command run through prlimit(1) so the limits are in place before it execs, or None without prlimit"""
+        if PRLIMIT is None:
+            return None
+        return [PRLIMIT, *(f'{option}={soft}:{hard}' for _, option, soft, hard in self.rlimits()), '--', *command]
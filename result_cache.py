@@ -0,0 +1,97 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Any, Optional, Sequence
+
+from compile_cache import CompileCache
+
+# Results kept in memory for clients that opt in with "cache": true (0 disables)
+RESULT_CACHE_MAX_ENTRIES = int(os.environ.get('RESULT_CACHE_MAX_ENTRIES', '1000'))
+RESULT_CACHE_MAX_BYTES = int(os.environ.get('RESULT_CACHE_MAX_BYTES', str(64 * 1024 * 1024)))
+# Seconds a cached result stays valid
+RESULT_CACHE_TTL = int(os.environ.get('RESULT_CACHE_TTL', '3600'))
+
+
+class ResultCache:
+    """In-memory LRU cache of execution results for deterministic programs.
+
+    Keys cover the language, the versions of its toolchains, the source and
+    stdin, so an upgraded compiler never serves stale results. Entries
+    expire after ttl seconds; the cache is bounded by entry count and by
+    the approximate size of the stored results.
+    """
+
+    def __init__(self, max_entries: int, max_bytes: int, ttl: int):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        # key -> (expires_at, size, result)
+        self._entries: 'OrderedDict[str, tuple]' = OrderedDict()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0
+
+    @staticmethod
+    def make_key(language: str, toolchain_versions: Sequence[str], code: str, stdin: Optional[str]) -> str:
+        code_hash = hashlib.sha256(code.encode('utf-8')).hexdigest()
+        return CompileCache.make_key('result', language, *toolchain_versions, code_hash, stdin or '')
+
+    @staticmethod
+    def cacheable(result: Dict[str, Any]) -> bool:
+        """Only results of programs that ran to completion (or failed to compile) are reproducible"""
+        if 'run_time' in result:
+            return True
+        return str(result.get('error') or '').startswith('Compilation Error')
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    self._remove(key)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return dict(entry[2])
+
+    def put(self, key: str, result: Dict[str, Any]):
+        if not self.enabled or not self.cacheable(result):
+            return
+        size = len(json.dumps(result))
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (time.monotonic() + self.ttl, size, dict(result))
+            self._bytes += size
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+
+    def _remove(self, key: str):
+        _, size, _ = self._entries.pop(key)
+        self._bytes -= size
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'max_entries': self.max_entries,
+                'max_bytes': self.max_bytes,
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+            }
+
+
+result_cache = ResultCache(RESULT_CACHE_MAX_ENTRIES, RESULT_CACHE_MAX_BYTES, RESULT_CACHE_TTL)
@@ -0,0 +1,313 @@
+import atexit
+import logging
+import os
+import queue
+import shutil
+import stat
+import subprocess
+import tempfile
+import threading
+import uuid
+from contextlib import contextmanager
+from typing import Dict, Any, Iterator, Optional, Set
+
+from compile_cache import dir_size
+
+
+def _default_root() -> str:
+    """Prefer RAM-backed /dev/shm for tmpfs mount points so scratch I/O never touches disk"""
+    if os.path.isdir('/dev/shm') and os.access('/dev/shm', os.W_OK):
+        return '/dev/shm/codecraft-sandboxes'
+    return os.path.join(tempfile.gettempdir(), 'codecraft-sandboxes')
+
+
+# Where per-run scratch directories live when each is its own size-limited tmpfs
+SANDBOX_ROOT = os.environ.get('SANDBOX_ROOT', _default_root())
+# Where they live when tmpfs mounts are not permitted; must not be RAM-backed
+SANDBOX_DISK_ROOT = os.environ.get('SANDBOX_DISK_ROOT', os.path.join(tempfile.gettempdir(), 'codecraft-sandboxes'))
+# Scratch directories kept ready; more are created on demand under load
+SANDBOX_POOL_SIZE = int(os.environ.get('SANDBOX_POOL_SIZE', '8'))
+# Bytes one run may store in its scratch directory
+SANDBOX_QUOTA_BYTES = int(os.environ.get('SANDBOX_QUOTA_BYTES', str(64 * 1024 * 1024)))
+# Mount a size-limited tmpfs per sandbox when permitted: 'auto', 'always' or 'never'
+SANDBOX_MOUNT_TMPFS = os.environ.get('SANDBOX_MOUNT_TMPFS', 'auto')
+
+# Filesystems whose contents live in memory
+RAM_FILESYSTEMS = ('tmpfs', 'ramfs')
+
+
+class SandboxError(Exception):
+    """Raised when no sandbox can be provided without risking host memory"""
+
+
+def ram_backed(path: str) -> bool:
+    """Whether path is on a filesystem stored in memory, judged by its nearest mount point"""
+    path = os.path.realpath(path)
+    try:
+        with open('/proc/self/mounts') as f:
+            mounts = [line.split() for line in f]
+    except OSError:
+        return False
+    best, fstype = '', None
+    for fields in mounts:
+        mount_point = fields[1].replace('\\040', ' ')
+        if (path == mount_point or path.startswith(mount_point.rstrip('/') + '/')) and len(mount_point) >= len(best):
+            best, fstype = mount_point, fields[2]
+    return fstype in RAM_FILESYSTEMS
+
+
+def _force_remove(function, path, exc_info):
+    """rmtree error handler: programs may leave read-only files and directories behind"""
+    parent = os.path.dirname(path)
+    try:
+        os.chmod(parent, stat.S_IRWXU)
+        if os.path.isdir(path) and not os.path.islink(path):
+            os.chmod(path, stat.S_IRWXU)
+        function(path)
+    except FileNotFoundError:
+        pass
+
+
+class Sandbox:
+    """A scratch directory owned by one run at a time"""
+
+    def __init__(self, path: str, mounted: bool, quota_bytes: int):
+        self.path = path
+        self.mounted = mounted
+        self.quota_bytes = quota_bytes
+
+    def write(self, name: str, content: str) -> str:
+        """Write a source file into the sandbox and return its path"""
+        path = os.path.join(self.path, name)
+        with open(path, 'w') as f:
+            f.write(content)
+        return path
+
+    def usage(self) -> int:
+        """Bytes currently stored in the sandbox"""
+        if self.mounted:
+            stats = os.statvfs(self.path)
+            return (stats.f_blocks - stats.f_bfree) * stats.f_frsize
+        return dir_size(self.path)
+
+    def over_quota(self) -> bool:
+        return self.usage() > self.quota_bytes
+
+    def wipe(self):
+        """Remove everything the run left behind"""
+        os.chmod(self.path, stat.S_IRWXU)
+        for entry in os.scandir(self.path):
+            if entry.is_dir(follow_symlinks=False):
+                shutil.rmtree(entry.path, onerror=_force_remove)
+            else:
+                os.unlink(entry.path)
+
+
+class SandboxPool:
+    """Pool of per-run scratch directories.
+
+    Directories are created when the first run needs one, handed out one
+    per run, wiped on release and reused, so runs never share files and
+    nothing is leaked into the system temp directory. When the process may
+    mount, each sandbox is its own tmpfs under root sized to the quota, so
+    the kernel enforces it. Otherwise sandboxes are plain directories under
+    disk_root, where writes are capped per file by RLIMIT_FSIZE and the
+    total is checked after the run (see LanguageHandler.build_result); a
+    RAM-backed disk_root is refused, since runs could fill host memory
+    before that check. Sandboxes are unmounted and removed at exit.
+    """
+
+    def __init__(self, root: str, disk_root: str, size: int, quota_bytes: int, mount_tmpfs: str = 'auto'):
+        self.root = root
+        self.disk_root = disk_root
+        self.size = size
+        self.quota_bytes = quota_bytes
+        self.mount_tmpfs = mount_tmpfs
+        self.directory: Optional[str] = None
+        self._idle = queue.SimpleQueue()
+        self._lock = threading.Lock()
+        self._start_lock = threading.Lock()
+        self._started = False
+        self._error: Optional[str] = None
+        self._mount = False
+        self._paths: Set[str] = set()
+        self._in_use = 0
+        self.created = 0
+        self.quota_exceeded = 0
+
+    def _start(self):
+        """Pick where sandboxes live and fill the pool, once per process"""
+        with self._start_lock:
+            if self._started:
+                return
+            self._started = True
+            try:
+                self._mount = self.mount_tmpfs != 'never' and self._can_mount()
+                if not self._mount:
+                    if self.mount_tmpfs == 'always':
+                        raise SandboxError('Sandbox tmpfs mounts are required but not permitted')
+                    if ram_backed(self.disk_root):
+                        raise SandboxError(f'Sandbox directory {self.disk_root} is in memory and tmpfs '
+                                           f'mounts are not permitted, so the quota could not be enforced')
+                    logging.info("Sandboxes are plain directories; tmpfs mounts are not permitted")
+                    self._open(self.disk_root)
+            except (SandboxError, OSError) as e:
+                self._error = str(e)
+                logging.error(f"Sandboxes unavailable: {e}")
+                return
+            atexit.register(self.close)
+            for _ in range(self.size):
+                try:
+                    self._idle.put(self._create())
+                except (SandboxError, OSError) as e:
+                    logging.warning(f"Could not pre-create sandbox: {e}")
+                    break
+
+    def _open(self, root: str):
+        """Use root for this process's sandboxes"""
+        os.makedirs(root, mode=0o700, exist_ok=True)
+        self._remove_stale(root)
+        # Each server process owns a subdirectory so workers never wipe each other's sandboxes
+        self.directory = os.path.join(root, f'proc-{os.getpid()}')
+        os.makedirs(self.directory, mode=0o700, exist_ok=True)
+
+    def _remove_stale(self, root: str):
+        """Clean up sandboxes left behind by server processes that have exited"""
+        for name in os.listdir(root):
+            if not name.startswith('proc-'):
+                continue
+            try:
+                os.kill(int(name[len('proc-'):]), 0)
+                continue
+            except ProcessLookupError:
+                pass
+            except (ValueError, PermissionError):
+                continue
+            directory = os.path.join(root, name)
+            for sandbox in os.listdir(directory):
+                self._destroy(os.path.join(directory, sandbox))
+            shutil.rmtree(directory, ignore_errors=True)
+
+    def _can_mount(self) -> bool:
+        """Open root and probe whether a tmpfs can be mounted there"""
+        self._open(self.root)
+        probe = os.path.join(self.directory, f'sandbox-{uuid.uuid4().hex}')
+        os.mkdir(probe, 0o700)
+        try:
+            mounted = self._mount_tmpfs(probe)
+        finally:
+            self._destroy(probe)
+        if not mounted:
+            shutil.rmtree(self.directory, ignore_errors=True)
+            self.directory = None
+        return mounted
+
+    def _mount_tmpfs(self, path: str) -> bool:
+        try:
+            result = subprocess.run(
+                ['mount', '-t', 'tmpfs', '-o', f'size={self.quota_bytes},mode=0700,nosuid,nodev', 'tmpfs', path],
+                capture_output=True,
+                timeout=10
+            )
+        except (OSError, subprocess.TimeoutExpired):
+            return False
+        return result.returncode == 0
+
+    def _create(self) -> Sandbox:
+        path = os.path.join(self.directory, f'sandbox-{uuid.uuid4().hex}')
+        os.mkdir(path, 0o700)
+        # A failed mount would leave a plain directory on the RAM-backed root, so refuse instead
+        if self._mount and not self._mount_tmpfs(path):
+            self._destroy(path)
+            raise SandboxError('Could not mount a tmpfs for the sandbox')
+        with self._lock:
+            self.created += 1
+            self._paths.add(path)
+        return Sandbox(path, self._mount, self.quota_bytes)
+
+    def _destroy(self, path: str):
+        with self._lock:
+            self._paths.discard(path)
+        if os.path.ismount(path):
+            subprocess.run(['umount', '-l', path], capture_output=True, timeout=10)
+        shutil.rmtree(path, onerror=_force_remove)
+
+    def acquire(self) -> Sandbox:
+        """Take an empty sandbox, creating one if none is idle"""
+        if not self._started:
+            self._start()
+        if self._error:
+            raise SandboxError(self._error)
+        with self._lock:
+            self._in_use += 1
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            try:
+                return self._create()
+            except BaseException:
+                with self._lock:
+                    self._in_use -= 1
+                raise
+
+    def release(self, sandbox: Sandbox):
+        """Wipe a sandbox and keep it for reuse, or drop it if the pool is full"""
+        with self._lock:
+            self._in_use -= 1
+        try:
+            sandbox.wipe()
+        except OSError as e:
+            logging.warning(f"Discarding sandbox {sandbox.path} that could not be wiped: {e}")
+            self._destroy(sandbox.path)
+            return
+
+        if self._idle.qsize() < self.size:
+            self._idle.put(sandbox)
+        else:
+            self._destroy(sandbox.path)
+
+    @contextmanager
+    def session(self) -> Iterator[Sandbox]:
+        """A sandbox for the duration of one run"""
+        sandbox = self.acquire()
+        try:
+            yield sandbox
+        finally:
+            self.release(sandbox)
+
+    def check_quota(self, sandbox: Sandbox) -> Optional[str]:
+        """Return a notice if the run stored more than its quota"""
+        if not sandbox.over_quota():
+            return None
+        with self._lock:
+            self.quota_exceeded += 1
+        return f'Sandbox disk quota of {self.quota_bytes} bytes exceeded'
+
+    def close(self):
+        """Unmount and remove every sandbox this process created"""
+        with self._lock:
+            paths = list(self._paths)
+        for path in paths:
+            try:
+                self._destroy(path)
+            except (OSError, subprocess.TimeoutExpired) as e:
+                logging.warning(f"Could not remove sandbox {path}: {e}")
+        if self.directory:
+            shutil.rmtree(self.directory, ignore_errors=True)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'root': self.directory and os.path.dirname(self.directory),
+                'tmpfs_mounts': self._mount,
+                'error': self._error,
+                'idle': self._idle.qsize(),
+                'in_use': self._in_use,
+                'created': self.created,
+                'quota_bytes': self.quota_bytes,
+                'quota_exceeded': self.quota_exceeded,
+            }
+
+
+# Sandboxes are set up by the first run, not on import
+sandbox_pool = SandboxPool(SANDBOX_ROOT, SANDBOX_DISK_ROOT, SANDBOX_POOL_SIZE, SANDBOX_QUOTA_BYTES, SANDBOX_MOUNT_TMPFS)
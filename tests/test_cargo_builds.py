@@ -0,0 +1,40 @@
+import shutil
+import subprocess
+import threading
+
+import pytest
+
+from cargo_builds import CargoBuilder
+
+pytestmark = pytest.mark.skipif(shutil.which('cargo') is None, reason='cargo is not installed')
+
+
+def write_project(path, text):
+    (path / 'src').mkdir(parents=True)
+    (path / 'Cargo.toml').write_text('[package]\nname = "main"\nversion = "0.1.0"\nedition = "2021"\n')
+    (path / 'src' / 'main.rs').write_text(f'fn main() {{ println!("{text}"); }}\n')
+    return str(path)
+
+
+def test_concurrent_builds_of_same_named_packages_keep_their_own_binaries(tmp_path):
+    (tmp_path / 'vendor').mkdir()
+    builder = CargoBuilder(str(tmp_path / 'vendor'), str(tmp_path / 'target'), str(tmp_path / 'home'),
+                           max_bytes=1 << 30, slots=2)
+    # All sources are written before any build, so they are older than every build but the first
+    projects = [write_project(tmp_path / f'project-{index}', f'project {index}') for index in range(3)]
+    outcomes = {}
+
+    def build(index):
+        outcomes[index] = builder.build(projects[index], 'fast', str(tmp_path / f'bin-{index}'))
+
+    threads = [threading.Thread(target=build, args=(index,)) for index in range(3)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert all(success for success, _ in outcomes.values())
+    for index in range(3):
+        output = subprocess.run([str(tmp_path / f'bin-{index}')], capture_output=True, text=True).stdout
+        assert output == f'project {index}\n'
+    assert builder.stats()['building'] == 0
@@ -0,0 +1,68 @@
+import pytest
+
+from dependency_envs import DependencyError, npm_dependencies, python_requirements
+
+
+def test_comments_and_blank_lines_are_dropped():
+    text = '# pinned\nrequests==2.31.0\n\nnumpy>=1.26  # for arrays\n   \n'
+    assert python_requirements(text) == ['requests==2.31.0', 'numpy>=1.26']
+
+
+@pytest.mark.parametrize('line', [
+    'requests',
+    'requests[socks]>=2.0,<3',
+    'Django~=5.0',
+    'typing_extensions; python_version < "3.12"',
+    'zope.interface==6.0',
+])
+def test_named_requirements_are_kept(line):
+    assert python_requirements(line) == [line]
+
+
+def test_continued_lines_are_joined_like_pip():
+    assert python_requirements('requests\\\n==2.31.0\n') == ['requests==2.31.0']
+
+
+@pytest.mark.parametrize('text', [
+    '-r other.txt',
+    '--index-url https://example.com/simple',
+    '--extra-index-url=https://example.com/simple',
+    '-e .',
+    '-f /tmp/wheels',
+    'requests --hash=sha256:abc',
+    'requests \\\n--index-url https://example.com/simple',
+])
+def test_options_are_refused(text):
+    with pytest.raises(DependencyError, match='options are not supported'):
+        python_requirements(text)
+
+
+@pytest.mark.parametrize('line', [
+    'https://example.com/pkg-1.0-py3-none-any.whl',
+    'git+https://github.com/example/pkg',
+    'pkg @ https://example.com/pkg.whl',
+    'pkg@file:///tmp/pkg',
+    'pkg @/tmp/pkg',
+    'file:pkg',
+    './pkg',
+    '../pkg',
+    '.',
+    '/abs/pkg',
+    '~/pkg',
+    'subdir/pkg',
+    'wheels\\pkg-1.0-py3-none-any.whl',
+])
+def test_urls_and_paths_are_refused(line):
+    with pytest.raises(DependencyError, match='wheelhouse'):
+        python_requirements(line)
+
+
+def test_npm_dependencies_keep_only_install_fields():
+    package = '{"name": "app", "scripts": {"start": "node ."}, "dependencies": {"left-pad": "^1.3.0"}, "devDependencies": {}}'
+    assert npm_dependencies(package) == {'dependencies': {'left-pad': '^1.3.0'}}
+
+
+@pytest.mark.parametrize('package', ['{', '[]', '"app"'])
+def test_npm_dependencies_reject_malformed_package_json(package):
+    with pytest.raises(DependencyError):
+        npm_dependencies(package)
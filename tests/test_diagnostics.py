@@ -0,0 +1,64 @@
+from diagnostics import text_edit
+
+
+def apply_edit(text, edit):
+    """Apply an LSP incremental change to text (positions counted in UTF-16 code units)"""
+    def offset(position):
+        line_start = 0
+        for _ in range(position['line']):
+            line_start = text.index('\n', line_start) + 1
+        units = 0
+        index = line_start
+        while units < position['character']:
+            units += len(text[index].encode('utf-16-le')) // 2
+            index += 1
+        return index
+
+    start, end = offset(edit['range']['start']), offset(edit['range']['end'])
+    return text[:start] + edit['text'] + text[end:]
+
+
+def test_unchanged_text_is_an_empty_edit_at_the_end():
+    edit = text_edit('a\nb', 'a\nb')
+    assert edit == {'range': {'start': {'line': 1, 'character': 1}, 'end': {'line': 1, 'character': 1}}, 'text': ''}
+
+
+def test_insertion_replaces_an_empty_range():
+    edit = text_edit('int x;\nint z;\n', 'int x;\nint y;\nint z;\n')
+    assert edit['range']['start'] == edit['range']['end']
+    # The shortest change: common prefix and suffix are kept, wherever they fall
+    assert edit['text'] == 'y;\nint '
+    assert apply_edit('int x;\nint z;\n', edit) == 'int x;\nint y;\nint z;\n'
+
+
+def test_deletion_spans_the_removed_text():
+    edit = text_edit('one\ntwo\nthree', 'one\nthree')
+    assert edit['text'] == ''
+    assert apply_edit('one\ntwo\nthree', edit) == 'one\nthree'
+
+
+def test_repeated_characters_do_not_overlap_prefix_and_suffix():
+    edit = text_edit('aa', 'aaa')
+    assert edit == {'range': {'start': {'line': 0, 'character': 2}, 'end': {'line': 0, 'character': 2}}, 'text': 'a'}
+    assert apply_edit('aaa', text_edit('aaa', 'a')) == 'a'
+
+
+def test_columns_count_utf16_code_units():
+    old = 'x = "\U0001F600"; y\n'
+    new = 'x = "\U0001F600"; z\n'
+    edit = text_edit(old, new)
+    # The emoji is one character in Python (offset 9) but two UTF-16 code units
+    assert edit['range']['start'] == {'line': 0, 'character': 10}
+    assert edit['text'] == 'z'
+    assert apply_edit(old, edit) == new
+
+
+def test_round_trip_on_multiline_changes():
+    pairs = [
+        ('', 'print(1)\n'),
+        ('print(1)\n', ''),
+        ('a\nb\nc\n', 'a\nB\nc\nd\n'),
+        ('def f():\n    return 1\n', 'def f():\n    x = 2\n    return x\n'),
+    ]
+    for old, new in pairs:
+        assert apply_edit(old, text_edit(old, new)) == new
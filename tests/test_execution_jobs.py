@@ -0,0 +1,155 @@
+import threading
+import time
+from collections import Counter
+
+import pytest
+
+from execution_jobs import BatchRunner, FairScheduler, JobManager, QueueFullError
+
+USER_CLASSES = {
+    'authenticated': {'weight': 4, 'max_running': 2},
+    'guest': {'weight': 1, 'max_running': 1},
+}
+
+
+def dispatch(scheduler, count):
+    """Owners of the next count dispatches, finishing each job before taking the next"""
+    owners = []
+    for _ in range(count):
+        owner, _ = scheduler.get()
+        scheduler.done(owner)
+        owners.append(owner)
+    return owners
+
+
+def test_dispatches_follow_class_weights():
+    scheduler = FairScheduler(USER_CLASSES, max_queued_per_user=100)
+    for index in range(100):
+        scheduler.put('alice', 'authenticated', index)
+        scheduler.put('guest-1', 'guest', index)
+    counts = Counter(dispatch(scheduler, 50))
+    assert counts == {'alice': 40, 'guest-1': 10}
+
+
+def test_users_of_one_class_share_equally():
+    scheduler = FairScheduler(USER_CLASSES, max_queued_per_user=100)
+    for index in range(20):
+        scheduler.put('guest-1', 'guest', index)
+    scheduler.put('guest-2', 'guest', 0)
+    scheduler.put('guest-2', 'guest', 1)
+    # A user with a long queue doesn't hold back one who arrives with a short one
+    assert dispatch(scheduler, 4) == ['guest-1', 'guest-2', 'guest-1', 'guest-2']
+
+
+def test_jobs_of_one_user_run_in_order():
+    scheduler = FairScheduler(USER_CLASSES, max_queued_per_user=10)
+    for index in range(3):
+        scheduler.put('alice', 'authenticated', index)
+    items = []
+    for _ in range(3):
+        owner, item = scheduler.get()
+        scheduler.done(owner)
+        items.append(item)
+    assert items == [0, 1, 2]
+
+
+def test_idle_user_returns_without_banked_credit():
+    scheduler = FairScheduler(USER_CLASSES, max_queued_per_user=100)
+    for index in range(10):
+        scheduler.put('guest-1', 'guest', index)
+    dispatch(scheduler, 10)
+    for index in range(10):
+        scheduler.put('guest-1', 'guest', index)
+        scheduler.put('guest-2', 'guest', index)
+    assert Counter(dispatch(scheduler, 6)) == {'guest-1': 3, 'guest-2': 3}
+
+
+def test_user_at_running_cap_is_skipped():
+    scheduler = FairScheduler(USER_CLASSES, max_queued_per_user=10)
+    for index in range(3):
+        scheduler.put('guest-1', 'guest', index)
+    scheduler.put('alice', 'authenticated', 0)
+    first, _ = scheduler.get()
+    second, _ = scheduler.get()
+    # guest-1 holds its one running slot, so alice is dispatched even though guest-1 was first
+    assert {first, second} == {'guest-1', 'alice'}
+
+
+def test_get_waits_until_a_capped_user_finishes():
+    scheduler = FairScheduler(USER_CLASSES, max_queued_per_user=10)
+    scheduler.put('guest-1', 'guest', 0)
+    scheduler.put('guest-1', 'guest', 1)
+    scheduler.get()
+    dispatched = []
+    waiter = threading.Thread(target=lambda: dispatched.append(scheduler.get()), daemon=True)
+    waiter.start()
+    waiter.join(0.2)
+    assert dispatched == []
+    scheduler.done('guest-1')
+    waiter.join(5)
+    assert dispatched == [('guest-1', 1)]
+
+
+def test_authenticated_users_may_run_two_at_once():
+    scheduler = FairScheduler(USER_CLASSES, max_queued_per_user=10)
+    for index in range(3):
+        scheduler.put('alice', 'authenticated', index)
+    assert [scheduler.get() for _ in range(2)] == [('alice', 0), ('alice', 1)]
+    assert scheduler.stats()['authenticated']['running'] == 2
+    assert scheduler.stats()['authenticated']['queued'] == 1
+
+
+def test_per_user_queue_limit():
+    scheduler = FairScheduler(USER_CLASSES, max_queued_per_user=2)
+    scheduler.put('guest-1', 'guest', 0)
+    scheduler.put('guest-1', 'guest', 1)
+    with pytest.raises(QueueFullError):
+        scheduler.put('guest-1', 'guest', 2)
+    # The limit is per user
+    scheduler.put('guest-2', 'guest', 0)
+
+
+def test_unknown_class_uses_the_default():
+    scheduler = FairScheduler(USER_CLASSES, max_queued_per_user=10)
+    scheduler.put('someone', 'admin', 0)
+    assert scheduler.stats()['guest']['queued'] == 1
+
+
+def test_put_many_queues_all_or_nothing():
+    scheduler = FairScheduler(USER_CLASSES, max_queued_per_user=3)
+    scheduler.put('guest-1', 'guest', 0)
+    with pytest.raises(QueueFullError):
+        scheduler.put_many('guest-1', 'guest', [1, 2, 3])
+    scheduler.put_many('guest-1', 'guest', [1, 2])
+    assert scheduler.get() == ('guest-1', 0)
+    assert scheduler.stats()['guest']['queued'] == 2
+
+
+def test_batches_are_capped_per_owner():
+    runner = BatchRunner(JobManager(max_workers=1, max_queue=100, user_classes=USER_CLASSES,
+                                    max_queued_per_user=3, name='batch'))
+    release = threading.Event()
+    first = runner.run([release.wait] * 3, timeout=5, owner=('guest-1', 'guest'))
+    # At least two of the first batch are still waiting, since guests run one item at a time
+    with pytest.raises(QueueFullError, match='Too many of your executions'):
+        runner.run([lambda: {}] * 2, timeout=5, owner=('guest-1', 'guest'))
+    # Another user's batch is still accepted
+    second = runner.run([lambda: {}], timeout=5, owner=('guest-2', 'guest'))
+    release.set()
+    assert sorted(index for index, _ in first) == [0, 1, 2]
+    assert [item['status'] for _, item in second] == ['finished']
+    assert runner.stats()['rejected'] == 1
+
+
+def test_items_not_started_by_the_deadline_are_cancelled():
+    jobs = JobManager(max_workers=1, max_queue=10, user_classes=USER_CLASSES, name='batch')
+    runner = BatchRunner(jobs)
+    release = threading.Event()
+    ran = []
+    tasks = [lambda: release.wait() and {}, lambda: ran.append(1) or {}]
+    outcomes = dict(runner.run(tasks, timeout=0.5, owner=('guest-1', 'guest')))
+    assert [outcomes[index]['status'] for index in (0, 1)] == ['deadline_exceeded', 'deadline_exceeded']
+    release.set()
+    time.sleep(0.2)
+    assert ran == []
+    assert jobs.stats()['cancelled'] == 1
@@ -0,0 +1,71 @@
+import os
+import stat
+import sys
+
+import pytest
+
+from compile_cache import CompileCache
+from java_server import JavaWorkerPool
+from sandbox import SandboxPool
+
+# Stands in for `java ... JavaRunServer`: lists its working directory, then leaves a file there
+FAKE_SERVER = '''#!{python}
+import os, sys
+out, inp = sys.stdout.buffer, sys.stdin.buffer
+out.write((os.environ.get('FAKE_JAVA_GREETING', 'READY 1') + '\\n').encode())
+out.flush()
+while True:
+    header = inp.readline().split()
+    if not header:
+        break
+    source = inp.read(int(header[5])).decode()
+    inp.read(int(header[6]))
+    if source == 'exit':
+        sys.exit(0)
+    listing = ' '.join(sorted(os.listdir('.'))).encode()
+    with open('out.txt', 'w') as f:
+        f.write(source)
+    out.write(f'RESULT {{header[1].decode()}} OK 0 1 1 0 0 {{len(listing)}} 0\\n'.encode() + listing)
+    out.flush()
+'''
+
+
+@pytest.fixture
+def pool(tmp_path, monkeypatch):
+    bin_dir = tmp_path / 'bin'
+    bin_dir.mkdir()
+    java = bin_dir / 'java'
+    java.write_text(FAKE_SERVER.format(python=sys.executable))
+    java.chmod(java.stat().st_mode | stat.S_IXUSR)
+    monkeypatch.setenv('PATH', f'{bin_dir}{os.pathsep}{os.environ["PATH"]}')
+
+    sandboxes = SandboxPool(str(tmp_path / 'ram'), str(tmp_path / 'disk'), 1, 1024 * 1024, 'never')
+    pool = JavaWorkerPool(1, CompileCache(str(tmp_path / 'cache'), 1024 * 1024), sandboxes, heap_limit_mb=64)
+    # The fake server needs no compiled classes
+    pool._classpath = str(tmp_path)
+    yield pool
+    pool.shutdown()
+    sandboxes.close()
+
+
+def test_each_run_starts_in_an_empty_sandbox(pool, tmp_path):
+    for _ in range(2):
+        status, _, result, quota_notice = pool.run('first', 'Main', 5, 'javac 17')
+        assert (status, result.stdout, quota_notice) == ('OK', '', None)
+    worker = pool.acquire('javac 17')
+    assert worker.runs == 2
+    assert os.path.dirname(worker.sandbox.path).startswith(str(tmp_path / 'disk'))
+    pool.release(worker)
+
+
+def test_worker_lost_mid_run_is_an_error_not_a_rerun(pool):
+    with pytest.raises(RuntimeError, match='Java worker exited'):
+        pool.run('exit', 'Main', 5, 'javac 17')
+    assert pool.failures == 1
+    assert pool.run('again', 'Main', 5, 'javac 17')[0] == 'OK'
+
+
+def test_workers_are_not_used_without_an_exit_trap(pool, monkeypatch):
+    monkeypatch.setenv('FAKE_JAVA_GREETING', 'READY 0')
+    assert pool.run('first', 'Main', 5, 'javac 24') is None
+    assert pool.unsupported
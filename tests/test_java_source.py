@@ -0,0 +1,79 @@
+import pytest
+
+from java_source import DEFAULT_CLASS, parse_source
+
+
+def test_public_class_with_main():
+    source = parse_source('public class Hello {\n    public static void main(String[] args) {}\n}\n')
+    assert (source.package, source.file_class, source.main_class) == (None, 'Hello', 'Hello')
+    assert source.file_name == 'Hello.java'
+
+
+def test_file_is_named_after_main_class_without_a_public_type():
+    source = parse_source('class Solution { public static void main(String[] args) {} }')
+    assert (source.file_class, source.main_class) == ('Solution', 'Solution')
+
+
+def test_package_qualifies_the_launch_class():
+    source = parse_source('package com.example.app;\nimport java.util.*;\n'
+                          'public class App { public static void main(String[] args) {} }')
+    assert source.package == 'com.example.app'
+    assert source.qualified_main_class == 'com.example.app.App'
+    assert source.file_name == 'App.java'
+
+
+def test_main_in_a_non_public_type():
+    source = parse_source('public class Util { static int one() { return 1; } }\n'
+                          'class Runner { public static void main(String[] args) {} }')
+    assert (source.file_class, source.main_class) == ('Util', 'Runner')
+
+
+@pytest.mark.parametrize('code', [
+    '// public class Fake {}\nclass Real { public static void main(String[] a) {} }',
+    '/* public class Fake { void main( */\nclass Real { public static void main(String[] a) {} }',
+    'class Real { public static void main(String[] a) { String s = "public class Fake { void main("; } }',
+    'class Real { static String s = """\n public class Fake { void main(\n"""; public static void main(String[] a) {} }',
+    "class Real { char open = '{'; public static void main(String[] a) {} }",
+])
+def test_comments_and_literals_are_ignored(code):
+    source = parse_source(code)
+    assert (source.file_class, source.main_class) == ('Real', 'Real')
+
+
+def test_other_type_kinds_are_top_level_types():
+    source = parse_source('record Point(int x, int y) {}\ninterface Greeter { void greet(); }\nenum Color { RED }\n'
+                          'public class Shapes { public static void main(String... args) {} }')
+    assert (source.file_class, source.main_class) == ('Shapes', 'Shapes')
+
+
+def test_class_literals_are_not_declarations():
+    source = parse_source('class Runner { public static void main(String[] a) { System.out.println(Other.class); } }\n'
+                          'class Other {}')
+    assert source.main_class == 'Runner'
+
+
+def test_modifiers_and_annotations_before_the_type():
+    source = parse_source('@SuppressWarnings("unchecked") public final class Annotated {\n'
+                          '    public static void main(String[] args) {}\n}')
+    assert source.file_class == 'Annotated'
+
+
+def test_nested_main_is_not_launched():
+    # Nested types would need Outer$Inner launch names, so the top-level type is run
+    source = parse_source('public class Outer { static class Inner { public static void main(String[] a) {} } }')
+    assert (source.file_class, source.main_class) == ('Outer', 'Outer')
+
+
+def test_without_a_main_method_the_first_type_is_launched():
+    source = parse_source('class First {}\nclass Second {}')
+    assert (source.file_class, source.main_class) == ('First', 'First')
+
+
+def test_without_any_type_the_default_class_is_used():
+    source = parse_source('System.out.println("hello");')
+    assert (source.file_class, source.main_class) == (DEFAULT_CLASS, DEFAULT_CLASS)
+
+
+def test_unterminated_comment_does_not_hang():
+    source = parse_source('public class Broken { public static void main(String[] a) { /* never closed')
+    assert source.file_class == 'Broken'
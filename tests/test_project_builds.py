@@ -0,0 +1,74 @@
+import os
+import shutil
+import subprocess
+
+import pytest
+
+from project_builds import ProjectBuilder, ProjectError, materialize, normalize_path, parse_depfile
+
+
+def test_depfile_lists_prerequisites_of_the_first_rule():
+    text = 'obj/main.o: main.c util.h \\\n  inc/config.h\n\nutil.h:\n\ninc/config.h:\n'
+    assert parse_depfile(text) == ['main.c', 'util.h', 'inc/config.h']
+
+
+def test_depfile_unescapes_spaces_in_paths():
+    assert parse_depfile('main.o: my\\ dir/main.c my\\ dir/a\\ b.h\n') == ['my dir/main.c', 'my dir/a b.h']
+
+
+def test_depfile_without_prerequisites():
+    assert parse_depfile('main.o:\n') == []
+    assert parse_depfile('') == []
+
+
+def test_depfile_stops_at_the_first_rule():
+    assert parse_depfile('main.o: main.c\nother.o: other.c\n') == ['main.c']
+
+
+@pytest.mark.parametrize('path, expected', [
+    ('main.c', 'main.c'),
+    ('./src/main.c', 'src/main.c'),
+    ('src//lib/./util.h', 'src/lib/util.h'),
+    ('src/../main.c', 'main.c'),
+    ('src\\util.c', 'src/util.c'),
+    ('..data.txt', '..data.txt'),
+    ('src/..hidden/a.c', 'src/..hidden/a.c'),
+])
+def test_normalize_path_accepts_paths_inside_the_project(path, expected):
+    assert normalize_path(path) == expected
+
+
+@pytest.mark.parametrize('path', [
+    '',
+    '.',
+    '..',
+    '../main.c',
+    'src/../../main.c',
+    '..\\main.c',
+    '/etc/passwd',
+    'src/..',
+])
+def test_normalize_path_rejects_paths_outside_the_project(path):
+    with pytest.raises(ProjectError):
+        normalize_path(path)
+
+
+@pytest.mark.skipif(shutil.which('gcc') is None, reason='gcc is not installed')
+def test_build_hands_out_a_binary_a_later_relink_does_not_replace(tmp_path):
+    builder = ProjectBuilder(str(tmp_path / 'cache'), 1 << 30, 1)
+
+    def build(text):
+        files = {'main.c': '#include <stdio.h>\nint main(void) { puts("%s"); return 0; }\n' % text}
+        source_dir = tmp_path / text
+        source_dir.mkdir()
+        materialize(files, str(source_dir))
+        return builder.build('project', files, str(source_dir), {'gcc': []}, 'gcc')
+
+    first = build('first')
+    second = build('second')
+    assert second['linked']
+    assert subprocess.run([first['binary']], capture_output=True, text=True).stdout == 'first\n'
+    assert subprocess.run([second['binary']], capture_output=True, text=True).stdout == 'second\n'
+    builder.release(first)
+    builder.release(second)
+    assert os.listdir(builder.run_dir) == []
@@ -0,0 +1,40 @@
+import os
+
+from workspaces import WorkspaceCache
+
+
+def read(path):
+    with open(path) as f:
+        return f.read()
+
+
+def test_keys_get_separate_trees(tmp_path):
+    cache = WorkspaceCache(str(tmp_path), 1 << 30)
+    with cache.checkout('guest-a/files-["main.c"]', {'main.c': 'int a;'}) as first:
+        first_path = first.path
+    with cache.checkout('guest-b/files-["main.c"]', {'main.c': 'int b;'}) as second:
+        second_path = second.path
+    assert first_path != second_path
+    assert read(os.path.join(first_path, 'main.c')) == 'int a;'
+    assert read(os.path.join(second_path, 'main.c')) == 'int b;'
+
+
+def test_checkout_only_writes_changes(tmp_path):
+    cache = WorkspaceCache(str(tmp_path), 1 << 30)
+    files = {'main.c': 'int main(void) { return 0; }', 'src/util.h': '#define X 1'}
+    with cache.checkout('project', files) as workspace:
+        assert (workspace.written, workspace.unchanged, workspace.removed) == (2, 0, 0)
+    with cache.checkout('project', files) as workspace:
+        assert (workspace.written, workspace.unchanged, workspace.removed) == (0, 2, 0)
+    with cache.checkout('project', {'main.c': 'int main(void) { return 1; }'}) as workspace:
+        assert (workspace.written, workspace.unchanged, workspace.removed) == (1, 0, 1)
+        assert not os.path.exists(os.path.join(workspace.path, 'src/util.h'))
+
+
+def test_identical_content_is_stored_once(tmp_path):
+    cache = WorkspaceCache(str(tmp_path), 1 << 30)
+    with cache.checkout('one', {'a.txt': 'shared'}) as first:
+        first_file = os.path.join(first.path, 'a.txt')
+    with cache.checkout('two', {'b.txt': 'shared'}) as second:
+        second_file = os.path.join(second.path, 'b.txt')
+    assert os.stat(first_file).st_ino == os.stat(second_file).st_ino
@@ -0,0 +1,146 @@
+import logging
+import os
+import re
+import shutil
+import subprocess
+import sys
+import threading
+import time
+from typing import Dict, Any, List, Optional
+
+# Version probe for each toolchain the language handlers depend on
+TOOLCHAIN_PROBES: Dict[str, List[str]] = {
+    'python': [sys.executable, '--version'],
+    'node': ['node', '--version'],
+    'npm': ['npm', '--version'],
+    'gcc': ['gcc', '--version'],
+    'g++': ['g++', '--version'],
+    'javac': ['javac', '-version'],
+    'java': ['java', '-version'],
+    'go': ['go', 'version'],
+    'rustc': ['rustc', '--version'],
+    'cargo': ['cargo', '--version'],
+    # Language servers used for diagnostics (see diagnostics.LANGUAGE_SERVERS)
+    'pyright': ['pyright', '--version'],
+    'pylsp': ['pylsp', '--version'],
+    'clangd': ['clangd', '--version'],
+    'gopls': ['gopls', 'version'],
+    'rust-analyzer': ['rust-analyzer', '--version'],
+    'jdtls': ['jdtls', '--help'],
+}
+
+# How often installed toolchains are re-probed in the background
+TOOLCHAIN_REFRESH_INTERVAL = int(os.environ.get('TOOLCHAIN_REFRESH_INTERVAL', '300'))
+
+_VERSION_RE = re.compile(r'\d+(?:\.\d+)+')
+
+
+def probe_toolchain(name: str, command: List[str]) -> Dict[str, Any]:
+    """Locate a toolchain binary and read its version"""
+    info = {'name': name, 'available': False, 'path': None, 'version': None, 'version_string': ''}
+
+    path = shutil.which(command[0])
+    if not path:
+        return info
+
+    try:
+        result = subprocess.run([path] + command[1:], capture_output=True, text=True, timeout=15)
+    except (OSError, subprocess.TimeoutExpired) as e:
+        logging.warning(f"Probing {name} failed: {e}")
+        return info
+
+    if result.returncode != 0:
+        return info
+
+    # javac/java -version write to stderr on older JDKs
+    output = (result.stdout or result.stderr).strip()
+    version_string = output.splitlines()[0] if output else ''
+    match = _VERSION_RE.search(version_string)
+
+    info.update({
+        'available': True,
+        'path': path,
+        'version': match.group(0) if match else None,
+        'version_string': version_string,
+    })
+    return info
+
+
+class ToolchainRegistry:
+    """Detects installed compilers and runtimes once and serves them from memory.
+
+    Handlers consult the registry instead of spawning a version probe on
+    every request. A background thread re-probes periodically so toolchains
+    installed or upgraded while the server runs are picked up.
+    """
+
+    def __init__(self, probes: Dict[str, List[str]] = None, refresh_interval: int = TOOLCHAIN_REFRESH_INTERVAL):
+        self.probes = probes or TOOLCHAIN_PROBES
+        self.refresh_interval = refresh_interval
+        self._toolchains: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        self._started = False
+        self.last_refresh: Optional[float] = None
+
+    def refresh(self):
+        """Re-probe every toolchain"""
+        detected = {name: probe_toolchain(name, command) for name, command in self.probes.items()}
+
+        with self._lock:
+            for name, info in detected.items():
+                previous = self._toolchains.get(name)
+                if previous and previous['version_string'] != info['version_string']:
+                    logging.info(f"Toolchain {name} changed: {previous['version_string']!r} -> {info['version_string']!r}")
+            self._toolchains = detected
+            self.last_refresh = time.time()
+
+    def start(self):
+        """Detect toolchains now and keep refreshing in the background"""
+        with self._lock:
+            if self._started:
+                return
+            self._started = True
+
+        self.refresh()
+
+        if self.refresh_interval > 0:
+            def refresh_loop():
+                while True:
+                    time.sleep(self.refresh_interval)
+                    try:
+                        self.refresh()
+                    except Exception as e:
+                        logging.error(f"Toolchain refresh failed: {e}")
+
+            threading.Thread(target=refresh_loop, daemon=True, name='toolchain-refresh').start()
+
+    def get(self, name: str) -> Dict[str, Any]:
+        """Get detection info for a toolchain, probing it if not seen yet"""
+        with self._lock:
+            info = self._toolchains.get(name)
+        if info is None:
+            command = self.probes.get(name, [name, '--version'])
+            info = probe_toolchain(name, command)
+            with self._lock:
+                self._toolchains[name] = info
+        return info
+
+    def is_available(self, name: str) -> bool:
+        return self.get(name)['available']
+
+    def path(self, name: str) -> Optional[str]:
+        return self.get(name)['path']
+
+    def version(self, name: str) -> Optional[str]:
+        return self.get(name)['version']
+
+    def version_string(self, name: str) -> str:
+        """Full version line; used wherever a build depends on the exact toolchain"""
+        return self.get(name)['version_string']
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            return {name: dict(info) for name, info in self._toolchains.items()}
+
+
+toolchain_registry = ToolchainRegistry()
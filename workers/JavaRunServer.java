@@ -0,0 +1,427 @@
+import java.io.ByteArrayInputStream;
+import java.io.ByteArrayOutputStream;
+import java.io.DataInputStream;
+import java.io.FileDescriptor;
+import java.io.FileInputStream;
+import java.io.FileOutputStream;
+import java.io.IOException;
+import java.io.OutputStream;
+import java.io.PrintStream;
+import java.io.StringWriter;
+import java.lang.management.ManagementFactory;
+import java.lang.management.ThreadMXBean;
+import java.lang.reflect.InvocationTargetException;
+import java.lang.reflect.Method;
+import java.lang.reflect.Modifier;
+import java.net.URI;
+import java.nio.charset.StandardCharsets;
+import java.security.Permission;
+import java.util.ArrayList;
+import java.util.HashMap;
+import java.util.List;
+import java.util.Map;
+import javax.tools.FileObject;
+import javax.tools.ForwardingJavaFileManager;
+import javax.tools.JavaCompiler;
+import javax.tools.JavaFileManager;
+import javax.tools.JavaFileObject;
+import javax.tools.SimpleJavaFileObject;
+import javax.tools.StandardJavaFileManager;
+import javax.tools.ToolProvider;
+
+/**
+ * Long-lived compile-and-run server used by JavaHandler (see java_server.py).
+ *
+ * Requests arrive on stdin as a header line
+ *   RUN <token> <className> <timeoutMillis> <outputLimitBytes> <sourceLength> <stdinLength>
+ * followed by the UTF-8 source and the program's stdin. Each response is a line
+ *   RESULT <token> <status> <exitCode> <compileMillis> <runMillis> <userCpuMillis> <systemCpuMillis> <stdoutLength> <stderrLength>
+ * followed by the captured stdout and stderr. The token is the request's,
+ * so output a program manages to write to the real stdout can't pass for
+ * a response. Status is OK, COMPILE_ERROR, TIMEOUT or OUTPUT_LIMIT. Runs
+ * that time out, flood output or leave threads running after exit() can't
+ * be stopped safely inside the JVM, so the server exits after reporting
+ * them and the Python side starts a fresh one.
+ *
+ * Every submission is compiled in memory and loaded by its own class loader
+ * whose parent is the platform loader, so classes never leak between runs.
+ * Where the JDK still allows a security manager, System.exit and
+ * Runtime.halt from a submission end only that run; elsewhere they would
+ * end the server, so the greeting line READY 1 or READY 0 says whether
+ * they are trapped and the Python side only uses servers that trap them.
+ * The server runs in the sandbox it was started in, which the Python side
+ * wipes between runs.
+ */
+public class JavaRunServer {
+
+    /** Source file held in memory */
+    static final class SourceFile extends SimpleJavaFileObject {
+        private final String code;
+
+        SourceFile(String className, String code) {
+            super(URI.create("string:///" + className.replace('.', '/') + Kind.SOURCE.extension), Kind.SOURCE);
+            this.code = code;
+        }
+
+        @Override
+        public CharSequence getCharContent(boolean ignoreEncodingErrors) {
+            return code;
+        }
+    }
+
+    /** Class file written to memory by the compiler */
+    static final class ClassFile extends SimpleJavaFileObject {
+        private final ByteArrayOutputStream bytes = new ByteArrayOutputStream();
+
+        ClassFile(String className) {
+            super(URI.create("bytes:///" + className.replace('.', '/') + Kind.CLASS.extension), Kind.CLASS);
+        }
+
+        @Override
+        public OutputStream openOutputStream() {
+            return bytes;
+        }
+
+        byte[] getBytes() {
+            return bytes.toByteArray();
+        }
+    }
+
+    /** File manager that keeps compiler output in memory */
+    static final class MemoryFileManager extends ForwardingJavaFileManager<StandardJavaFileManager> {
+        final Map<String, ClassFile> classes = new HashMap<>();
+
+        MemoryFileManager(StandardJavaFileManager fileManager) {
+            super(fileManager);
+        }
+
+        @Override
+        public JavaFileObject getJavaFileForOutput(JavaFileManager.Location location, String className,
+                                                   JavaFileObject.Kind kind, FileObject sibling) {
+            ClassFile file = new ClassFile(className);
+            classes.put(className, file);
+            return file;
+        }
+    }
+
+    /** Loads one submission's classes; isolated from the server's own classes */
+    static final class MemoryClassLoader extends ClassLoader {
+        private final Map<String, ClassFile> classes;
+
+        MemoryClassLoader(Map<String, ClassFile> classes) {
+            super(ClassLoader.getPlatformClassLoader());
+            this.classes = classes;
+        }
+
+        @Override
+        protected Class<?> findClass(String name) throws ClassNotFoundException {
+            ClassFile file = classes.get(name);
+            if (file == null) {
+                throw new ClassNotFoundException(name);
+            }
+            byte[] bytes = file.getBytes();
+            return defineClass(name, bytes, 0, bytes.length);
+        }
+    }
+
+    /** Output stream that stops storing once the limit is reached */
+    static final class BoundedOutput extends OutputStream {
+        private final ByteArrayOutputStream buffer = new ByteArrayOutputStream();
+        private final BoundedCounter counter;
+
+        BoundedOutput(BoundedCounter counter) {
+            this.counter = counter;
+        }
+
+        @Override
+        public synchronized void write(int b) {
+            if (counter.add(1)) {
+                buffer.write(b);
+            }
+        }
+
+        @Override
+        public synchronized void write(byte[] b, int off, int len) {
+            if (counter.add(len)) {
+                buffer.write(b, off, len);
+            }
+        }
+
+        synchronized byte[] toByteArray() {
+            return buffer.toByteArray();
+        }
+    }
+
+    /** Output budget shared by stdout and stderr */
+    static final class BoundedCounter {
+        private final long limit;
+        private long total;
+        volatile boolean exceeded;
+
+        BoundedCounter(long limit) {
+            this.limit = limit;
+        }
+
+        synchronized boolean add(long bytes) {
+            total += bytes;
+            if (total > limit) {
+                exceeded = true;
+                return false;
+            }
+            return true;
+        }
+    }
+
+    /** Thrown in place of exiting when a submission calls System.exit or Runtime.halt */
+    static final class ExitRequest extends SecurityException {
+        final int status;
+
+        ExitRequest(int status) {
+            super("exit(" + status + ")");
+            this.status = status;
+        }
+    }
+
+    /** Security manager that only traps exits from the running submission; everything else is allowed */
+    @SuppressWarnings("removal")
+    static final class ExitTrap extends SecurityManager {
+        @Override
+        public void checkExit(int status) {
+            ThreadGroup group = submissionGroup;
+            ThreadGroup current = Thread.currentThread().getThreadGroup();
+            if (group != null && current != null && group.parentOf(current)) {
+                synchronized (ExitTrap.class) {
+                    if (requestedExit == null) {
+                        requestedExit = status;
+                    }
+                }
+                throw new ExitRequest(status);
+            }
+        }
+
+        @Override
+        public void checkPermission(Permission permission) {
+        }
+
+        @Override
+        public void checkPermission(Permission permission, Object context) {
+        }
+    }
+
+    // Thread group of the running submission, and the status of its first exit() call
+    private static volatile ThreadGroup submissionGroup;
+    private static volatile Integer requestedExit;
+
+    private static final PrintStream protocolOut = new PrintStream(new FileOutputStream(FileDescriptor.out), false);
+    private static final JavaCompiler compiler = ToolProvider.getSystemJavaCompiler();
+    private static final ThreadMXBean threads = ManagementFactory.getThreadMXBean();
+
+    public static void main(String[] args) throws Exception {
+        if (compiler == null) {
+            System.err.println("No system Java compiler available (a JDK is required)");
+            System.exit(2);
+        }
+
+        // Protocol streams are opened on the raw descriptors; user code only
+        // ever sees the replaced System.in/out/err
+        DataInputStream in = new DataInputStream(new FileInputStream(FileDescriptor.in));
+        boolean exitTrapped = installExitTrap();
+        System.setOut(new PrintStream(OutputStream.nullOutputStream()));
+        System.setErr(new PrintStream(OutputStream.nullOutputStream()));
+
+        protocolOut.print(exitTrapped ? "READY 1\n" : "READY 0\n");
+        protocolOut.flush();
+
+        String header;
+        while ((header = readLine(in)) != null) {
+            String[] parts = header.split(" ");
+            if (parts.length != 7 || !parts[0].equals("RUN")) {
+                System.exit(3);
+            }
+            String token = parts[1];
+            String className = parts[2];
+            long timeoutMillis = Long.parseLong(parts[3]);
+            long outputLimit = Long.parseLong(parts[4]);
+            byte[] source = new byte[Integer.parseInt(parts[5])];
+            byte[] stdin = new byte[Integer.parseInt(parts[6])];
+            in.readFully(source);
+            in.readFully(stdin);
+
+            boolean keepServing = handle(token, className, new String(source, StandardCharsets.UTF_8), stdin,
+                                         timeoutMillis, outputLimit);
+            if (!keepServing) {
+                Runtime.getRuntime().halt(0);
+            }
+        }
+    }
+
+    /** Trap submissions' exit() calls; JDK 18+ only allows this with -Djava.security.manager=allow, 24+ never */
+    @SuppressWarnings("removal")
+    private static boolean installExitTrap() {
+        try {
+            System.setSecurityManager(new ExitTrap());
+            return true;
+        } catch (UnsupportedOperationException | SecurityException e) {
+            // exit() would end the server, so the Python side won't use it
+            return false;
+        }
+    }
+
+    private static String readLine(DataInputStream in) throws IOException {
+        ByteArrayOutputStream line = new ByteArrayOutputStream();
+        int b;
+        while ((b = in.read()) != -1) {
+            if (b == '\n') {
+                return line.toString(StandardCharsets.UTF_8);
+            }
+            line.write(b);
+        }
+        return null;
+    }
+
+    private static boolean handle(String token, String className, String source, byte[] stdin, long timeoutMillis, long outputLimit) {
+        long compileStart = System.nanoTime();
+        StringWriter diagnostics = new StringWriter();
+        MemoryFileManager fileManager = new MemoryFileManager(compiler.getStandardFileManager(null, null, StandardCharsets.UTF_8));
+        List<JavaFileObject> units = new ArrayList<>();
+        units.add(new SourceFile(className, source));
+        boolean compiled = compiler.getTask(diagnostics, fileManager, null, null, null, units).call();
+        long compileMillis = (System.nanoTime() - compileStart) / 1_000_000;
+
+        if (!compiled) {
+            respond(token, "COMPILE_ERROR", 1, compileMillis, 0, new long[2], new byte[0],
+                    diagnostics.toString().getBytes(StandardCharsets.UTF_8));
+            return true;
+        }
+
+        BoundedCounter budget = new BoundedCounter(outputLimit);
+        BoundedOutput stdout = new BoundedOutput(budget);
+        BoundedOutput stderr = new BoundedOutput(budget);
+        PrintStream userOut = new PrintStream(stdout, true);
+        PrintStream userErr = new PrintStream(stderr, true);
+        int[] exitCode = {0};
+        // User and system CPU time of the program's main thread
+        long[] cpuMillis = {0, 0};
+
+        Method mainMethod;
+        try {
+            Class<?> mainClass = new MemoryClassLoader(fileManager.classes).loadClass(className);
+            mainMethod = mainClass.getMethod("main", String[].class);
+            if (!Modifier.isStatic(mainMethod.getModifiers())) {
+                throw new NoSuchMethodException("main is not static");
+            }
+        } catch (ReflectiveOperationException | LinkageError e) {
+            String message = "Error: Main method not found in class " + className
+                    + ", please define the main method as:\n   public static void main(String[] args)\n";
+            respond(token, "OK", 1, compileMillis, 0, new long[2], new byte[0], message.getBytes(StandardCharsets.UTF_8));
+            return true;
+        }
+
+        System.setIn(new ByteArrayInputStream(stdin));
+        System.setOut(userOut);
+        System.setErr(userErr);
+
+        ThreadGroup group = new ThreadGroup("submission");
+        requestedExit = null;
+        submissionGroup = group;
+        Thread mainThread = new Thread(group, () -> {
+            try {
+                mainMethod.invoke(null, (Object) new String[0]);
+            } catch (InvocationTargetException e) {
+                if (requestedExit != null) {
+                    return;
+                }
+                userErr.print("Exception in thread \"main\" ");
+                e.getCause().printStackTrace(userErr);
+                exitCode[0] = 1;
+            } catch (IllegalAccessException e) {
+                e.printStackTrace(userErr);
+                exitCode[0] = 1;
+            } finally {
+                sampleCpuTime(Thread.currentThread(), cpuMillis);
+            }
+        }, "main");
+
+        long runStart = System.nanoTime();
+        long deadline = runStart + timeoutMillis * 1_000_000;
+        mainThread.start();
+
+        // Like a fresh JVM, wait for every non-daemon thread the program started
+        boolean timedOut = false;
+        while (!budget.exceeded && requestedExit == null) {
+            if (!hasLiveUserThreads(group)) {
+                break;
+            }
+            if (System.nanoTime() >= deadline) {
+                timedOut = true;
+                break;
+            }
+            try {
+                Thread.sleep(2);
+            } catch (InterruptedException e) {
+                Thread.currentThread().interrupt();
+                break;
+            }
+        }
+        long runMillis = (System.nanoTime() - runStart) / 1_000_000;
+        if (timedOut || budget.exceeded) {
+            sampleCpuTime(mainThread, cpuMillis);
+        }
+
+        submissionGroup = null;
+        Integer exitStatus = requestedExit;
+        if (exitStatus != null) {
+            exitCode[0] = exitStatus;
+        }
+
+        userOut.flush();
+        userErr.flush();
+        System.setOut(new PrintStream(OutputStream.nullOutputStream()));
+        System.setErr(new PrintStream(OutputStream.nullOutputStream()));
+        System.setIn(new ByteArrayInputStream(new byte[0]));
+
+        if (timedOut) {
+            respond(token, "TIMEOUT", 1, compileMillis, runMillis, cpuMillis, stdout.toByteArray(), stderr.toByteArray());
+            return false;
+        }
+        if (budget.exceeded) {
+            respond(token, "OUTPUT_LIMIT", 1, compileMillis, runMillis, cpuMillis, stdout.toByteArray(), stderr.toByteArray());
+            return false;
+        }
+        respond(token, "OK", exitCode[0], compileMillis, runMillis, cpuMillis, stdout.toByteArray(), stderr.toByteArray());
+        // A real exit() would have stopped the program's other threads; this JVM can't, so it retires
+        return exitStatus == null || !hasLiveUserThreads(group);
+    }
+
+    private static void sampleCpuTime(Thread thread, long[] cpuMillis) {
+        if (!threads.isThreadCpuTimeSupported()) {
+            return;
+        }
+        long total = threads.getThreadCpuTime(thread.getId());
+        long user = threads.getThreadUserTime(thread.getId());
+        if (total >= 0 && user >= 0) {
+            cpuMillis[0] = user / 1_000_000;
+            cpuMillis[1] = (total - user) / 1_000_000;
+        }
+    }
+
+    private static boolean hasLiveUserThreads(ThreadGroup group) {
+        Thread[] live = new Thread[group.activeCount() + 8];
+        int count = group.enumerate(live, true);
+        for (int i = 0; i < count; i++) {
+            if (live[i].isAlive() && !live[i].isDaemon()) {
+                return true;
+            }
+        }
+        return false;
+    }
+
+    private static void respond(String token, String status, int exitCode, long compileMillis, long runMillis, long[] cpuMillis,
+                                byte[] stdout, byte[] stderr) {
+        protocolOut.print("RESULT " + token + " " + status + " " + exitCode + " " + compileMillis + " " + runMillis + " "
+                + cpuMillis[0] + " " + cpuMillis[1] + " " + stdout.length + " " + stderr.length + "\n");
+        protocolOut.write(stdout, 0, stdout.length);
+        protocolOut.write(stderr, 0, stderr.length);
+        protocolOut.flush();
+    }
+}
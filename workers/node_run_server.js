@@ -0,0 +1,152 @@
+'use strict';
+// Long-lived run server used by JavaScriptHandler (see node_server.py).
+//
+// Talks over the Unix socket whose fd is passed as the first argument; the
+// server's own stdio is left to /dev/null so submissions can't touch the
+// protocol. Requests are one JSON object per line:
+//   {"script": path, "cwd": dir, "stdin": text, "timeout_ms": n, "output_limit": bytes, "heap_limit_mb": n}
+// Each script runs as the main module of a fresh worker thread, so every
+// submission gets its own globals, module cache and V8 heap while Node itself
+// stays warm. The server runs one submission at a time and changes into its
+// cwd (the run's sandbox) for the duration, since worker threads can't chdir
+// themselves. Output is reported as it arrives, then one exit message:
+//   {"event": "stdout" | "stderr", "text": ...}
+//   {"event": "exit", "returncode", "run_ms", "timed_out", "limit_exceeded", "rss_bytes"}
+// A request that can't be started is answered with {"event": "error", "message"}.
+
+const net = require('net');
+const readline = require('readline');
+const { StringDecoder } = require('string_decoder');
+const { Worker } = require('worker_threads');
+
+// Runs inside the worker: serve stdin from the request, then start the script
+// as the main module exactly like `node script`
+const BOOTSTRAP = `
+const fs = require('fs');
+const { workerData } = require('worker_threads');
+const { Readable } = require('stream');
+const stdin = Buffer.from(workerData.stdin);
+const input = Readable.from(stdin.length ? [stdin] : []);
+Object.defineProperty(process, 'stdin', { configurable: true, enumerable: true, get: () => input });
+// fd 0 belongs to the server, so serve the common readFileSync(0) idiom from the request too
+const readFileSync = fs.readFileSync;
+fs.readFileSync = function (path, options) {
+    if (path === 0 || path === '/dev/stdin') {
+        const encoding = typeof options === 'string' ? options : options && options.encoding;
+        return encoding ? stdin.toString(encoding) : Buffer.from(stdin);
+    }
+    return readFileSync.apply(this, arguments);
+};
+process.argv[1] = workerData.script;
+require('module').runMain();
+`;
+
+const control = new net.Socket({ fd: Number(process.argv[2]), readable: true, writable: true });
+// Where the server waits between runs
+const HOME = process.cwd();
+
+function send(message) {
+    control.write(JSON.stringify(message) + '\n');
+}
+
+function formatError(error) {
+    if (error && error.stack) {
+        return `${error.stack}\n\nNode.js ${process.version}\n`;
+    }
+    return `Uncaught ${String(error)}\n\nNode.js ${process.version}\n`;
+}
+
+function run(request) {
+    return new Promise((resolve) => {
+        try {
+            process.chdir(request.cwd);
+        } catch (error) {
+            send({ event: 'error', message: `Cannot enter ${request.cwd}: ${error.message}` });
+            resolve();
+            return;
+        }
+        const start = process.hrtime.bigint();
+        let outputBytes = 0;
+        let returncode = 0;
+        let timedOut = false;
+        let limitExceeded = false;
+
+        const options = {
+            eval: true,
+            stdout: true,
+            stderr: true,
+            argv: [],
+            workerData: { script: request.script, stdin: request.stdin || '' },
+        };
+        if (request.heap_limit_mb) {
+            options.resourceLimits = { maxOldGenerationSizeMb: request.heap_limit_mb };
+        }
+        const worker = new Worker(BOOTSTRAP, options);
+
+        const forward = (stream, name) => {
+            const decoder = new StringDecoder('utf8');
+            stream.on('data', (chunk) => {
+                if (limitExceeded) {
+                    return;
+                }
+                outputBytes += chunk.length;
+                if (outputBytes > request.output_limit) {
+                    limitExceeded = true;
+                    worker.terminate();
+                    return;
+                }
+                const text = decoder.write(chunk);
+                if (text) {
+                    send({ event: name, text });
+                }
+            });
+        };
+        forward(worker.stdout, 'stdout');
+        forward(worker.stderr, 'stderr');
+
+        const timer = setTimeout(() => {
+            timedOut = true;
+            worker.terminate();
+        }, request.timeout_ms);
+
+        worker.on('error', (error) => {
+            // Uncaught exceptions end the worker; report them like node does
+            returncode = 1;
+            if (!limitExceeded) {
+                send({ event: 'stderr', text: formatError(error) });
+            }
+        });
+        worker.on('exit', (code) => {
+            clearTimeout(timer);
+            process.chdir(HOME);
+            if (returncode === 0) {
+                returncode = code;
+            }
+            // Let output the worker flushed just before exiting arrive first
+            setImmediate(() => {
+                send({
+                    event: 'exit',
+                    returncode,
+                    run_ms: Number(process.hrtime.bigint() - start) / 1e6,
+                    timed_out: timedOut,
+                    limit_exceeded: limitExceeded,
+                    rss_bytes: process.memoryUsage().rss,
+                });
+                resolve();
+            });
+        });
+    });
+}
+
+async function main() {
+    const lines = readline.createInterface({ input: control, crlfDelay: Infinity });
+    send({ event: 'ready' });
+    for await (const line of lines) {
+        if (line.trim()) {
+            await run(JSON.parse(line));
+        }
+    }
+    process.exit(0);
+}
+
+main();
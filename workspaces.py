@@ -0,0 +1,216 @@
+import errno
+import hashlib
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Any, Iterator
+
+# Persistent project workspaces: a content-addressed blob store plus one file tree per project
+WORKSPACE_DIR = os.environ.get('WORKSPACE_DIR', os.path.join(os.getcwd(), 'workspace'))
+# Bytes of distinct file content kept across all workspaces; cold workspaces are evicted beyond this
+WORKSPACE_MAX_BYTES = int(os.environ.get('WORKSPACE_MAX_BYTES', str(2 * 1024 * 1024 * 1024)))
+
+
+class Workspace:
+    """A project's file tree, locked for the caller while checked out"""
+
+    def __init__(self, path: str, written: int, unchanged: int, removed: int):
+        self.path = path
+        # Files linked in because they were new or changed since the last checkout
+        self.written = written
+        self.unchanged = unchanged
+        self.removed = removed
+
+
+class WorkspaceCache:
+    """Per-project source trees that are updated in place between runs.
+
+    Every distinct file content is stored once under blobs/ (read-only) and
+    hardlinked into the trees that contain it, so forks and copies of a
+    project share storage. A tree's manifest maps paths to content hashes;
+    a checkout relinks only paths whose hash changed and deletes removed
+    ones, so re-running an unchanged 200-file project touches no files.
+    Trees are for reading (compilers build from them); changed files are
+    replaced by relinking, never written through. When the blob store
+    passes max_bytes the least recently used trees are dropped and blobs
+    no tree links to any more are collected.
+    """
+
+    def __init__(self, root: str, max_bytes: int):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.blob_dir = os.path.join(root, 'blobs')
+        self.tree_dir = os.path.join(root, 'trees')
+        os.makedirs(self.blob_dir, exist_ok=True)
+        os.makedirs(self.tree_dir, exist_ok=True)
+        self._lock = threading.Lock()
+        self._tree_locks: Dict[str, threading.Lock] = {}
+        # tree directory -> last checkout time
+        self._last_used: Dict[str, float] = {}
+        self.bytes = 0
+        self.files_written = 0
+        self.files_unchanged = 0
+        self.evictions = 0
+        self._scan()
+
+    def _scan(self):
+        """Account for blobs and trees left by a previous server process"""
+        for directory, _, names in os.walk(self.blob_dir):
+            for name in names:
+                if name.endswith('.tmp'):
+                    os.unlink(os.path.join(directory, name))
+                else:
+                    self.bytes += os.path.getsize(os.path.join(directory, name))
+        for entry in os.scandir(self.tree_dir):
+            if entry.is_dir():
+                self._last_used[entry.path] = entry.stat().st_mtime
+
+    def _blob_path(self, digest: str) -> str:
+        return os.path.join(self.blob_dir, digest[:2], digest)
+
+    def _store(self, digest: str, data: bytes) -> str:
+        """Write content to the blob store once; returns the blob path"""
+        path = self._blob_path(digest)
+        if os.path.exists(path):
+            return path
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temp_path = f'{path}.{threading.get_ident()}.tmp'
+        with open(temp_path, 'wb') as f:
+            f.write(data)
+        os.chmod(temp_path, 0o444)
+        os.replace(temp_path, path)
+        with self._lock:
+            self.bytes += len(data)
+        return path
+
+    @staticmethod
+    def _place(blob: str, target: str):
+        """Hardlink a blob into a tree, copying where links aren't possible"""
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        if os.path.lexists(target):
+            os.unlink(target)
+        try:
+            os.link(blob, target)
+        except OSError as e:
+            if e.errno not in (errno.EXDEV, errno.EMLINK, errno.EPERM):
+                raise
+            shutil.copyfile(blob, target)
+        # A relinked blob keeps the mtime it was stored with; tools that rebuild by mtime (cargo) need it newer
+        os.utime(target)
+
+    def _tree_lock(self, tree: str) -> threading.Lock:
+        with self._lock:
+            return self._tree_locks.setdefault(tree, threading.Lock())
+
+    @contextmanager
+    def checkout(self, key: str, files: Dict[str, str]) -> Iterator[Workspace]:
+        """Bring the tree for key in line with files ({path: content}) and hold it for the caller.
+
+        Each key is one tree that later checkouts update in place, so keys
+        must be scoped to one owner (see execute_project in app.py).
+        """
+        tree = os.path.join(self.tree_dir, hashlib.sha256(key.encode('utf-8')).hexdigest()[:32])
+        manifest_path = os.path.join(tree, '.manifest.json')
+        with self._tree_lock(tree):
+            os.makedirs(tree, exist_ok=True)
+            try:
+                with open(manifest_path) as f:
+                    manifest = json.load(f)
+            except (OSError, ValueError):
+                manifest = {}
+
+            written = unchanged = 0
+            current = {}
+            for path, content in files.items():
+                data = content.encode('utf-8')
+                digest = hashlib.sha256(data).hexdigest()
+                current[path] = digest
+                target = os.path.join(tree, path)
+                if manifest.get(path) == digest and os.path.exists(target):
+                    unchanged += 1
+                    continue
+                try:
+                    self._place(self._store(digest, data), target)
+                except FileNotFoundError:
+                    # Eviction collected the blob between storing and linking it; store it again
+                    self._place(self._store(digest, data), target)
+                written += 1
+
+            removed = 0
+            for path in set(manifest) - set(current):
+                target = os.path.join(tree, path)
+                if os.path.lexists(target):
+                    os.unlink(target)
+                removed += 1
+
+            if written or removed or manifest != current:
+                with open(manifest_path + '.tmp', 'w') as f:
+                    json.dump(current, f)
+                os.replace(manifest_path + '.tmp', manifest_path)
+
+            with self._lock:
+                self._last_used[tree] = time.time()
+                self.files_written += written
+                self.files_unchanged += unchanged
+            yield Workspace(tree, written, unchanged, removed)
+
+        self._evict(keep=tree)
+
+    def _evict(self, keep: str):
+        """Drop least recently used trees, then unreferenced blobs, until under max_bytes"""
+        with self._lock:
+            if self.bytes <= self.max_bytes:
+                return
+            candidates = sorted((used, tree) for tree, used in self._last_used.items()
+                                if tree != keep and not self._tree_locks.get(tree, threading.Lock()).locked())
+        for _, tree in candidates:
+            # A tree checked out since the candidates were picked is in use again; skip it
+            lock = self._tree_lock(tree)
+            if not lock.acquire(blocking=False):
+                continue
+            try:
+                shutil.rmtree(tree, ignore_errors=True)
+            finally:
+                lock.release()
+            with self._lock:
+                self._last_used.pop(tree, None)
+                self.evictions += 1
+            logging.info(f"Evicted workspace {tree}")
+            if self._collect_blobs() <= self.max_bytes:
+                return
+
+    def _collect_blobs(self) -> int:
+        """Delete blobs no tree links to; returns the remaining store size"""
+        freed = 0
+        for directory, _, names in os.walk(self.blob_dir):
+            for name in names:
+                path = os.path.join(directory, name)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                if stat.st_nlink == 1 and not name.endswith('.tmp'):
+                    os.unlink(path)
+                    freed += stat.st_size
+        with self._lock:
+            self.bytes -= freed
+            return self.bytes
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'root': self.root,
+                'workspaces': len(self._last_used),
+                'bytes': self.bytes,
+                'max_bytes': self.max_bytes,
+                'files_written': self.files_written,
+                'files_unchanged': self.files_unchanged,
+                'evictions': self.evictions,
+            }
+
+
+workspace_cache = WorkspaceCache(WORKSPACE_DIR, WORKSPACE_MAX_BYTES)